@@ -23,9 +23,13 @@ export async function GET(
   const requestedWebPath = `/api/images/${imagePath.join("/")}`; //
 
   try {
-    // 1. DB에서 web_path를 기준으로 local_path 조회
-    const sql = "SELECT local_path FROM images WHERE web_path = ?";
-    const imageResults = await executeQuery<ImagePathResult>(sql, [requestedWebPath]);
+    // 1. DB에서 web_path를 기준으로 local_path 조회 (원본 이미지 또는 WebP/AVIF 파생본)
+    const sql = `
+      SELECT local_path FROM images WHERE web_path = ?
+      UNION ALL
+      SELECT local_path FROM image_variants WHERE web_path = ?
+      LIMIT 1`;
+    const imageResults = await executeQuery<ImagePathResult>(sql, [requestedWebPath, requestedWebPath]);
 
     if (imageResults.length === 0) {
       return new NextResponse(
@@ -61,6 +65,7 @@ export async function GET(
     else if (['.jpg', '.jpeg'].includes(extension)) contentType = 'image/jpeg';
     else if (extension === '.gif') contentType = 'image/gif';
     else if (extension === '.webp') contentType = 'image/webp';
+    else if (extension === '.avif') contentType = 'image/avif';
 
     // 5. 이미지 응답 반환
     return new NextResponse(imageBuffer, {
@@ -9,6 +9,7 @@ import { getPostDataSQL } from "@/lib/postData";
 
 import {
   CalendarDays,
+  Clock,
   Tag as TagIcon,
   ArrowLeft,
 } from "lucide-react";
@@ -91,6 +92,14 @@ export default async function BlogPostPage({ params: paramsPromise }: Props) {
                                         <span>{new Date(post.notion_last_edited_time).toLocaleDateString('ko-KR')}</span>
                                     </div>
 
+                                    {/* 읽기 시간 (동기화 때 계산) */}
+                                    {post.reading_minutes > 0 && (
+                                        <div className="flex items-center gap-1.5">
+                                            <Clock size={16} />
+                                            <span>{post.reading_minutes}분 분량</span>
+                                        </div>
+                                    )}
+
                                     {/* 카테고리 */}
                                     {post.category_name && (
                                         <Link href="/" className="flex items-center gap-1.5 hover:text-cyan-400 transition-colors">
@@ -118,11 +127,31 @@ export default async function BlogPostPage({ params: paramsPromise }: Props) {
                             </header>
                         </div>
 
-                        {/* 본문 */}
+                        {/* 목차 (미리 렌더링된 HTML의 제목 앵커) */}
+                        {post.html && post.toc.length > 0 && (
+                            <nav className="mb-10 p-6 bg-slate-800/50 rounded-lg border border-slate-700 text-sm">
+                                <h2 className="text-base font-semibold text-slate-100 mb-3">목차</h2>
+                                <ul className="space-y-1.5">
+                                    {post.toc.map((entry) => (
+                                        <li key={entry.id} style={{ paddingLeft: `${(entry.level - 1) * 1}rem` }}>
+                                            <a href={`#${entry.id}`} className="text-slate-400 hover:text-cyan-400 transition-colors">
+                                                {entry.text}
+                                            </a>
+                                        </li>
+                                    ))}
+                                </ul>
+                            </nav>
+                        )}
+
+                        {/* 본문 - 동기화 때 만든 HTML이 있으면 그대로 사용 (요청마다 마크다운을 파싱하지 않음) */}
                         <article>
-                            <ReactMarkdown>
-                                {post.content}
-                            </ReactMarkdown>
+                            {post.html ? (
+                                <div className="prose prose-invert max-w-none" dangerouslySetInnerHTML={{ __html: post.html }} />
+                            ) : (
+                                <ReactMarkdown remarkPlugins={[remarkGfm]}>
+                                    {post.content}
+                                </ReactMarkdown>
+                            )}
                             <ReactMarkdown>{md}</ReactMarkdown>
                             <ReactMarkdown remarkPlugins={[remarkGfm]}>{md}</ReactMarkdown>
                         </article>
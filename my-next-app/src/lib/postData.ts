@@ -17,8 +17,19 @@ interface PostQueryResult extends RowDataPacket {
   updated_at: string;
   category_name: string | null;
   tags: string | null; // GROUP_CONCAT 결과는 문자열 또는 null
+  html: string | null; // 동기화 때 미리 렌더링한 본문 HTML (post_renders)
+  toc: string | null; // JSON 문자열
+  word_count: number | null;
+  reading_minutes: number | null;
 }
 
+// 목차 항목 (제목 단계, 텍스트, 본문 HTML의 앵커 ID)
+export type TocEntry = {
+  level: number;
+  text: string;
+  id: string;
+};
+
 interface ImageQueryResult extends RowDataPacket {
   web_path: string;
   caption: string | null;
@@ -40,6 +51,10 @@ type PostData = {
     updated_at: string;
     category_name: string | null;
     tags: string[];
+    html: string | null;
+    toc: TocEntry[];
+    word_count: number;
+    reading_minutes: number;
     images: Array<{
         web_path: string;
         caption: string | null;
@@ -47,6 +62,17 @@ type PostData = {
     }>;
 }
 
+// post_renders.toc(JSON 문자열)를 목차 배열로 변환 (없거나 잘못된 값이면 빈 배열)
+function parseToc(toc: string | null): TocEntry[] {
+  if (!toc) return [];
+  try {
+    const parsed = JSON.parse(toc);
+    return Array.isArray(parsed) ? parsed : [];
+  } catch {
+    return [];
+  }
+}
+
 export async function getPostDataSQL(slug: string): Promise<PostData | null> {
   try {
     console.log(`Searching for post with slug: ${slug}`);
@@ -67,15 +93,21 @@ export async function getPostDataSQL(slug: string): Promise<PostData | null> {
         p.created_at,
         p.updated_at,
         c.name as category_name,
-        GROUP_CONCAT(DISTINCT t.name ORDER BY t.name ASC SEPARATOR ',') as tags
+        GROUP_CONCAT(DISTINCT t.name ORDER BY t.name ASC SEPARATOR ',') as tags,
+        r.html,
+        r.toc,
+        r.word_count,
+        r.reading_minutes
       FROM posts p
       LEFT JOIN categories c ON p.category_id = c.id
+      LEFT JOIN post_renders r ON p.id = r.post_id
       LEFT JOIN post_tags pt ON p.id = pt.post_id
       LEFT JOIN tags t ON pt.tag_id = t.id
       WHERE p.slug = ?
       GROUP BY p.id, p.title, p.slug, p.description, p.content, p.post_type, 
                p.category_id, p.published_date, p.featured_image, 
-               p.notion_last_edited_time, p.created_at, p.updated_at, c.name
+               p.notion_last_edited_time, p.created_at, p.updated_at, c.name,
+               r.html, r.toc, r.word_count, r.reading_minutes
     `;
 
     const results = await executeQuery<PostQueryResult>(postSql, [slug]);
@@ -120,6 +152,10 @@ export async function getPostDataSQL(slug: string): Promise<PostData | null> {
       updated_at: postData.updated_at,
       category_name: postData.category_name,
       tags: postData.tags ? postData.tags.split(',').map(tag => tag.trim()) : [],
+      html: postData.html,
+      toc: parseToc(postData.toc),
+      word_count: postData.word_count ?? 0,
+      reading_minutes: postData.reading_minutes ?? 0,
       images: imageResults.map(img => ({
         web_path: img.web_path,
         caption: img.caption,
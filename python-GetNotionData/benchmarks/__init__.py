@@ -0,0 +1 @@
+# 오프라인 동기화 벤치마크 (python -m benchmarks.run, 자세한 내용은 README.md)
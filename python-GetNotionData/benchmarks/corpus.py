@@ -0,0 +1,194 @@
+# 합성 Notion 데이터베이스 (페이지 + 블록 트리)
+# 같은 설정과 seed면 항상 같은 코퍼스를 만들므로 실행 간 숫자를 비교할 수 있습니다.
+# Notion API 응답 형식(페이지 객체, 블록 객체, next_cursor 페이지네이션)을 그대로 따릅니다.
+
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from content_processor.parser import PUBLISHED_STATUS
+
+# 코퍼스의 기본 수정 시각 (편집하지 않은 페이지/블록은 이 시각 근처로 고정)
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+WORDS = (
+    "notion sync blog post render image cache query block page table list code quote "
+    "latency throughput memory profile index batch stream worker pool commit hash"
+).split()
+CATEGORIES = ["Dev", "Infra", "Note", "Review"]
+TAGS = ["python", "mysql", "nextjs", "docker", "notion", "perf", "cache"]
+CODE_LANGUAGES = ["python", "typescript", "sql", "bash"]
+
+
+def format_timestamp(dt):
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def rich_text(text, bold=False, code=False, link=None):
+    return {
+        'type': 'text',
+        'text': {'content': text, 'link': {'url': link} if link else None},
+        'plain_text': text,
+        'href': link,
+        'annotations': {
+            'bold': bold, 'italic': False, 'strikethrough': False, 'underline': False, 'code': code, 'color': 'default',
+        },
+    }
+
+
+class SyntheticCorpus:
+    """posts개의 '발행됨' 페이지와 페이지당 약 blocks_per_post개의 블록(최대 depth 단계 중첩)을 가진 데이터베이스."""
+
+    def __init__(self, posts=50, blocks_per_post=60, depth=2, images_per_post=2, image_url=None, seed=1):
+        self.posts = posts
+        self.blocks_per_post = blocks_per_post
+        self.depth = depth
+        self.images_per_post = images_per_post if image_url else 0
+        self.image_url = image_url  # 이미지 이름 -> URL 함수 (benchmarks.image_server.ImageServer.url_for)
+        self.random = random.Random(seed)
+        self._next_id = seed << 32
+
+        self.pages = []         # 데이터베이스 조회 결과 (페이지 객체)
+        self.children = {}      # 부모(페이지/블록) ID -> 자식 블록 목록
+        self.block_count = 0
+        for index in range(posts):
+            self.pages.append(self._make_page(index))
+
+    def _new_id(self):
+        self._next_id += 1
+        return str(uuid.UUID(int=self._next_id))
+
+    def _words(self, count):
+        return ' '.join(self.random.choice(WORDS) for _ in range(count))
+
+    def _make_page(self, index):
+        page_id = self._new_id()
+        edited = format_timestamp(BASE_TIME + timedelta(minutes=index))
+        page = {
+            'object': 'page',
+            'id': page_id,
+            'created_time': edited,
+            'last_edited_time': edited,
+            'archived': False,
+            'in_trash': False,
+            'cover': None,
+            'properties': {
+                'Title': {'title': [rich_text(f"Benchmark post {index}: {self._words(4)}")]},
+                'Slug': {'rich_text': [rich_text(f"bench-post-{index}")]},
+                'Status': {'select': {'name': PUBLISHED_STATUS}},
+                'Description': {'rich_text': [rich_text(self._words(12))]},
+                'Type': {'select': {'name': 'Post'}},
+                'Categorie': {'select': {'name': self.random.choice(CATEGORIES)}},
+                'Tags': {'multi_select': [{'name': tag} for tag in self.random.sample(TAGS, 2)]},
+                'PublishedDate': {'date': {'start': (BASE_TIME - timedelta(days=index)).strftime('%Y-%m-%d')}},
+            },
+        }
+        if self.image_url:
+            page['cover'] = {'type': 'external', 'external': {'url': self.image_url(f"cover-{index}")}}
+
+        image_slots = set(self.random.sample(range(self.blocks_per_post), min(self.images_per_post, self.blocks_per_post)))
+        blocks = []
+        budget = self.blocks_per_post
+        while budget > 0:
+            image_index = f"{index}-{len(blocks)}" if (self.blocks_per_post - budget) in image_slots else None
+            block, used = self._make_block(edited, self.depth, image_index)
+            blocks.append(block)
+            budget -= used
+        self.children[page_id] = blocks
+        return page
+
+    def _block(self, block_type, payload, edited, children=None):
+        block = {
+            'object': 'block',
+            'id': self._new_id(),
+            'type': block_type,
+            'created_time': edited,
+            'last_edited_time': edited,
+            'has_children': bool(children),
+            'archived': False,
+            block_type: payload,
+        }
+        if children:
+            self.children[block['id']] = children
+        self.block_count += 1
+        return block
+
+    # 블록 하나(와 자식)를 만들고 (블록, 사용한 블록 수)를 반환
+    def _make_block(self, edited, depth, image_index=None):
+        if image_index is not None:
+            return self._block('image', {
+                'type': 'external', 'external': {'url': self.image_url(f"body-{image_index}")},
+                'caption': [rich_text(self._words(3))],
+            }, edited), 1
+
+        kind = self.random.random()
+        if depth > 0 and kind < 0.2:
+            list_type = self.random.choice(('bulleted_list_item', 'numbered_list_item', 'to_do'))
+            children, used = [], 1
+            for _ in range(self.random.randint(1, 3)):
+                child, child_used = self._make_block(edited, depth - 1)
+                children.append(child)
+                used += child_used
+            payload = {'rich_text': [rich_text(self._words(6))], 'color': 'default'}
+            if list_type == 'to_do':
+                payload['checked'] = self.random.random() < 0.5
+            return self._block(list_type, payload, edited, children), used
+        if depth > 0 and kind < 0.25:
+            children = [self._make_block(edited, 0)[0] for _ in range(2)]
+            return self._block('toggle', {'rich_text': [rich_text(self._words(4))], 'color': 'default'}, edited, children), 3
+        if kind < 0.35:
+            level = self.random.choice((1, 2, 3))
+            return self._block(f'heading_{level}', {'rich_text': [rich_text(self._words(5))], 'is_toggleable': False}, edited), 1
+        if kind < 0.42:
+            return self._block('code', {
+                'rich_text': [rich_text('\n'.join(self._words(6) for _ in range(4)))],
+                'language': self.random.choice(CODE_LANGUAGES), 'caption': [],
+            }, edited), 1
+        if kind < 0.47:
+            return self._block('quote', {'rich_text': [rich_text(self._words(15))], 'color': 'default'}, edited), 1
+        if kind < 0.50:
+            return self._block('divider', {}, edited), 1
+        return self._block('paragraph', {
+            'rich_text': [
+                rich_text(self._words(20) + ' '),
+                rich_text(self._words(3), bold=True),
+                rich_text(' ' + self._words(10) + ' '),
+                rich_text('link', link='https://example.com/' + self._words(1)),
+                rich_text(' ' + self._words(2), code=True),
+            ],
+            'color': 'default',
+        }, edited), 1
+
+    def edit_page(self, index, now=None):
+        """index번 페이지의 첫 문단을 바꾸고 페이지/블록의 last_edited_time을 now로 올립니다. 바뀐 페이지를 반환."""
+        edited = format_timestamp(now or datetime.now(timezone.utc))
+        page = self.pages[index]
+        page['last_edited_time'] = edited
+        for block in self.children[page['id']]:
+            if block['type'] == 'paragraph':
+                block['paragraph']['rich_text'][0] = rich_text(f"edited at {edited} " + self._words(10))
+                block['last_edited_time'] = edited
+                break
+        return page
+
+    def iter_blocks(self, parent_id):
+        for block in self.children.get(parent_id, []):
+            yield block
+            if block.get('has_children'):
+                yield from self.iter_blocks(block['id'])
+
+    def block_tree(self, page_id):
+        """fetch_block_tree 결과와 같은 형태 (자식이 block['children']에 붙은 트리)로 페이지 블록을 반환합니다."""
+        def attach(blocks):
+            result = []
+            for block in blocks:
+                block = dict(block)
+                if block.get('has_children'):
+                    block['children'] = attach(self.children.get(block['id'], []))
+                result.append(block)
+            return result
+        return attach(self.children.get(page_id, []))
@@ -0,0 +1,132 @@
+# 가짜 Notion 백엔드 (프로세스 안에서 합성 코퍼스를 Notion API처럼 제공)
+# 백엔드는 httpx.MockTransport의 핸들러로 HTTP 요청을 받아 Notion과 같은 JSON 응답(오류는 상태 코드와 오류 본문)을 돌려줍니다.
+# 클라이언트는 실제와 같은 RateLimitedClient에 이 전송 계층만 끼운 것이므로, 엔드포인트 메서드, Client.request(),
+# 공유 속도 제한기(재시도, 429 처리), 메트릭, notion-client의 응답 해석과 예외까지 동기화 코드가 실제와 같은 경로로 실행됩니다.
+
+import json
+import random
+import threading
+import time
+
+import httpx
+
+from notion_handler.client import RateLimitedClient, endpoint_label
+from .corpus import parse_timestamp
+
+# Notion API의 페이지 크기 상한
+MAX_PAGE_SIZE = 100
+
+
+class NotFound(Exception):
+    """코퍼스에 없는 객체 (HTTP 404 object_not_found)."""
+
+
+def _error_response(status, code, message, headers=None):
+    return httpx.Response(status, headers=headers, json={'object': 'error', 'status': status, 'code': code, 'message': message})
+
+
+def _matches(page, query_filter):
+    if not query_filter:
+        return True
+    if 'and' in query_filter:
+        return all(_matches(page, sub) for sub in query_filter['and'])
+    if 'or' in query_filter:
+        return any(_matches(page, sub) for sub in query_filter['or'])
+    if query_filter.get('timestamp') == 'last_edited_time':
+        condition = query_filter['last_edited_time']
+        edited = parse_timestamp(page['last_edited_time'])
+        if 'on_or_after' in condition:
+            return edited >= parse_timestamp(condition['on_or_after'])
+        if 'after' in condition:
+            return edited > parse_timestamp(condition['after'])
+        raise ValueError(f"지원하지 않는 last_edited_time 조건: {condition}")
+    prop = page['properties'].get(query_filter.get('property'), {})
+    if 'select' in query_filter:
+        return ((prop.get('select') or {}).get('name')) == query_filter['select'].get('equals')
+    raise ValueError(f"지원하지 않는 필터: {query_filter}")
+
+
+def _sort_key(sort):
+    if sort.get('timestamp') == 'last_edited_time':
+        return lambda page: page['last_edited_time']
+    if sort.get('property') == 'PublishedDate':
+        return lambda page: (page['properties']['PublishedDate'].get('date') or {}).get('start') or ''
+    raise ValueError(f"지원하지 않는 정렬: {sort}")
+
+
+# 응답은 HTTP 응답 본문(JSON)으로 직렬화되어 클라이언트가 다시 읽으므로 파싱 비용이 반영되고, 호출자가 코퍼스를 수정할 수 없음
+def _paginate(items, start_cursor, page_size):
+    start = int(start_cursor or 0)
+    page_size = min(int(page_size or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+    end = start + page_size
+    return {
+        'object': 'list',
+        'results': items[start:end],
+        'next_cursor': str(end) if end < len(items) else None,
+        'has_more': end < len(items),
+    }
+
+
+class FakeNotionBackend:
+    """코퍼스를 제공하는 가짜 API. latency(초)만큼 응답을 늦추고 throttle_rate 비율로 429를 냅니다."""
+
+    def __init__(self, corpus, latency=0.0, throttle_rate=0.0, retry_after=0.05, seed=0):
+        self.corpus = corpus
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}         # 엔드포인트 -> 요청 수 (429 포함)
+        self.throttled = 0
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls = {}
+            self.throttled = 0
+
+    def handle_request(self, request):
+        """httpx.MockTransport 핸들러: Notion API HTTP 요청 -> 응답."""
+        path = request.url.path.split('/v1/', 1)[-1]
+        query = dict(request.url.params)
+        body = json.loads(request.content) if request.content else None
+        with self._lock:
+            label = endpoint_label(path, request.method)
+            self.calls[label] = self.calls.get(label, 0) + 1
+            throttle = self.throttle_rate and self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            return _error_response(429, 'rate_limited', "Rate limited (benchmark)", {'retry-after': str(self.retry_after)})
+        try:
+            return httpx.Response(200, json=self._route(path, request.method, query, body))
+        except NotFound as e:
+            return _error_response(404, 'object_not_found', str(e))
+
+    def _route(self, path, method, query, body):
+        parts = path.strip('/').split('/')
+        if method == 'POST' and len(parts) == 3 and parts[0] == 'databases' and parts[2] == 'query':
+            body = body or {}
+            pages = [page for page in self.corpus.pages if _matches(page, body.get('filter'))]
+            for sort in reversed(body.get('sorts') or []):
+                pages.sort(key=_sort_key(sort), reverse=sort.get('direction') == 'descending')
+            return _paginate(pages, body.get('start_cursor'), body.get('page_size'))
+        if method == 'GET' and len(parts) == 3 and parts[0] == 'blocks' and parts[2] == 'children':
+            query = query or {}
+            return _paginate(self.corpus.children.get(parts[1], []), query.get('start_cursor'), query.get('page_size'))
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'pages':
+            page = next((page for page in self.corpus.pages if page['id'] == parts[1]), None)
+            if page is None:
+                raise NotFound(f"코퍼스에 없는 페이지: {parts[1]}")
+            return page
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'databases':
+            return {'object': 'database', 'id': parts[1], 'title': [{'plain_text': 'Benchmark'}]}
+        raise ValueError(f"지원하지 않는 요청: {method} {path}")
+
+
+# 가짜 백엔드로 요청을 보내는 RateLimitedClient (실제 클라이언트와 같은 속도 제한기와 메트릭을 거침)
+def build_fake_notion_client(backend, rate_limiter):
+    http_client = httpx.Client(transport=httpx.MockTransport(backend.handle_request))
+    return RateLimitedClient(rate_limiter, auth='benchmark', client=http_client)
@@ -0,0 +1,114 @@
+# 로컬 정적 이미지 서버 (합성 PNG)
+# 이미지 이름마다 내용이 고정된 PNG를 만들어 제공합니다. 이미지 다운로더가 쓰는 ETag/Last-Modified 조건부 요청(304)과
+# Range 요청(206)을 지원하므로, 실제 외부 이미지 호스트와 같은 경로로 다운로드/재사용 로직이 실행됩니다.
+
+import hashlib
+import random
+import struct
+import threading
+import zlib
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+from .corpus import BASE_TIME
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+
+def make_png(name, width, height):
+    """name으로 정해지는 노이즈 RGB PNG (압축이 잘 되지 않아 실제 사진과 비슷한 크기)."""
+    rng = random.Random(hashlib.sha256(name.encode('utf-8')).digest())
+    row_bytes = width * 3
+    raw = b''.join(b'\x00' + rng.randbytes(row_bytes) for _ in range(height))
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + _png_chunk(b'IDAT', zlib.compress(raw, 1))
+        + _png_chunk(b'IEND', b'')
+    )
+
+
+class ImageServer:
+    """127.0.0.1의 빈 포트에서 /img/<이름>.png 를 제공하는 HTTP 서버 (백그라운드 스레드)."""
+
+    def __init__(self, width=320, height=240):
+        self.width = width
+        self.height = height
+        self._images = {}   # 이름 -> (바이트, ETag)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self._server = None
+
+    def image(self, name):
+        with self._lock:
+            cached = self._images.get(name)
+        if cached is None:
+            data = make_png(name, self.width, self.height)
+            cached = (data, '"' + hashlib.sha256(data).hexdigest()[:16] + '"')
+            with self._lock:
+                self._images[name] = cached
+        return cached
+
+    def url_for(self, name):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/img/{quote(name)}.png"
+
+    def start(self):
+        server_ref = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # keep-alive (다운로더의 연결 재사용 반영)
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if not (path.startswith('/img/') and path.endswith('.png')):
+                    self.send_error(404)
+                    return
+                data, etag = server_ref.image(unquote(path[len('/img/'):-len('.png')]))
+                with server_ref._lock:
+                    server_ref.requests += 1
+
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                status, body = 200, data
+                range_header = self.headers.get('Range', '')
+                if range_header.startswith('bytes='):
+                    start_text, _, end_text = range_header[len('bytes='):].partition('-')
+                    start = int(start_text or 0)
+                    end = min(int(end_text) if end_text else len(data) - 1, len(data) - 1)
+                    status, body = 206, data[start:end + 1]
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', formatdate(BASE_TIME.timestamp(), usegmt=True))
+                if status == 206:
+                    self.send_header('Content-Range', f"bytes {start}-{start + len(body) - 1}/{len(data)}")
+                self.end_headers()
+                with server_ref._lock:
+                    server_ref.bytes_sent += len(body)
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="bench-images", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,112 @@
+# 시작 비용(모듈 임포트 시간) 측정과 예산 확인
+# python-GetNotionData 디렉터리에서: python -m benchmarks.import_time [--budget 모듈=ms ...] [--runs N] [--top N]
+#
+# 모듈마다 새 인터프리터에서 `python -X importtime -c "import 모듈"`을 runs번 실행해 중앙값을 예산과 비교합니다.
+# 임포트는 부수 효과가 없어야 하므로 필수 환경 변수 없이 실행하며, 임포트 중에 표준 출력에 무언가 쓰이면 실패로 봅니다.
+# 예산을 넘거나 임포트가 실패하면 종료 코드 1 (CI나 배포 전 확인에 사용).
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 모듈 -> 임포트 시간 예산(ms). main은 Notion/MySQL/HTTP 라이브러리 임포트가 대부분이고,
+# 파서/렌더러는 그 라이브러리들을 끌어오지 않아야 합니다.
+DEFAULT_BUDGETS = {
+    'main': 400,
+    'content_processor.parser': 50,
+    'content_processor.html_renderer': 80,
+}
+
+# 측정할 때 지우는 환경 변수 (임포트가 설정 없이도 되는지 확인)
+REQUIRED_ENV = ('NOTION_API_KEY', 'NOTION_DATABASE_ID', 'DB_USER', 'DB_PASSWORD', 'DB_NAME')
+
+
+def parse_importtime(stderr):
+    """-X importtime 출력 -> [(모듈, 자체 µs, 누적 µs, 깊이)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+# 모듈 자신과 그 모듈이 처음 임포트한 모듈들의 행 (인터프리터 시작(site) 때 임포트된 모듈 제외)
+# -X importtime은 임포트가 끝난 순서로 출력하므로, 모듈의 하위 항목은 바로 앞의 최상위(깊이 0) 행 다음부터 모듈 행까지입니다.
+def module_subtree(rows, module):
+    end = max(i for i, row in enumerate(rows) if row[0] == module and row[3] == 0)
+    start = end
+    while start > 0 and rows[start - 1][3] > 0:
+        start -= 1
+    return rows[start:end + 1]
+
+
+def measure(module, runs):
+    env = {key: value for key, value in os.environ.items() if key not in REQUIRED_ENV}
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    totals, last_rows = [], []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=PROJECT_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {'module': module, 'error': proc.stderr.strip().splitlines()[-1]}
+        if proc.stdout.strip():
+            return {'module': module, 'error': f"임포트 중 표준 출력: {proc.stdout.strip().splitlines()[0]!r}"}
+        last_rows = module_subtree(parse_importtime(proc.stderr), module)
+        totals.append(last_rows[-1][2])
+    return {'module': module, 'median_ms': statistics.median(totals) / 1000, 'rows': last_rows}
+
+
+def print_breakdown(result, top):
+    rows = result['rows']
+    print("  누적 시간 상위 (깊이 1):")
+    for name, _, cumulative, _ in sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])[:top]:
+        print(f"    {cumulative / 1000:>8.1f} ms  {name}")
+    print("  자체 시간 상위:")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: -r[1])[:top]:
+        print(f"    {self_us / 1000:>8.1f} ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="모듈 임포트 시간을 측정하고 예산과 비교합니다.")
+    parser.add_argument('--budget', action='append', metavar='MODULE=MS',
+                        help="모듈별 예산 (여러 번 지정 가능, 기본: " + ', '.join(f"{m}={b}" for m, b in DEFAULT_BUDGETS.items()) + ")")
+    parser.add_argument('--runs', type=int, default=5, help="모듈마다 실행 횟수 (중앙값 사용, 기본 5)")
+    parser.add_argument('--top', type=int, default=8, help="예산을 넘은 모듈의 내역을 몇 줄 보여줄지 (기본 8)")
+    parser.add_argument('--verbose', action='store_true', help="예산 안이어도 내역 출력")
+    args = parser.parse_args(argv)
+
+    budgets = DEFAULT_BUDGETS
+    if args.budget:
+        budgets = {}
+        for item in args.budget:
+            module, _, budget = item.partition('=')
+            if not budget:
+                parser.error(f"--budget은 MODULE=MS 형식이어야 합니다: {item}")
+            budgets[module] = float(budget)
+
+    failed = False
+    for module, budget in budgets.items():
+        result = measure(module, max(1, args.runs))
+        if 'error' in result:
+            print(f"FAIL {module}: {result['error']}")
+            failed = True
+            continue
+        over = result['median_ms'] > budget
+        failed = failed or over
+        print(f"{'FAIL' if over else 'ok  '} {module}: {result['median_ms']:.1f} ms (예산 {budget:g} ms)")
+        if over or args.verbose:
+            print_breakdown(result, args.top)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# 오프라인 동기화 벤치마크 실행기
+# python-GetNotionData 디렉터리에서: python -m benchmarks.run [옵션]   (자세한 내용은 benchmarks/README.md)
+#
+# 시나리오
+#   render            DB 없이 코퍼스 전체를 마크다운/HTML로 변환 (블록/초)
+#   cold              빈 DB, 빈 이미지 저장소에서 전체 동기화
+#   noop              아무것도 바뀌지 않은 상태에서 전체 동기화 (목록 조회 + 스냅샷 비교)
+#   noop-incremental  아무것도 바뀌지 않은 상태에서 증분 동기화
+#   edit              페이지 하나의 문단을 고친 뒤 증분 동기화
+# DB 시나리오는 항상 cold부터 순서대로 실행하며, 이름에 'bench'가 들어간 데이터베이스만 초기화합니다.
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+DB_SCENARIOS = ('cold', 'noop', 'noop-incremental', 'edit')
+ALL_SCENARIOS = ('render',) + DB_SCENARIOS
+
+# 벤치마크에서 다시 만드는 테이블 (외래 키 검사를 끄고 삭제)
+BENCH_TABLES = ('post_renders', 'image_variants', 'images', 'image_blobs', 'post_tags', 'tags', 'posts', 'categories', 'sync_state')
+
+# 설정하지 않았을 때 쓰는 값 (README의 docker run 명령과 같은 DB)
+BENCH_ENV_DEFAULTS = {
+    'NOTION_API_KEY': 'benchmark',
+    'NOTION_DATABASE_ID': 'benchmark-database',
+    'DB_HOST': '127.0.0.1',
+    'DB_PORT': '3307',
+    'DB_USER': 'root',
+    'DB_PASSWORD': 'bench',
+    'DB_NAME': 'notion_bench',
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="가짜 Notion 백엔드와 합성 코퍼스로 동기화 성능을 측정합니다.")
+    parser.add_argument('--scenarios', default=','.join(ALL_SCENARIOS),
+                        help=f"쉼표로 구분한 시나리오 ({', '.join(ALL_SCENARIOS)}), 기본: 전부")
+    parser.add_argument('--posts', type=int, default=50, help="게시물 수 (기본 50)")
+    parser.add_argument('--blocks', type=int, default=60, help="게시물당 블록 수 (기본 60)")
+    parser.add_argument('--depth', type=int, default=2, help="블록 중첩 깊이 (기본 2)")
+    parser.add_argument('--images', type=int, default=2, help="게시물당 본문 이미지 수, 커버 별도 (기본 2)")
+    parser.add_argument('--image-size', default='320x240', help="합성 이미지 크기 WxH (기본 320x240)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Notion 요청마다 더할 지연(초), 예: 0.15")
+    parser.add_argument('--throttle', type=float, default=0.0, help="429를 낼 요청 비율 (0~1)")
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help="Notion 속도 제한(req/s). 실제 한도로 측정하려면 3 (기본 1000 = 사실상 없음)")
+    parser.add_argument('--repeat', type=int, default=3, help="render 시나리오 반복 횟수 (가장 빠른 값 사용)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-variants', action='store_true', help="이미지 파생본(WebP/AVIF) 생성 끄기")
+    parser.add_argument('--json', metavar='PATH', help="결과를 JSON으로 저장")
+    parser.add_argument('--keep', action='store_true', help="임시 이미지 저장소를 지우지 않음")
+    parser.add_argument('--verbose', action='store_true', help="동기화 INFO 로그 출력")
+    args = parser.parse_args(argv)
+    args.scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(args.scenarios) - set(ALL_SCENARIOS)
+    if unknown:
+        parser.error(f"알 수 없는 시나리오: {', '.join(sorted(unknown))}")
+    return args
+
+
+# settings는 임포트할 때 환경 변수를 읽으므로 프로젝트 모듈을 임포트하기 전에 호출해야 합니다.
+def prepare_environment(args, storage_dir):
+    for key, value in BENCH_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    os.environ.update({
+        'IMAGE_HOST_STORAGE_PATH': storage_dir,
+        'BLOCK_CACHE_PATH': os.path.join(storage_dir, '.cache', 'notion_blocks.sqlite3'),
+        'SYNC_STATUS_PATH': os.path.join(storage_dir, '.cache', 'sync_status.json'),
+        'METRICS_TEXTFILE_PATH': os.path.join(storage_dir, '.cache', 'sync_metrics.prom'),
+        'NOTION_RATE_LIMIT_PER_SEC': str(args.rate),
+        'SYNC_MODE': 'incremental',
+    })
+    if args.no_variants:
+        os.environ['IMAGE_VARIANTS_ENABLED'] = 'false'
+
+
+def reset_database(db_Manager, settings):
+    if 'bench' not in (settings.DB_NAME or ''):
+        sys.exit(f"DB_NAME='{settings.DB_NAME}': 벤치마크는 테이블을 삭제하므로 이름에 'bench'가 들어간 데이터베이스만 사용합니다.")
+    conn = db_Manager.get_db_connection()
+    if not conn:
+        sys.exit(f"MySQL({settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME})에 연결할 수 없습니다. benchmarks/README.md를 참고하세요.")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in BENCH_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        conn.commit()
+    finally:
+        db_Manager.close_db_connection(conn, cursor)
+
+
+def _counter_total(run_metrics, name):
+    return sum(run_metrics['counters'].get(name, {}).values())
+
+
+def run_sync_scenario(name, sync_main, backend, images, full_sync, init_schema=False):
+    backend.reset_counts()
+    image_requests, image_bytes = images.requests, images.bytes_sent
+    status = sync_main.run_sync_once(full_sync=full_sync, init_schema=init_schema)
+    run_metrics = status.get('metrics', {'counters': {}, 'histograms': {}})
+    posts = status.get('posts', {})
+    processed = sum(posts.values())
+    seconds = status['duration_seconds']
+    return {
+        'scenario': name,
+        'result': status['result'],
+        'seconds': seconds,
+        'posts': posts,
+        'posts_per_sec': round(processed / seconds, 2) if seconds else None,
+        'api_calls': _counter_total(run_metrics, 'notion_requests_total'),
+        'throttled': backend.throttled,
+        'db_round_trips': _counter_total(run_metrics, 'db_round_trips_total'),
+        'image_requests': images.requests - image_requests,
+        'image_bytes': images.bytes_sent - image_bytes,
+        'stages': {
+            labels.partition('=')[2]: stat['sum']
+            for labels, stat in run_metrics['histograms'].get('sync_stage_seconds', {}).items()
+        },
+    }
+
+
+def run_render_scenario(args):
+    from content_processor.markdown_converter import convert_blocks_to_markdown
+    from content_processor.html_renderer import render_post_html
+    from .corpus import SyntheticCorpus
+
+    corpus = SyntheticCorpus(args.posts, args.blocks, args.depth, images_per_post=0, seed=args.seed)
+    trees = [(page['id'], page['properties']['Slug']['rich_text'][0]['plain_text'], corpus.block_tree(page['id']))
+             for page in corpus.pages]
+    best = None
+    for _ in range(max(1, args.repeat)):
+        started = time.perf_counter()
+        for page_id, slug, tree in trees:
+            convert_blocks_to_markdown(None, page_id, page_id, slug, blocks=tree)
+            render_post_html(tree)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'scenario': 'render',
+        'result': 'ok',
+        'seconds': round(best, 4),
+        'posts': {'rendered': len(trees)},
+        'posts_per_sec': round(len(trees) / best, 2),
+        'blocks': corpus.block_count,
+        'blocks_per_sec': round(corpus.block_count / best),
+    }
+
+
+def print_report(results):
+    header = f"{'scenario':<17} {'result':<8} {'seconds':>8} {'posts/s':>9} {'api':>6} {'429':>5} {'db_rt':>7} {'img_req':>8} {'img_MB':>7}  posts"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(
+            f"{row['scenario']:<17} {row['result']:<8} {row['seconds']:>8.3f} {row['posts_per_sec'] or 0:>9.1f} "
+            f"{row.get('api_calls', '-'):>6} {row.get('throttled', '-'):>5} {row.get('db_round_trips', '-'):>7} "
+            f"{row.get('image_requests', '-'):>8} {row.get('image_bytes', 0) / 1024 / 1024:>7.2f}  {row['posts']}"
+        )
+        if row.get('blocks_per_sec'):
+            print(f"{'':<17} 블록 {row['blocks']}개, {row['blocks_per_sec']:,} 블록/초 (최고 {row['seconds']:.3f}초)")
+        if row.get('stages'):
+            stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in sorted(row['stages'].items(), key=lambda item: -item[1]))
+            print(f"{'':<17} {stages}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    storage_dir = tempfile.mkdtemp(prefix='notion-bench-')
+    prepare_environment(args, storage_dir)
+    if not args.verbose:
+        logging.disable(logging.INFO) # 게시물마다 남는 INFO 로그는 측정을 방해하므로 경고 이상만 출력
+
+    results = []
+    try:
+        if 'render' in args.scenarios:
+            results.append(run_render_scenario(args))
+
+        db_scenarios = [name for name in DB_SCENARIOS if name in args.scenarios]
+        if db_scenarios:
+            # 프로젝트 모듈은 환경 변수를 정한 뒤에 임포트
+            import main as sync_main
+            from core import db_Manager, settings
+            from notion_handler.client import get_rate_limiter, set_notion_client
+            from content_processor.image_handler import shutdown_variant_pool
+            from .corpus import SyntheticCorpus
+            from .fake_notion import FakeNotionBackend, build_fake_notion_client
+            from .image_server import ImageServer
+
+            width, _, height = args.image_size.partition('x')
+            images = ImageServer(int(width), int(height)).start()
+            corpus = SyntheticCorpus(args.posts, args.blocks, args.depth, args.images, image_url=images.url_for, seed=args.seed)
+            backend = FakeNotionBackend(corpus, latency=args.latency, throttle_rate=args.throttle, seed=args.seed)
+            set_notion_client(build_fake_notion_client(backend, get_rate_limiter()))
+            try:
+                reset_database(db_Manager, settings)
+                results.append(run_sync_scenario('cold', sync_main, backend, images, full_sync=True, init_schema=True))
+                if results[-1]['result'] not in ('ok', 'partial'):
+                    # 첫 동기화가 실패하면 이후 시나리오의 숫자는 의미가 없음
+                    logging.disable(logging.NOTSET)
+                    logging.error(f"cold 동기화 결과가 '{results[-1]['result']}'이므로 나머지 DB 시나리오를 건너뜁니다.")
+                    db_scenarios = []
+                if 'noop' in db_scenarios:
+                    results.append(run_sync_scenario('noop', sync_main, backend, images, full_sync=True))
+                if 'noop-incremental' in db_scenarios:
+                    results.append(run_sync_scenario('noop-incremental', sync_main, backend, images, full_sync=False))
+                if 'edit' in db_scenarios:
+                    corpus.edit_page(0)
+                    results.append(run_sync_scenario('edit', sync_main, backend, images, full_sync=False))
+                if 'cold' not in args.scenarios:
+                    results = [row for row in results if row['scenario'] != 'cold']
+            finally:
+                shutdown_variant_pool()
+                images.stop()
+    finally:
+        logging.disable(logging.NOTSET)
+        if not args.keep:
+            shutil.rmtree(storage_dir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0 if all(row['result'] in ('ok', 'partial') for row in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,357 @@
+# Notion 블록 트리를 HTML로 미리 렌더링 (목차, 단어 수, 읽기 시간 포함)
+# 동기화 때 한 번 만들어 DB(post_renders)에 저장하므로, 웹 서버는 요청마다 마크다운을 파싱하지 않아도 됩니다.
+#
+# 모든 텍스트와 속성 값은 이스케이프하고 URL은 허용한 스킴만 쓰므로, 결과 HTML은 따로 정화(sanitize)할 필요가 없습니다.
+# (Notion 블록에서 임의의 HTML이 들어올 경로가 없음)
+# 이미지는 마크다운 변환 때 저장한 정보(unit_of_work)를 그대로 사용하므로 다시 내려받지 않습니다.
+
+import hashlib
+import html
+import json
+import math
+import re
+from urllib.parse import urlsplit
+
+from core import settings
+
+# 링크/이미지에 허용하는 URL 스킴 (상대 경로 '/...', '#...'도 허용)
+SAFE_URL_SCHEMES = {'http', 'https', 'mailto'}
+_URL_IGNORED_CHARS = re.compile(r'[\t\n\r]')
+
+# 렌더러의 출력 형식을 바꾸면 1 올립니다 (저장된 HTML이 모든 게시물에서 다시 렌더링됨)
+HTML_RENDERER_VERSION = 1
+
+# 본문 폭(max-w-4xl = 896px) 기준 이미지 sizes 속성
+IMAGE_SIZES = "(max-width: 896px) 100vw, 896px"
+
+# 블록 타입 -> 렌더링 함수 레지스트리 (markdown_converter.BLOCK_RENDERERS와 같은 방식)
+# 렌더링 함수는 (block, element, ctx)를 받아 ctx.out에 HTML을 쓰고,
+# 자식 블록을 안에 넣어야 하면 자식 뒤에 붙일 닫는 태그를 반환합니다 (아니면 None).
+HTML_BLOCK_RENDERERS = {}
+
+# 목록 항목 블록 타입 -> (여는 태그, 닫는 태그). 연속된 같은 타입 항목을 하나의 목록으로 묶음
+LIST_TAGS = {
+    'bulleted_list_item': ('<ul>', '</ul>'),
+    'numbered_list_item': ('<ol>', '</ol>'),
+    'to_do': ('<ul class="todo-list">', '</ul>'),
+}
+
+
+def html_block_renderer(*block_types):
+    def register(func):
+        for block_type in block_types:
+            HTML_BLOCK_RENDERERS[block_type] = func
+        return func
+    return register
+
+
+def escape(text):
+    return html.escape(text or '', quote=True)
+
+
+def safe_url(url):
+    """허용한 스킴의 URL이면 그대로, 아니면 None (javascript: 등 차단)."""
+    if not url:
+        return None
+    # 브라우저는 URL 안의 탭/줄바꿈을 무시하고 '\\'를 '/'로 읽으므로, '/\\evil.com'이나 '/\t/evil.com'도
+    # '//evil.com'처럼 다른 호스트를 가리키는 프로토콜 상대 URL이 됨
+    url = _URL_IGNORED_CHARS.sub('', url.strip())
+    if url.startswith(('/', '#')) and not url.startswith(('//', '/\\')):
+        return url
+    try:
+        scheme = urlsplit(url).scheme.lower()
+    except ValueError:
+        return None
+    return url if scheme in SAFE_URL_SCHEMES else None
+
+
+# <img srcset> / <source srcset> 값 ("경로 640w, 경로 1280w")
+def build_srcset(variants, fmt='webp'):
+    return ", ".join(
+        f"{v['web_path']} {v['width']}w"
+        for v in sorted(variants, key=lambda v: v['width']) if v['format'] == fmt
+    )
+
+
+def plain_text(rich_text_array):
+    return "".join(item.get('plain_text', '') for item in rich_text_array or ())
+
+
+# Notion의 rich_text 배열을 HTML 문자열로 변환 (마크다운 변환과 같은 순서로 스타일 적용: 코드, 스타일, 링크)
+def format_rich_text_array_for_html(rich_text_array):
+    chunks = []
+    for item in rich_text_array or ():
+        item_type = item.get('type')
+        if item_type == 'equation':
+            chunks.append(f'<span class="math">{escape(item["equation"]["expression"])}</span>')
+            continue
+        if item_type == 'text':
+            text_details = item.get('text') or {}
+            content = text_details.get('content', '')
+            link_url = (text_details.get('link') or {}).get('url')
+        else: # mention 등은 표시 텍스트만 사용
+            content = item.get('plain_text', '')
+            link_url = item.get('href')
+
+        styled = escape(content).replace('\n', '<br>')
+        annotations = item.get('annotations') or {}
+        if annotations.get('code'):
+            styled = f"<code>{styled}</code>"
+        if annotations.get('bold'):
+            styled = f"<strong>{styled}</strong>"
+        if annotations.get('italic'):
+            styled = f"<em>{styled}</em>"
+        if annotations.get('strikethrough'):
+            styled = f"<s>{styled}</s>"
+        if annotations.get('underline'):
+            styled = f"<u>{styled}</u>"
+        url = safe_url(link_url)
+        if url:
+            styled = f'<a href="{escape(url)}" rel="noopener noreferrer">{styled}</a>'
+        chunks.append(styled)
+    return "".join(chunks)
+
+
+# 제목 텍스트로 앵커 ID 생성 (GitHub 방식: 소문자, 공백은 '-', 문자/숫자/'-'/'_'만 유지, 중복은 -1, -2 ...)
+def heading_anchor(text, used_anchors):
+    base = re.sub(r'[^\w\- ]', '', text.strip().lower()).replace(' ', '-') or 'section'
+    anchor = base
+    suffix = 0
+    while anchor in used_anchors:
+        suffix += 1
+        anchor = f"{base}-{suffix}"
+    used_anchors.add(anchor)
+    return anchor
+
+
+class HtmlRenderContext:
+    """페이지 하나를 HTML로 렌더링하는 동안의 상태 (출력 버퍼, 목차, 단어 수)."""
+
+    def __init__(self, unit_of_work=None):
+        self.unit_of_work = unit_of_work
+        self.out = []
+        self.toc = []
+        self.word_count = 0
+        self.anchors = set()
+
+    def text(self, rich_text_array):
+        """rich_text를 HTML로 변환하면서 단어 수를 셉니다."""
+        self.word_count += len(plain_text(rich_text_array).split())
+        return format_rich_text_array_for_html(rich_text_array)
+
+
+@html_block_renderer('paragraph')
+def render_paragraph(block, element, ctx):
+    text = ctx.text(element.get('rich_text'))
+    if text:
+        ctx.out.append(f"<p>{text}</p>")
+    return ''
+
+
+@html_block_renderer('heading_1', 'heading_2', 'heading_3')
+def render_heading(block, element, ctx):
+    level = int(block['type'][-1])
+    title = plain_text(element.get('rich_text'))
+    anchor = heading_anchor(title, ctx.anchors)
+    ctx.toc.append({'level': level, 'text': title, 'id': anchor})
+    ctx.out.append(f'<h{level} id="{escape(anchor)}">{ctx.text(element.get("rich_text"))}</h{level}>')
+    return '' # 토글 제목의 자식
+
+
+@html_block_renderer('bulleted_list_item', 'numbered_list_item')
+def render_list_item(block, element, ctx):
+    ctx.out.append(f"<li>{ctx.text(element.get('rich_text'))}")
+    return '</li>'
+
+
+@html_block_renderer('to_do')
+def render_to_do(block, element, ctx):
+    checked = ' checked' if element.get('checked') else ''
+    ctx.out.append(f'<li><input type="checkbox" disabled{checked}> {ctx.text(element.get("rich_text"))}')
+    return '</li>'
+
+
+@html_block_renderer('quote')
+def render_quote(block, element, ctx):
+    ctx.out.append(f"<blockquote><p>{ctx.text(element.get('rich_text'))}</p>")
+    return '</blockquote>'
+
+
+@html_block_renderer('callout')
+def render_callout(block, element, ctx):
+    icon = element.get('icon') or {}
+    icon_html = ''
+    if icon.get('type') == 'emoji' and icon.get('emoji'):
+        icon_html = f'<span class="callout-icon">{escape(icon["emoji"])}</span>'
+    ctx.out.append(f'<aside class="callout">{icon_html}<div class="callout-body"><p>{ctx.text(element.get("rich_text"))}</p>')
+    return '</div></aside>'
+
+
+@html_block_renderer('toggle')
+def render_toggle(block, element, ctx):
+    ctx.out.append(f"<details><summary>{ctx.text(element.get('rich_text'))}</summary>")
+    return '</details>'
+
+
+@html_block_renderer('code')
+def render_code(block, element, ctx):
+    language = re.sub(r'[^a-z0-9+#-]', '', (element.get('language') or 'plaintext').lower())
+    code = escape(plain_text(element.get('rich_text')))
+    ctx.out.append(f'<pre><code class="language-{language}">{code}</code></pre>')
+    if element.get('caption'):
+        ctx.out.append(f'<p class="code-caption">{ctx.text(element.get("caption"))}</p>')
+    return None
+
+
+@html_block_renderer('divider')
+def render_divider(block, element, ctx):
+    ctx.out.append("<hr>")
+    return None
+
+
+@html_block_renderer('table')
+def render_table(block, element, ctx):
+    rows = [row.get('table_row', {}).get('cells', []) for row in block.get('children', []) if row.get('type') == 'table_row']
+    width = element.get('table_width') or max((len(cells) for cells in rows), default=0)
+    if not width:
+        return None
+
+    def cells_html(cells, header=False, row_header=False):
+        parts = []
+        for index in range(width):
+            text = ctx.text(cells[index]) if index < len(cells) else ''
+            if header:
+                parts.append(f'<th scope="col">{text}</th>')
+            elif row_header and index == 0:
+                parts.append(f'<th scope="row">{text}</th>')
+            else:
+                parts.append(f"<td>{text}</td>")
+        return "<tr>" + "".join(parts) + "</tr>"
+
+    ctx.out.append("<table>")
+    if element.get('has_column_header') and rows:
+        ctx.out.append("<thead>" + cells_html(rows.pop(0), header=True) + "</thead>")
+    ctx.out.append("<tbody>" + "".join(cells_html(cells, row_header=element.get('has_row_header')) for cells in rows) + "</tbody>")
+    ctx.out.append("</table>")
+    return None
+
+
+@html_block_renderer('column_list')
+def render_column_list(block, element, ctx):
+    ctx.out.append('<div class="columns">')
+    return '</div>'
+
+
+@html_block_renderer('column')
+def render_column(block, element, ctx):
+    ctx.out.append('<div class="column">')
+    return '</div>'
+
+
+@html_block_renderer('synced_block')
+def render_synced_block(block, element, ctx):
+    return ''
+
+
+@html_block_renderer('bookmark', 'embed', 'link_preview')
+def render_link_block(block, element, ctx):
+    url = safe_url(element.get('url'))
+    if not url:
+        return None
+    caption = ctx.text(element.get('caption')) or escape(url)
+    ctx.out.append(f'<p class="bookmark"><a href="{escape(url)}" rel="noopener noreferrer">{caption}</a></p>')
+    return None
+
+
+@html_block_renderer('image')
+def render_image(block, element, ctx):
+    block_id = block.get('id', '')
+    image = ctx.unit_of_work.images.get(block_id) if ctx.unit_of_work else None
+    if image:
+        src = image['web_path']
+        variants = ctx.unit_of_work.variants_for(block_id)
+    else: # 저장에 실패한 이미지는 마크다운과 같이 원본 URL 사용
+        image_type = element.get('type')
+        src = (element.get(image_type) or {}).get('url') if image_type in ('external', 'file') else None
+        variants = []
+    src = safe_url(src)
+    if not src:
+        return None
+
+    caption = ctx.text(element.get('caption'))
+    alt = escape(plain_text(element.get('caption')) or "image")
+    sources = "".join(
+        f'<source type="image/{fmt}" srcset="{escape(build_srcset(variants, fmt))}" sizes="{IMAGE_SIZES}">'
+        for fmt in ('avif', 'webp') if any(v['format'] == fmt for v in variants)
+    )
+    img = f'<img src="{escape(src)}" alt="{alt}" loading="lazy" decoding="async">'
+    ctx.out.append(
+        f"<figure>{f'<picture>{sources}{img}</picture>' if sources else img}"
+        f"{f'<figcaption>{caption}</figcaption>' if caption else ''}</figure>"
+    )
+    return None
+
+
+def reading_minutes(word_count):
+    if not word_count:
+        return 0
+    return max(1, math.ceil(word_count / settings.READING_WORDS_PER_MINUTE))
+
+
+# 렌더링 입력의 해시 (post_renders.content_hash에 저장해 다음 실행에서 다시 렌더링할지 판단)
+# 본문(마크다운)이 같아도 이미지 파생본(AVIF 사용, 폭 목록 등), 렌더러 버전, 읽기 속도 설정이 바뀌면 값이 달라집니다.
+def compute_render_hash(markdown_content, unit_of_work=None, image_ids=()):
+    variants = [
+        [image_id, sorted((v['format'], v['width'], v['web_path']) for v in unit_of_work.variants_for(image_id))]
+        for image_id in sorted(image_ids)
+    ] if unit_of_work else []
+    payload = [HTML_RENDERER_VERSION, settings.READING_WORDS_PER_MINUTE, markdown_content, variants]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def render_post_html(blocks, unit_of_work=None):
+    """이미 가져온(마크다운 변환에 쓴) 블록 트리를 HTML로 렌더링합니다.
+
+    {'html', 'toc': [{'level', 'text', 'id'}], 'word_count', 'reading_minutes'}를 반환합니다.
+    자식 블록은 트리에 이미 붙어 있는 것만 사용하고 Notion에 다시 요청하지 않습니다.
+    """
+    ctx = HtmlRenderContext(unit_of_work)
+    out = ctx.out
+    # 스택 항목: [블록 이터레이터, 자식을 다 쓴 뒤 붙일 닫는 태그, 열려 있는 목록의 블록 타입]
+    stack = [[iter(blocks), '', None]]
+    while stack:
+        frame = stack[-1]
+        for block in frame[0]:
+            block_type = block.get('type')
+            renderer = HTML_BLOCK_RENDERERS.get(block_type)
+            if renderer is None:
+                continue
+
+            # 목록 항목이 시작/끝나는 곳에서 <ul>/<ol>을 열고 닫음
+            list_type = block_type if block_type in LIST_TAGS else None
+            if frame[2] != list_type:
+                if frame[2]:
+                    out.append(LIST_TAGS[frame[2]][1])
+                if list_type:
+                    out.append(LIST_TAGS[list_type][0])
+                frame[2] = list_type
+            closing = renderer(block, block.get(block_type) or {}, ctx)
+            children = block.get('children') if block.get('has_children') else None
+            if closing is not None and children:
+                stack.append([iter(children), closing, None])
+                break
+            if closing:
+                out.append(closing)
+        else:
+            stack.pop()
+            if frame[2]:
+                out.append(LIST_TAGS[frame[2]][1])
+            if frame[1]:
+                out.append(frame[1])
+
+    return {
+        'html': "".join(out),
+        'toc': ctx.toc,
+        'word_count': ctx.word_count,
+        'reading_minutes': reading_minutes(ctx.word_count),
+    }
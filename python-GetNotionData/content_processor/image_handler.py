@@ -2,10 +2,17 @@
 
 import os
 import sys
+import hashlib
+import itertools
+import uuid
 import requests
-import shutil
+import threading
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # 상대 경로 임포트를 위해 프로젝트 루트를 sys.path에 추가하는 부분은 main.py에서 처리하거나,
 # 이 모듈이 다른 모듈에서 임포트될 때 Python의 모듈 검색 경로에 따라 core, utils 등이 인식되어야 합니다.
@@ -13,7 +20,9 @@ from urllib.parse import urlparse
 
 from core import settings # 프로젝트 설정 (IMAGE_HOST_STORAGE_PATH, IMAGE_WEB_BASE_PATH 등)
 from core import db_Manager
+from core import metrics
 from utils.file_utils import ensure_directory_exists # (utils/file_utils.py에 생성 예정)
+from . import image_variants
 
 
 # 로깅 설정
@@ -27,9 +36,95 @@ def generate_safe_filename(image_block_id, original_extension):
     return f"{clean_block_id}{original_extension}"
 
 
-# 파일 확장자 추출
-# (?)
-def determine_extension_from_url(image_url, default_ext='.png'):
+# 이미지 다운로드용 공유 HTTP 세션
+# 모든 다운로드가 같은 세션의 연결 풀을 쓰므로 같은 호스트(예: Notion S3)로의 연결과 TLS 세션을 재사용합니다.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                retry = Retry(
+                    total=settings.IMAGE_DOWNLOAD_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=(500, 502, 503, 504),
+                    allowed_methods=frozenset({'GET', 'HEAD'}),
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=settings.IMAGE_HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=settings.IMAGE_HTTP_POOL_MAXSIZE,
+                    max_retries=retry,
+                    pool_block=False
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session = session
+    return _http_session
+
+
+# 다운로드 스트림의 첫 청크 크기 (파일 형식 판별에도 사용)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_IMAGE_EXTENSION = '.png'
+
+# 파일 시그니처(매직 바이트) -> 확장자
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'BM', '.bmp'),
+    (b'\x00\x00\x01\x00', '.ico'),
+    (b'II*\x00', '.tiff'),
+    (b'MM\x00*', '.tiff'),
+]
+
+# Content-Type -> 확장자 (시그니처로 판별하지 못했을 때 GET 응답 헤더로 대신 판별)
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'image/svg+xml': '.svg',
+    'image/bmp': '.bmp',
+    'image/tiff': '.tiff',
+}
+
+# 확장자 없는 URL의 이미지를 이전에 저장했는지 찾을 때 확인하는 확장자
+KNOWN_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.bmp', '.ico', '.tiff')
+
+
+# 파일 앞부분의 매직 바이트로 이미지 확장자 판별 (모르면 None)
+def sniff_image_extension(head_bytes):
+    if not head_bytes:
+        return None
+    for signature, ext in IMAGE_SIGNATURES:
+        if head_bytes.startswith(signature):
+            return ext
+    if head_bytes[:4] == b'RIFF' and head_bytes[8:12] == b'WEBP':
+        return '.webp'
+    if head_bytes[4:8] == b'ftyp' and head_bytes[8:12] in (b'avif', b'avis'):
+        return '.avif'
+    text_head = head_bytes[:512].lstrip().lower()
+    if text_head.startswith(b'<svg') or (text_head.startswith(b'<?xml') and b'<svg' in text_head):
+        return '.svg'
+    return None
+
+
+def extension_from_content_type(content_type):
+    if not content_type:
+        return None
+    return CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+
+
+# 파일 확장자 추출 (URL 경로 기준, 네트워크 요청 없음)
+# URL에 확장자가 없으면 default_ext를 반환 (None이면 다운로드하면서 내용으로 판별)
+def determine_extension_from_url(image_url, default_ext=DEFAULT_IMAGE_EXTENSION):
 
     parsed_url = urlparse(image_url)
     original_filename = os.path.basename(parsed_url.path)
@@ -37,27 +132,397 @@ def determine_extension_from_url(image_url, default_ext='.png'):
 
     if ext and len(ext) > 1: # 유효한 확장자가 URL에 있는 경우
         return ext.lower()
-    
-    # URL에 확장자가 없는 경우, Content-Type 확인 시도
+
+    return default_ext
+
+
+# 이전에 저장한 이미지 파일 경로 찾기 (확장자를 모르면 알려진 확장자를 차례로 확인)
+def find_saved_image_file(save_dir, filename_base, extension=None):
+    candidates = [extension] if extension else KNOWN_IMAGE_EXTENSIONS
+    for ext in candidates:
+        path = os.path.join(save_dir, f"{filename_base}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# 콘텐츠 주소 저장소 디렉터리 (IMAGE_HOST_STORAGE_PATH 아래, 파일 이름은 내용의 SHA-256)
+CONTENT_STORE_DIR_NAME = 'objects'
+
+def get_content_store_dir():
+    return os.path.join(settings.IMAGE_HOST_STORAGE_PATH, CONTENT_STORE_DIR_NAME)
+
+def content_store_path(digest, extension):
+    return os.path.join(get_content_store_dir(), digest[:2], f"{digest}{extension}")
+
+# 콘텐츠 주소 저장소의 파일인지 (여러 이미지가 공유하므로 개별 삭제하지 않고 참조 수로 정리)
+def is_content_store_path(local_path):
+    if not local_path or not settings.IMAGE_HOST_STORAGE_PATH:
+        return False
+    store_dir = os.path.abspath(get_content_store_dir())
+    return os.path.abspath(local_path).startswith(store_dir + os.sep)
+
+
+# 이번 실행의 이미지 저장 통계
+_image_stats_lock = threading.Lock()
+_image_stats = {
+    'downloads': 0,            # 실제로 받은 이미지 수
+    'bytes_downloaded': 0,
+    'reused': 0,               # 이미 저장된 파일을 그대로 사용한 수 (다운로드 없음)
+    'not_modified': 0,         # 조건부 요청에 304를 받은 수
+    'probes': 0,               # 변경 확인용 range 요청 수
+    'files_written': 0,        # 디스크에 새로 쓴 파일 수
+    'deduplicated': 0,         # 같은 내용의 파일이 이미 있어 쓰지 않은 수
+    'bytes_deduplicated': 0,
+    'variants_encoded': 0,     # 새로 인코딩을 요청한 파생본 수
+    'variants_reused': 0,      # 같은 원본 해시의 파생본이 있어 인코딩하지 않은 수
+}
+
+def _count_image_stat(key, amount=1):
+    with _image_stats_lock:
+        _image_stats[key] += amount
+    metrics.inc(f'image_{key}_total', amount)
+
+def reset_image_stats():
+    with _image_stats_lock:
+        for key in _image_stats:
+            _image_stats[key] = 0
+
+def get_image_stats():
+    with _image_stats_lock:
+        return dict(_image_stats)
+
+def log_image_stats():
+    stats = get_image_stats()
+    logging.info(
+        f"이미지 저장 통계 (저장 방식: {settings.IMAGE_STORAGE_MODE}): 다운로드 {stats['downloads']}개 "
+        f"({stats['bytes_downloaded']} bytes), 기존 파일 사용 {stats['reused']}개 (304 {stats['not_modified']}개, range 확인 {stats['probes']}회), 새로 쓴 파일 {stats['files_written']}개, "
+        f"중복 제거 {stats['deduplicated']}개 ({stats['bytes_deduplicated']} bytes), "
+        f"파생본 인코딩 {stats['variants_encoded']}개, 파생본 재사용 {stats['variants_reused']}개"
+    )
+
+
+# 이미지 출처 지문(fingerprint)으로 images 테이블에 저장하는 필드
+#   source_key: Notion 파일은 서명 쿼리를 뺀 URL(파일 ID가 경로에 포함), 외부 이미지는 URL 전체
+#   source_size / source_etag / source_last_modified: 마지막으로 받은 응답의 Content-Length, ETag, Last-Modified
+FINGERPRINT_FIELDS = ('source_key', 'source_size', 'source_etag', 'source_last_modified', 'content_hash')
+
+# Notion이 호스팅하는 파일의 호스트 (서명된 URL은 매번 바뀌지만 경로는 파일마다 고정)
+NOTION_FILE_HOSTS = ('file.notion.so',)
+
+
+# Notion 내부 파일(만료되는 서명 URL)인지
+# Notion은 파일을 바꾸면 새 경로(파일 ID)로 올리므로, 같은 경로면 내용이 같다고 봅니다.
+def is_notion_hosted_url(image_url):
+    parsed_url = urlparse(image_url)
+    host = parsed_url.netloc.lower()
+    if host in NOTION_FILE_HOSTS:
+        return True
+    return host.endswith('.amazonaws.com') and 'X-Amz-Signature=' in parsed_url.query
+
+
+# 이미지 출처 키 (서명/만료 쿼리를 제외한, 실행마다 바뀌지 않는 값)
+def image_source_key(image_url):
+    if is_notion_hosted_url(image_url):
+        parsed_url = urlparse(image_url)
+        return f"{parsed_url.netloc}{parsed_url.path}"
+    return image_url
+
+
+def _parse_int(value):
     try:
-        response_head = requests.head(image_url, timeout=5, allow_redirects=True)
-        response_head.raise_for_status()
-        content_type = response_head.headers.get('content-type')
-        
-        if content_type:
-            if 'image/jpeg' in content_type:
-                return '.jpg'
-            elif 'image/png' in content_type:
-                return '.png'
-            elif 'image/gif' in content_type:
-                return '.gif'
-            elif 'image/webp' in content_type:
-                return '.webp'
-            
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# 응답 헤더에서 출처 지문 추출 (range 응답이면 Content-Range의 전체 크기 사용)
+def _response_fingerprint(response):
+    size = None
+    content_range = response.headers.get('content-range')
+    if content_range and '/' in content_range:
+        size = _parse_int(content_range.rsplit('/', 1)[1])
+    elif response.status_code == 200:
+        size = _parse_int(response.headers.get('content-length'))
+    return {
+        'source_size': size,
+        'source_etag': response.headers.get('etag'),
+        'source_last_modified': response.headers.get('last-modified'),
+    }
+
+
+# 저장된 검증자(ETag/Last-Modified)로 조건부 요청 헤더 만들기 (없으면 None)
+def conditional_request_headers(fingerprint):
+    headers = {}
+    if fingerprint.get('source_etag'):
+        headers['If-None-Match'] = fingerprint['source_etag']
+    if fingerprint.get('source_last_modified'):
+        headers['If-Modified-Since'] = fingerprint['source_last_modified']
+    return headers or None
+
+
+# 1바이트 range 요청으로 원본이 바뀌었는지 확인 (검증자가 없는 원본용)
+# 크기와 (있으면) ETag가 저장된 값과 같으면 True, 다르거나 판단할 수 없으면 False
+def probe_image_unchanged(image_url, fingerprint):
+    try:
+        with get_http_session().get(
+            image_url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=settings.IMAGE_DOWNLOAD_TIMEOUT
+        ) as response:
+            if response.status_code not in (200, 206):
+                return False
+            probed = _response_fingerprint(response)
     except requests.exceptions.RequestException as e:
-        logging.warning(f"이미지 확장자 확인 중 Content-Type 요청 실패 (URL: {image_url}): {e}")
-    
-    return default_ext
+        logging.warning(f"이미지 변경 확인(range) 요청 실패 (URL: {image_url}): {e}")
+        return False
+    _count_image_stat('probes')
+    if probed['source_size'] is None or probed['source_size'] != fingerprint.get('source_size'):
+        return False
+    if probed['source_etag'] and fingerprint.get('source_etag') and probed['source_etag'] != fingerprint['source_etag']:
+        return False
+    return True
+
+
+# 공유 세션으로 이미지를 받아 temp_dir의 임시 파일에 저장하면서 SHA-256을 계산
+# extension이 없으면 첫 청크의 매직 바이트(없으면 Content-Type)로 판별합니다 (별도 HEAD 요청 없음).
+# headers로 조건부 요청을 보낸 경우 304(변경 없음)이면 None을 반환합니다.
+# {'temp_path', 'extension', 'content_hash', 'content_size', 'source_size', 'source_etag', 'source_last_modified'} 반환
+def download_image_to_temp(image_url, temp_dir, extension=None, headers=None):
+    with metrics.timer('image_download_seconds'):
+        return _download_image_to_temp(image_url, temp_dir, extension, headers)
+
+def _download_image_to_temp(image_url, temp_dir, extension, headers):
+    with get_http_session().get(
+        image_url, headers=headers, stream=True, timeout=settings.IMAGE_DOWNLOAD_TIMEOUT
+    ) as response:
+        if response.status_code == 304:
+            _count_image_stat('not_modified')
+            return None
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+        first_chunk = next(chunks, b'')
+        if not extension:
+            extension = (
+                sniff_image_extension(first_chunk)
+                or extension_from_content_type(response.headers.get('content-type'))
+                or DEFAULT_IMAGE_EXTENSION
+            )
+        ensure_directory_exists(temp_dir)
+        temp_path = os.path.join(temp_dir, f".{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as out_file:
+                for chunk in itertools.chain((first_chunk,), chunks):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out_file.write(chunk)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        download = _response_fingerprint(response)
+    _count_image_stat('downloads')
+    _count_image_stat('bytes_downloaded', size)
+    if download['source_size'] is None:
+        download['source_size'] = size
+    download.update({'temp_path': temp_path, 'extension': extension, 'content_hash': digest.hexdigest(), 'content_size': size})
+    return download
+
+
+# 이미지를 받아 save_dir/filename_base.확장자 에 저장 (post 저장 방식)
+# 임시 파일에 받은 뒤 교체하므로, 받는 도중에도 기존 파일은 그대로 제공됩니다.
+# download_image_to_temp 결과에 'local_path'를 더해 반환 (304면 None)
+def stream_image_to_file(image_url, save_dir, filename_base, extension=None, headers=None):
+    download = download_image_to_temp(image_url, save_dir, extension, headers)
+    if download is None:
+        return None
+    download['local_path'] = os.path.join(save_dir, f"{filename_base}{download['extension']}")
+    os.replace(download.pop('temp_path'), download['local_path'])
+    _count_image_stat('files_written')
+    return download
+
+
+# 이미지를 받아 콘텐츠 주소 저장소(objects/<해시 앞 2자리>/<해시>.확장자)에 저장 (content 저장 방식)
+# 같은 내용의 파일이 이미 있으면 새로 쓰지 않습니다. download_image_to_temp 결과에 'local_path'를 더해 반환 (304면 None)
+def stream_image_to_content_store(image_url, extension=None, headers=None):
+    download = download_image_to_temp(image_url, os.path.join(get_content_store_dir(), '.tmp'), extension, headers)
+    if download is None:
+        return None
+    temp_path = download.pop('temp_path')
+    local_path = content_store_path(download['content_hash'], download['extension'])
+    if os.path.exists(local_path):
+        os.remove(temp_path)
+        _count_image_stat('deduplicated')
+        _count_image_stat('bytes_deduplicated', download['content_size'])
+    else:
+        ensure_directory_exists(os.path.dirname(local_path))
+        os.replace(temp_path, local_path)
+        _count_image_stat('files_written')
+    download['local_path'] = local_path
+    return download
+
+
+# 저장된 파일의 SHA-256 (내용 해시가 기록되지 않은 예전 파일용)
+def hash_local_file(local_path):
+    digest = hashlib.sha256()
+    with open(local_path, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- 이미지 파생본 (WebP/AVIF, 여러 너비) ---
+# 인코딩은 CPU를 많이 쓰므로 프로세스 풀에서 실행하고, 게시물 커밋 직전에 결과를 기다립니다.
+# 파생본 파일은 원본 내용 해시로 이름 붙이므로 원본이 바뀌지 않았으면 다시 인코딩하지 않습니다.
+
+# 파생본을 만드는 원본 확장자 (애니메이션 GIF, 벡터 SVG 등은 원본 그대로 사용)
+VARIANT_SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff'}
+VARIANT_DIR_NAME = 'variants'
+
+_variant_pool = None
+_variant_pool_lock = threading.Lock()
+
+def get_variant_pool():
+    # 동기화 스레드가 도는 중에 fork하지 않도록 spawn으로 작업 프로세스를 만듦
+    global _variant_pool
+    if _variant_pool is None:
+        with _variant_pool_lock:
+            if _variant_pool is None:
+                _variant_pool = ProcessPoolExecutor(
+                    max_workers=max(1, settings.IMAGE_VARIANT_WORKERS),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _variant_pool
+
+def shutdown_variant_pool():
+    global _variant_pool
+    with _variant_pool_lock:
+        if _variant_pool is not None:
+            _variant_pool.shutdown(wait=True)
+            _variant_pool = None
+
+
+def get_variant_formats():
+    formats = {'webp'}
+    if settings.IMAGE_VARIANT_AVIF:
+        formats.add('avif')
+    return sorted(formats & image_variants.supported_formats())
+
+
+def variant_local_path(source_hash, width, fmt):
+    return os.path.join(get_content_store_dir(), VARIANT_DIR_NAME, source_hash[:2], f"{source_hash}-{width}w.{fmt}")
+
+
+# 원본 이미지의 파생본 목록 계획 (원본보다 큰 너비는 만들지 않음)
+# [{'format', 'width', 'height', 'local_path', 'web_path'}] 반환
+def plan_image_variants(local_path, content_hash, web_path):
+    formats = get_variant_formats()
+    source_size = image_variants.read_image_size(local_path) if formats else None
+    if not source_size or not settings.IMAGE_VARIANT_WIDTHS:
+        return []
+    source_width, source_height = source_size
+    widths = {width for width in settings.IMAGE_VARIANT_WIDTHS if width < source_width}
+    widths.add(min(source_width, settings.IMAGE_VARIANT_WIDTHS[-1]))
+
+    web_path_base, _ = os.path.splitext(web_path)
+    variants = []
+    for width in sorted(widths):
+        height = max(1, round(source_height * width / source_width))
+        for fmt in formats:
+            variants.append({
+                'format': fmt,
+                'width': width,
+                'height': height,
+                'local_path': variant_local_path(content_hash, width, fmt),
+                'web_path': f"{web_path_base}-{width}w.{fmt}",
+                'source_hash': content_hash,
+            })
+    return variants
+
+
+# 파생본 인코딩을 프로세스 풀에 맡기고 계획된 파생본 목록을 반환 (단위 작업이 결과를 기다려 DB에 기록)
+def schedule_image_variants(image_id, local_path, content_hash, web_path, unit_of_work):
+    if not settings.IMAGE_VARIANTS_ENABLED or not image_variants.is_available() or unit_of_work is None:
+        return []
+    if os.path.splitext(local_path)[1].lower() not in VARIANT_SOURCE_EXTENSIONS or not content_hash:
+        return []
+
+    variants = plan_image_variants(local_path, content_hash, web_path)
+    jobs = []
+    for variant in variants:
+        if os.path.exists(variant['local_path']):
+            variant['size'] = os.path.getsize(variant['local_path'])
+        else:
+            jobs.append((variant['width'], variant['height'], variant['format'], variant['local_path']))
+
+    future = None
+    if jobs:
+        future = get_variant_pool().submit(
+            image_variants.encode_variants, local_path, jobs, settings.IMAGE_VARIANT_QUALITY
+        )
+    _count_image_stat('variants_encoded', len(jobs))
+    _count_image_stat('variants_reused', len(variants) - len(jobs))
+    unit_of_work.add_image_variants(image_id, variants, future)
+    return variants
+
+
+# 본문에 넣을 기본 파생본 (IMAGE_VARIANT_DEFAULT_WIDTH 이하에서 가장 큰 WebP, 없으면 가장 작은 WebP)
+def select_default_variant(variants):
+    webp_variants = sorted((v for v in variants if v['format'] == 'webp'), key=lambda v: v['width'])
+    if not webp_variants:
+        return None
+    fitting = [v for v in webp_variants if v['width'] <= settings.IMAGE_VARIANT_DEFAULT_WIDTH]
+    return fitting[-1] if fitting else webp_variants[0]
+
+
+# 원본 내용 해시의 파생본 파일 삭제 (공유 원본 파일이 정리될 때 함께 호출)
+def remove_image_variant_files(source_hash):
+    variant_dir = os.path.join(get_content_store_dir(), VARIANT_DIR_NAME, source_hash[:2])
+    try:
+        entries = list(os.scandir(variant_dir))
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for entry in entries:
+        if entry.name.startswith(f"{source_hash}-") and entry.is_file():
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                logging.warning(f"이미지 파생본 파일 삭제 실패 ({entry.path}): {e}")
+    return removed
+
+
+# DB에 이미 저장된 이미지 정보 (단위 작업이 있으면 게시물 단위로 한 번 조회한 결과 사용)
+def _get_existing_image_record(image_id, post_id, unit_of_work=None):
+    if unit_of_work is not None:
+        return unit_of_work.existing_images().get(image_id)
+    return (db_Manager.get_image_records_for_post(post_id) or {}).get(image_id)
+
+
+# 기존 파일이 있을 때 다시 받아야 하는지 결정
+# (다운로드 여부, 조건부 요청 헤더)를 반환합니다.
+def plan_image_download(image_url, source_key, existing_image_path, fingerprint, is_cover):
+    if not existing_image_path:
+        return True, None
+
+    stored_source_key = fingerprint.get('source_key')
+    if stored_source_key is None:
+        # 출처 정보가 없는 예전 행: 본문 이미지는 예전처럼 그대로 사용, 커버는 한 번 받아 지문을 남김
+        return is_cover, None
+    if stored_source_key != source_key:
+        return True, None # 다른 파일로 바뀜
+    if not is_cover or is_notion_hosted_url(image_url):
+        return False, None # 같은 Notion 파일 (또는 같은 URL의 본문 이미지)
+
+    # 같은 외부 URL의 커버: 내용이 바뀌었을 수 있으므로 저장된 검증자로 조건부 요청,
+    # 검증자가 없으면 range 요청으로 크기를 비교하고, 그래도 판단할 수 없으면 다시 받음
+    headers = conditional_request_headers(fingerprint)
+    if headers:
+        return True, headers
+    if fingerprint.get('source_size') is not None and probe_image_unchanged(image_url, fingerprint):
+        return False, None
+    return True, None
 
 
 # URL통해서 이미지 다운, 호스트 서버 경로에 저장.
@@ -69,7 +534,8 @@ def download_and_save_image(
         post_id: str,               # 해당 이미지가 속한 게시물의 ID
         post_slug: str,             # 게시물 슬러그 (이미지 파일 저장 경로용)
         image_caption: str = None,  # 이미지 캡션 내용
-        is_cover: bool = False      # 커버 이미지인지
+        is_cover: bool = False,     # 커버 이미지인지
+        unit_of_work=None           # db_Manager.PostUnitOfWork - 주어지면 DB 쓰기를 바로 하지 않고 모아둠
     ):
 
     if not image_url or not image_block_id or not post_id or not post_slug:
@@ -77,8 +543,9 @@ def download_and_save_image(
         return None
 
     try:
-        # 1. 파일 확장자 결정
-        original_extension = determine_extension_from_url(image_url)
+        # 1. 파일 확장자 결정 (URL에 없으면 다운로드하면서 내용으로 판별)
+        url_extension = determine_extension_from_url(image_url, default_ext=None)
+        source_key = image_source_key(image_url)
         
         # 2. 저장할 파일 이름 및 경로 설정
         if is_cover:
@@ -89,47 +556,91 @@ def download_and_save_image(
             filename_base = image_block_id.replace('-', '')
             unique_image_id_for_db = image_block_id
 
-        final_filename = f"{filename_base}{original_extension}"
-        
-        # 호스트 서버에 저장될 이미지 경로
-        post_image_save_dir = os.path.join(settings.IMAGE_HOST_STORAGE_PATH, post_slug)
-        ensure_directory_exists(post_image_save_dir) # utils.file_utils 에 구현 필요 # 뭐하는애여?
-        local_image_disk_path = os.path.join(post_image_save_dir, final_filename)
+        use_content_store = settings.IMAGE_STORAGE_MODE == 'content'
+        existing_record = _get_existing_image_record(unique_image_id_for_db, post_id, unit_of_work)
 
-        # 웹에서 접근할 최종 경로 (Next.js API 라우트 경로)
-        image_web_path = f"{settings.IMAGE_WEB_BASE_PATH}/{post_slug}/{final_filename}"
+        # 이전에 저장한 파일 찾기
+        #   content: DB에 기록된 경로 (게시물 slug가 바뀌어도 그대로 사용)
+        #   post: <slug>/<파일 이름> (URL에 확장자가 없으면 알려진 확장자로 찾음)
+        if use_content_store:
+            existing_image_path = existing_record['local_path'] if existing_record else None
+            if existing_image_path and not os.path.exists(existing_image_path):
+                existing_image_path = None
+        else:
+            post_image_save_dir = os.path.join(settings.IMAGE_HOST_STORAGE_PATH, post_slug)
+            ensure_directory_exists(post_image_save_dir) # utils.file_utils 에 구현 필요 # 뭐하는애여?
+            existing_image_path = find_saved_image_file(post_image_save_dir, filename_base, url_extension)
+        local_image_disk_path = existing_image_path
 
-        # 기본적으로 다운로드 수행
-        perform_download = True 
+        # 기존 파일의 출처 지문 (DB 행이 같은 파일을 가리킬 때만 유효)
+        fingerprint = {}
+        if existing_record and existing_record['local_path'] == existing_image_path:
+            fingerprint = {field: existing_record.get(field) for field in FINGERPRINT_FIELDS}
+        content_size = None
 
-        if os.path.exists(local_image_disk_path):
-            if is_cover:
-                # 커버 이미지는 URL이 변경되었을 가능성이 있으므로, 항상 재다운로드 (또는 URL 비교 후 재다운로드)
-                logging.info(f"커버 이미지가 이미 존재합니다: {local_image_disk_path}. Notion URL 변경 시 덮어쓰기 위해 다운로드를 진행합니다.")
-            else: # 본문 내 이미지의 경우
-                logging.info(f"본문 이미지가 이미 존재합니다: {local_image_disk_path}. 다운로드를 건너뜁니다.")
-                perform_download = False 
+        # 3. 다운로드 여부 결정 (출처 지문이 같으면 건너뜀)
+        perform_download, request_headers = plan_image_download(
+            image_url, source_key, existing_image_path, fingerprint, is_cover
+        )
+        if not perform_download:
+            logging.info(f"{'커버' if is_cover else '본문'} 이미지가 이미 최신입니다: {existing_image_path}. 다운로드를 건너뜁니다.")
+            _count_image_stat('reused')
+            fingerprint['source_key'] = source_key # 출처 정보가 없던 예전 행도 현재 출처로 기록
         
         if perform_download:
-            logging.info(f"이미지 다운로드 시작: {image_url} -> {local_image_disk_path}")
+            logging.info(
+                f"이미지 다운로드 시작: {image_url} ({settings.IMAGE_STORAGE_MODE} 저장 방식"
+                f"{', 조건부 요청' if request_headers else ''})"
+            )
             try:
-                response = requests.get(image_url, stream=True, timeout=10)
-                response.raise_for_status()
-                with open(local_image_disk_path, 'wb') as out_file:
-                    shutil.copyfileobj(response.raw, out_file)
-                del response
-                logging.info(f"이미지 다운로드 성공: {final_filename}")
+                if use_content_store:
+                    download = stream_image_to_content_store(image_url, url_extension, request_headers)
+                else:
+                    download = stream_image_to_file(
+                        image_url, post_image_save_dir, filename_base, url_extension, request_headers
+                    )
+                if download is None:
+                    # 304: 원본이 바뀌지 않았으므로 기존 파일 사용
+                    logging.info(f"원본 이미지가 바뀌지 않았습니다 (304): {existing_image_path}. 기존 파일을 사용합니다.")
+                    _count_image_stat('reused')
+                    fingerprint['source_key'] = source_key
+                else:
+                    local_image_disk_path = download['local_path']
+                    content_size = download['content_size']
+                    fingerprint = {field: download.get(field) for field in FINGERPRINT_FIELDS}
+                    fingerprint['source_key'] = source_key
+                    # 확장자가 바뀌었으면 이전 파일 정리 (post 저장 방식)
+                    if not use_content_store and existing_image_path and existing_image_path != local_image_disk_path:
+                        try:
+                            os.remove(existing_image_path)
+                        except OSError as e:
+                            logging.warning(f"이전 이미지 파일 삭제 실패 ({existing_image_path}): {e}")
+                    logging.info(f"이미지 다운로드 성공: {local_image_disk_path}")
             except requests.exceptions.RequestException as e:
                 logging.error(f"이미지 다운로드 중 네트워크 오류 발생 (URL: {image_url}): {e}")
                 # 다운로드 실패 시 기존 파일 사용
-                if os.path.exists(local_image_disk_path):
-                    logging.warning(f"다운로드 실패, 기존 이미지 파일을 사용합니다: {local_image_disk_path}")
+                if existing_image_path:
+                    logging.warning(f"다운로드 실패, 기존 이미지 파일을 사용합니다: {existing_image_path}")
+                    local_image_disk_path = existing_image_path
                 else:
                     return None # 그거도 실패하면 None
             except IOError as e:
-                logging.error(f"이미지 파일 저장 중 오류 발생 (Path: {local_image_disk_path}): {e}")
+                logging.error(f"이미지 파일 저장 중 오류 발생 (URL: {image_url}): {e}")
                 return None
+        # 웹에서 접근할 최종 경로 (Next.js API 라우트 경로)
+        # 저장 방식과 관계없이 /api/images/<slug>/<파일 이름> 형식을 유지 (라우트는 web_path로 local_path를 찾음)
+        _, saved_extension = os.path.splitext(local_image_disk_path)
+        final_filename = f"{filename_base}{saved_extension}"
+        image_web_path = f"{settings.IMAGE_WEB_BASE_PATH}/{post_slug}/{final_filename}"
+
+        # 내용 해시가 없는 예전 파일은 로컬에서 계산 (파생본 이름과 중복 판단에 사용)
+        if not fingerprint.get('content_hash'):
+            fingerprint['content_hash'] = hash_local_file(local_image_disk_path)
 
+        # 파생본(WebP/AVIF) 인코딩 예약 (프로세스 풀에서 실행, 게시물 커밋 전에 완료를 기다림)
+        schedule_image_variants(
+            unique_image_id_for_db, local_image_disk_path, fingerprint['content_hash'], image_web_path, unit_of_work
+        )
 
         logging.info(f"DB 정보 업데이트 시도.")
 
@@ -139,10 +650,21 @@ def download_and_save_image(
             'post_id': post_id,
             'local_path': local_image_disk_path,
             'web_path': image_web_path,
-            'caption': image_caption
+            'caption': image_caption,
+            'source_key': fingerprint.get('source_key'),
+            'source_size': fingerprint.get('source_size'),
+            'source_etag': fingerprint.get('source_etag'),
+            'source_last_modified': fingerprint.get('source_last_modified'),
+            'content_hash': fingerprint.get('content_hash'),
+            # 콘텐츠 주소 저장소에 새로 저장한 파일이면 image_blobs 행도 함께 기록
+            'content_addressed': content_size is not None and is_content_store_path(local_image_disk_path),
+            'content_size': content_size
         }
 
-        if not db_Manager.upsert_image_info(image_data_for_db):
+        if unit_of_work is not None:
+            # 게시물 단위 트랜잭션에서 한 번에 저장
+            unit_of_work.add_image(image_data_for_db)
+        elif not db_Manager.upsert_image_info(image_data_for_db):
             logging.error(f"이미지 정보 DB 저장/업데이트 실패: {unique_image_id_for_db}")
             return None 
 
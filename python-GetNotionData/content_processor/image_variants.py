@@ -0,0 +1,68 @@
+# 이미지 파생본(WebP/AVIF, 여러 너비) 인코딩
+# ProcessPoolExecutor의 작업 프로세스에서 실행되므로 Pillow와 표준 라이브러리만 임포트합니다.
+# (settings, DB, Notion 클라이언트를 임포트하면 작업 프로세스마다 다시 초기화됨)
+
+import os
+import uuid
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError: # Pillow가 없으면 파생본 단계를 건너뜀
+    Image = None
+
+# Pillow 포맷 이름
+PIL_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF'}
+
+
+def is_available():
+    return Image is not None
+
+
+def supported_formats():
+    if Image is None:
+        return set()
+    return {fmt for fmt in PIL_FORMATS if features.check(fmt)}
+
+
+def read_image_size(path):
+    """이미지 헤더만 읽어 (너비, 높이)를 반환합니다 (EXIF 회전 반영). 읽을 수 없으면 None."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            orientation = image.getexif().get(0x0112) # EXIF Orientation
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    if orientation in (5, 6, 7, 8): # 90도 회전된 사진
+        width, height = height, width
+    return width, height
+
+
+def encode_variants(source_path, jobs, quality=80):
+    """source_path를 한 번 디코딩해 jobs의 각 (너비, 높이, 포맷, 저장 경로)로 인코딩합니다.
+
+    임시 파일에 쓴 뒤 교체하므로 중간 상태의 파일이 보이지 않습니다.
+    [(저장 경로, 파일 크기)]를 반환합니다. 실패하면 예외를 그대로 전달합니다.
+    """
+    results = []
+    with Image.open(source_path) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'A' in source.getbands() or 'transparency' in source.info else 'RGB')
+        # 큰 너비부터 줄여가며 재사용 (매번 원본에서 줄이는 것보다 빠름)
+        current = source
+        for width, height, fmt, output_path in sorted(jobs, key=lambda job: job[0], reverse=True):
+            if current.size != (width, height):
+                current = current.resize((width, height), Image.Resampling.LANCZOS)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            temp_path = os.path.join(os.path.dirname(output_path), f".{uuid.uuid4().hex}.part")
+            try:
+                current.save(temp_path, format=PIL_FORMATS[fmt], quality=quality)
+                os.replace(temp_path, output_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            results.append((output_path, os.path.getsize(output_path)))
+    return results
@@ -1,15 +1,21 @@
 # Notion 블록을 마크다운으로 변환 (기존 format_rich_text_array, convert_blocks_to_markdown_text 등)
 
 import logging
+import time
 from notion_client import Client 
-from .image_handler import download_and_save_image 
-from notion_handler import client
+from core import metrics
+from .image_handler import download_and_save_image, select_default_variant
+from notion_handler.block_tree import children_source_id, fetch_block_tree
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Notion 클라이언트 초기화 (실제로는 notion_handler.client에서 가져와야 함)
-notion_client_instance = client.get_notion_client()
+# 자식 블록까지 렌더링하는 블록 타입 (이 타입만 트리 조회 시 자식을 가져옴)
+EXPANDED_BLOCK_TYPES = {
+    'bulleted_list_item', 'numbered_list_item', 'to_do', 'toggle', 'quote', 'callout',
+    'heading_1', 'heading_2', 'heading_3', # 토글 제목
+    'table', 'column_list', 'column', 'synced_block',
+}
 
 # Notion의 rich_text 배열을 마크다운 문자열로 변환
 def format_rich_text_array_for_markdown(rich_text_array):
@@ -59,157 +65,339 @@ def format_rich_text_array_for_markdown(rich_text_array):
 
 
 
+# 블록 타입 -> 렌더링 함수 레지스트리
+# 렌더링 함수는 (block, element, ctx, prefix)를 받아 ctx.writer에 줄을 쓰고,
+# 자식 블록을 이어서 렌더링해야 하면 자식 줄 앞에 붙일 접두어(들여쓰기, '> ' 등)를 반환합니다 (아니면 None).
+BLOCK_RENDERERS = {}
+
+def block_renderer(*block_types):
+    def register(func):
+        for block_type in block_types:
+            BLOCK_RENDERERS[block_type] = func
+        return func
+    return register
+
+
+class MarkdownWriter:
+    """마크다운 줄을 한 번에 쓰는 버퍼. 연속된 빈 줄과 앞뒤 빈 줄을 쓰는 시점에 바로 정리합니다."""
+
+    __slots__ = ('_lines', '_pending_blank')
+
+    def __init__(self):
+        self._lines = []
+        self._pending_blank = None # 다음 내용 줄 앞에 넣을 빈 줄 (인용 안이면 '>')
+
+    def line(self, prefix, text):
+        if self._pending_blank is not None:
+            self._lines.append(self._pending_blank)
+            self._pending_blank = None
+        self._lines.append(prefix + text)
+
+    def lines(self, prefix, text):
+        """여러 줄 텍스트의 모든 줄에 접두어를 붙여 씁니다."""
+        if self._pending_blank is not None:
+            self._lines.append(self._pending_blank)
+            self._pending_blank = None
+        if '\n' in text:
+            self._lines.extend([prefix + text_line for text_line in text.split('\n')])
+        else:
+            self._lines.append(prefix + text)
+
+    def blank(self, prefix=''):
+        if self._lines:
+            self._pending_blank = prefix.rstrip() if prefix else ''
+
+    def getvalue(self):
+        return "\n".join(self._lines)
+
+
+class RenderContext:
+    """페이지 하나를 렌더링하는 동안 공유하는 상태 (이미지 저장 정보, 자식 블록 조회)."""
+
+    def __init__(self, notion, page_id, post_id, post_slug, unit_of_work=None):
+        self.notion = notion
+        self.page_id = page_id
+        self.post_id = post_id
+        self.post_slug = post_slug
+        self.unit_of_work = unit_of_work
+        self.writer = MarkdownWriter()
+        self.used_image_ids = set()
+        self.block_count = 0
+        self.image_seconds = 0.0 # 본문 이미지 처리(download_and_save_image)에 쓴 시간
+        self.unsupported = {} # 블록 타입 -> 개수
+
+    def children(self, block):
+        """블록의 자식 목록. 트리 조회 때 펼치지 않은 블록이면 공유 조회기(캐시 포함)로 가져옵니다."""
+        if not block.get('has_children'):
+            return []
+        if 'children' not in block:
+            try:
+                block['children'] = fetch_block_tree(
+                    self.notion, children_source_id(block), expand_types=EXPANDED_BLOCK_TYPES
+                )
+            except Exception as e:
+                logging.error(f"블록(ID: {block.get('id')})의 자식 블록을 가져오는 중 오류 발생: {e}")
+                block['children'] = []
+        return block['children']
+
+
+def _text(element, key='rich_text'):
+    return format_rich_text_array_for_markdown(element.get(key, ()))
+
+
+# 목록 블록 타입 -> (표시, 자식 줄 들여쓰기). 자식은 표시 뒤 내용 시작 위치에 맞춰 들여써야 같은 항목에 속함
+LIST_MARKERS = {
+    'bulleted_list_item': ("- ", "  "),
+    'numbered_list_item': ("1. ", "   "), # 순서 있는 목록은 Markdown 렌더러가 번호를 자동으로 매기므로 '1.'로 시작
+}
+
+
+@block_renderer('paragraph')
+def render_paragraph(block, element, ctx, prefix):
+    text = _text(element)
+    ctx.writer.blank(prefix)
+    if text.strip():
+        ctx.writer.lines(prefix, text)
+        ctx.writer.blank(prefix) # 문단 간격
+    # 들여쓴 자식 블록은 트리 조회 시 펼치지 않지만, 이미 있으면 렌더링
+    return prefix if 'children' in block else None
+
+
+@block_renderer('heading_1', 'heading_2', 'heading_3')
+def render_heading(block, element, ctx, prefix):
+    level = int(block['type'][-1])
+    ctx.writer.blank(prefix)
+    ctx.writer.line(prefix, f"{'#' * level} {_text(element)}")
+    ctx.writer.blank(prefix)
+    return prefix # 토글 제목의 자식
+
+
+@block_renderer('bulleted_list_item', 'numbered_list_item', 'to_do')
+def render_list_item(block, element, ctx, prefix):
+    if block['type'] == 'to_do':
+        marker, indent = ("- [x] " if element.get('checked') else "- [ ] "), "  "
+    else:
+        marker, indent = LIST_MARKERS[block['type']]
+    text = _text(element)
+    child_prefix = prefix + indent
+    if '\n' in text:
+        first_line, _, rest = text.partition('\n')
+        ctx.writer.line(prefix, marker + first_line)
+        ctx.writer.lines(child_prefix, rest)
+    else:
+        ctx.writer.line(prefix, marker + text)
+    return child_prefix
+
+
+@block_renderer('quote', 'callout')
+def render_quote(block, element, ctx, prefix):
+    text = _text(element)
+    if block['type'] == 'callout':
+        icon = element.get('icon') or {}
+        if icon.get('type') == 'emoji' and icon.get('emoji'):
+            text = f"{icon['emoji']} {text}"
+    quote_prefix = prefix + "> "
+    ctx.writer.blank(prefix)
+    ctx.writer.lines(quote_prefix, text)
+    ctx.writer.blank(prefix) # 인용구 다음 간격 (자식이 있으면 자식이 '>' 빈 줄로 바꿈)
+    return quote_prefix
+
+
+@block_renderer('toggle')
+def render_toggle(block, element, ctx, prefix):
+    ctx.writer.blank(prefix)
+    ctx.writer.lines(prefix, f"▸ {_text(element)}")
+    ctx.writer.blank(prefix)
+    return prefix
+
+
+@block_renderer('code')
+def render_code(block, element, ctx, prefix):
+    text_content = "".join(item.get('plain_text', '') for item in element.get('rich_text', []))
+    language = element.get('language', 'plaintext')
+    caption = _text(element, 'caption')
+    ctx.writer.blank(prefix)
+    ctx.writer.line(prefix, f"```{language}")
+    ctx.writer.lines(prefix, text_content)
+    ctx.writer.line(prefix, "```")
+    if caption:
+        ctx.writer.line(prefix, f"*{caption}*")
+    ctx.writer.blank(prefix)
+    return None
+
+
+@block_renderer('divider')
+def render_divider(block, element, ctx, prefix):
+    ctx.writer.blank(prefix)
+    ctx.writer.line(prefix, "---")
+    ctx.writer.blank(prefix)
+    return None
+
+
+# 표 셀 안에서는 '|'와 줄바꿈을 쓸 수 없음
+def _table_cell(rich_text_array):
+    return format_rich_text_array_for_markdown(rich_text_array).replace('|', '\\|').replace('\n', ' ')
+
+
+@block_renderer('table')
+def render_table(block, element, ctx, prefix):
+    rows = [row.get('table_row', {}).get('cells', []) for row in ctx.children(block) if row.get('type') == 'table_row']
+    width = element.get('table_width') or max((len(cells) for cells in rows), default=0)
+    if not width:
+        return None
+
+    def format_row(cells, row_header=False):
+        texts = [_table_cell(cell) for cell in cells[:width]] + [''] * (width - len(cells))
+        if row_header and texts[0]:
+            texts[0] = f"**{texts[0]}**"
+        return "| " + " | ".join(texts) + " |"
+
+    # GFM 표는 머리글 행이 꼭 있어야 하므로, 열 머리글이 없으면 빈 머리글 행을 씀
+    header_cells = rows.pop(0) if element.get('has_column_header') and rows else []
+    ctx.writer.blank(prefix)
+    ctx.writer.line(prefix, format_row(header_cells))
+    ctx.writer.line(prefix, "| " + " | ".join(["---"] * width) + " |")
+    for cells in rows:
+        ctx.writer.line(prefix, format_row(cells, element.get('has_row_header')))
+    ctx.writer.blank(prefix)
+    return None
+
+
+# 여러 단(column)은 마크다운으로 나란히 놓을 수 없으므로 위에서부터 차례로 렌더링
+@block_renderer('column_list', 'column', 'synced_block')
+def render_container(block, element, ctx, prefix):
+    return prefix
+
+
+@block_renderer('bookmark', 'embed', 'link_preview')
+def render_link_block(block, element, ctx, prefix):
+    url = element.get('url')
+    if not url:
+        return None
+    caption = _text(element, 'caption')
+    ctx.writer.blank(prefix)
+    ctx.writer.line(prefix, f"[{caption or url}]({url})")
+    ctx.writer.blank(prefix)
+    return None
+
+
+@block_renderer('image')
+def render_image(block, element, ctx, prefix):
+    block_id = block.get('id', '') # Notion 블록 ID를 이미지 고유 ID로 사용
+    original_url = ""
+    if element.get('type') == 'external':
+        original_url = element['external']['url']
+    elif element.get('type') == 'file': # Notion 내부 파일 (만료되는 URL)
+        original_url = element['file']['url']
+
+    caption_text = _text(element, 'caption')
+    alt_text = caption_text if caption_text else "image" # 캡션이 없으면 "image"
+
+    if not (original_url and block_id):
+        logging.warning(f"이미지 블록에 URL 또는 ID가 없습니다: {block}")
+        return None
+
+    started = time.perf_counter()
+    web_path = download_and_save_image(
+        image_url=original_url,
+        image_block_id=block_id,
+        post_id=ctx.post_id,     # DB 게시물 ID
+        post_slug=ctx.post_slug,
+        image_caption=caption_text,
+        is_cover=False, # 본문 내 이미지는 커버가 아님
+        unit_of_work=ctx.unit_of_work
+    )
+    ctx.image_seconds += time.perf_counter() - started
+    if web_path:
+        # 파생본이 있으면 기본 너비의 WebP를 본문에 사용 (나머지 너비는 image_variants로 srcset 구성)
+        default_variant = select_default_variant(ctx.unit_of_work.variants_for(block_id)) if ctx.unit_of_work else None
+        if default_variant:
+            web_path = default_variant['web_path']
+        ctx.used_image_ids.add(block_id)
+    else:
+        logging.warning(f"이미지 처리 실패 (Block ID: {block_id}, URL: {original_url}). 마크다운에 원본 URL 포함 시도.")
+        # 실패 시, 만료될 수 있는 원본 URL이라도 포함
+        web_path = original_url
+
+    ctx.writer.blank(prefix)
+    ctx.writer.line(prefix, f"![{alt_text}]({web_path})")
+    if caption_text:
+        ctx.writer.line(prefix, f"*{caption_text}*")
+    ctx.writer.blank(prefix) # 이미지 다음 간격
+    return None
+
+
+# 이미 가져온 블록 트리를 재귀 없이 (명시적 스택으로) 순서대로 렌더링
+def render_block_tree(blocks, ctx, prefix=''):
+    renderers = BLOCK_RENDERERS
+    block_count = 0
+    stack = [(iter(blocks), prefix)]
+    while stack:
+        blocks_iter, prefix = stack[-1]
+        for block in blocks_iter:
+            block_count += 1
+            block_type = block.get('type')
+            renderer = renderers.get(block_type)
+            if renderer is None:
+                ctx.unsupported[block_type] = ctx.unsupported.get(block_type, 0) + 1
+                continue
+            child_prefix = renderer(block, block.get(block_type) or {}, ctx, prefix)
+            if child_prefix is not None and block.get('has_children'):
+                children = ctx.children(block)
+                if children:
+                    # 자식부터 렌더링하고, 끝나면 이 이터레이터의 나머지 형제로 돌아옴
+                    stack.append((iter(children), child_prefix))
+                    break
+        else:
+            stack.pop()
+    ctx.block_count += block_count
+
+
+# 페이지의 블록 트리를 렌더링에 필요한 만큼 펼쳐서 가져옵니다 (오류 시 None)
+# 같은 트리를 마크다운 변환과 HTML 렌더링(html_renderer)에 함께 사용합니다.
+def fetch_page_block_tree(notion_client_instance, page_id):
+    try:
+        blocks = fetch_block_tree(notion_client_instance, page_id, expand_types=EXPANDED_BLOCK_TYPES)
+    except Exception as e:
+        logging.error(f"페이지(ID: {page_id})의 블록을 가져오는 중 오류 발생: {e}")
+        return None
+    logging.info(f"페이지(ID: {page_id})에서 {len(blocks)}개의 블록을 가져왔습니다.")
+    return blocks
+
+
 # Notion 페이지의 블록 리스트를 마크다운 텍스트로 변환
 # 본문 내 이미지 다운로드 및 DB 저장 로직을 포함합니다.
+# 단계별 시간은 겹치지 않게 이미지 처리(image_download)와 나머지 렌더링(markdown_render)으로 나눠 기록합니다.
 def convert_blocks_to_markdown(
         notion_client_instance: Client,     # Notion 클라이언트 인스턴스
         page_id: str,                       # 현재 페이지 ID
         post_id: str,                       # DB에 저장된 게시물 ID (images.post_id)
         post_slug: str,                     # 이미지 저장 경로 및 웹 경로 구성용
-        blocks=None,                        # 초기 호출 시 None, 재귀 호출 시 블록 리스트
-        indent_level=0
+        blocks=None,                        # None이면 페이지의 블록 트리를 가져옴, 이미 가져온 블록 리스트를 넘길 수도 있음
+        indent_level=0,
+        unit_of_work=None                   # db_Manager.PostUnitOfWork - 이미지 DB 정보를 모아둘 단위 작업
     ):
 
-    # 최상위 호출 시
-    if blocks is None: 
-        try:
-            all_blocks_data = []
-            next_cursor = None
-            while True:
-                response = notion_client_instance.blocks.children.list(
-                    block_id=page_id, 
-                    start_cursor=next_cursor
-                )
-                all_blocks_data.extend(response.get("results", []))
-                next_cursor = response.get("next_cursor")
-                if not next_cursor:
-                    break
-
-            blocks_to_process = all_blocks_data
-            logging.info(f"페이지(ID: {page_id})에서 {len(blocks_to_process)}개의 블록을 가져왔습니다.")
-        except Exception as e:
-            logging.error(f"페이지(ID: {page_id})의 블록을 가져오는 중 오류 발생: {e}")
+    # 블록 트리 전체를 먼저 가져온 뒤 렌더링
+    if blocks is None:
+        blocks = fetch_page_block_tree(notion_client_instance, page_id)
+        if blocks is None:
             return f"# Error fetching blocks for page {page_id}.", set()
-    else: # 재귀 호출 시
-        blocks_to_process = blocks
-
-    markdown_lines = []
-    used_image_block_ids_in_current_call = set() # 현재 호출 스코프에서 사용된 이미지 ID
-    indent = "  " * indent_level
-
-    for block in blocks_to_process:
-        block_type = block['type']
-        element = block.get(block_type, {})
-        block_id = block.get('id', '') # 각 블록의 고유 ID
-
-        # 각 블록 타입에 따른 마크다운 변환 로직
-        if block_type == 'paragraph':
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            if text.strip() or not markdown_lines or markdown_lines[-1]: # 비어있지 않거나, 첫 줄이 아니거나, 이전 줄이 공백이 아니면
-                markdown_lines.append(indent + text)
-                markdown_lines.append("") # 문단 간격
-        elif block_type == 'heading_1':
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            markdown_lines.append(f"# {text}\n")
-        elif block_type == 'heading_2':
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            markdown_lines.append(f"## {text}\n")
-        elif block_type == 'heading_3':
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            markdown_lines.append(f"### {text}\n")
-        
-        elif block_type == 'bulleted_list_item':
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            markdown_lines.append(f"{indent}- {text}")
-            if block.get('has_children'):
-                child_md, child_img_ids = convert_blocks_to_markdown(
-                    notion_client_instance, block['id'], post_id, post_slug, None, indent_level + 1
-                )
-                markdown_lines.append(child_md)
-                used_image_block_ids_in_current_call.update(child_img_ids)
-        
-        elif block_type == 'numbered_list_item':
-            # 순서 있는 목록은 Markdown 렌더러가 번호를 자동으로 매기므로 '1.'로 시작
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            markdown_lines.append(f"{indent}1. {text}")
-            if block.get('has_children'):
-                child_md, child_img_ids = convert_blocks_to_markdown(
-                    notion_client_instance, block['id'], post_id, post_slug, None, indent_level + 1
-                )
-                markdown_lines.append(child_md)
-                used_image_block_ids_in_current_call.update(child_img_ids)
-
-        elif block_type == 'quote':
-            text = format_rich_text_array_for_markdown(element.get('rich_text', []))
-            # 각 줄에 > 적용
-            markdown_lines.extend([f"{indent}> {line}" for line in text.split('\n')])
-            markdown_lines.append("") # 인용구 다음 간격
-
-        elif block_type == 'code':
-            text_content = element.get('rich_text', [])[0].get('plain_text', '') if element.get('rich_text') else ''
-            language = element.get('language', 'plaintext')
-            caption = format_rich_text_array_for_markdown(element.get('caption', []))
-            markdown_lines.append(f"{indent}```{language}")
-            markdown_lines.append(text_content)
-            markdown_lines.append(f"{indent}```")
-            if caption:
-                markdown_lines.append(f"{indent}*{caption}*")
-            markdown_lines.append("")
-
-        elif block_type == 'divider':
-            markdown_lines.append(f"{indent}--- \n")
-
-        elif block_type == 'image':
-            image_data = element
-            original_url = ""
-            if image_data.get('type') == 'external':
-                original_url = image_data['external']['url']
-            elif image_data.get('type') == 'file': # Notion 내부 파일 (만료되는 URL)
-                original_url = image_data['file']['url']
-            
-            caption_text = format_rich_text_array_for_markdown(image_data.get('caption', []))
-            alt_text = caption_text if caption_text else "image" # 캡션이 없으면 "image"
-            
-            if original_url and block_id:
-                # image_handler.py의 함수 호출
-                web_path = download_and_save_image(
-                    image_url=original_url,
-                    image_block_id=block_id, # Notion 블록 ID를 이미지 고유 ID로 사용
-                    post_id=post_id,         # DB 게시물 ID
-                    post_slug=post_slug,
-                    image_caption=caption_text,
-                    is_cover=False # 본문 내 이미지는 커버가 아님
-                )
-                if web_path:
-                    markdown_lines.append(f"{indent}![{alt_text}]({web_path})")
-                    if caption_text:
-                        markdown_lines.append(f"{indent}*{caption_text}*")
-                    markdown_lines.append("") # 이미지 다음 간격
-                    used_image_block_ids_in_current_call.add(block_id)
-                else:
-                    logging.warning(f"이미지 처리 실패 (Block ID: {block_id}, URL: {original_url}). 마크다운에 원본 URL 포함 시도.")
-                    # 실패 시, 만료될 수 있는 원본 URL이라도 포함하거나, 플레이스홀더를 넣을 수 있음
-                    markdown_lines.append(f"{indent}![{alt_text}]({original_url}) ")
-                    if caption_text:
-                        markdown_lines.append(f"{indent}*{caption_text}*")
-                    markdown_lines.append("")
-            else:
-                logging.warning(f"이미지 블록에 URL 또는 ID가 없습니다: {block}")
-        
-
-    # 연속된 빈 줄 제거 및 최종 마크다운 생성
-    final_markdown_lines = []
-    for i, line in enumerate(markdown_lines):
-        # 현재 줄이 비어있고, 이전 줄도 비어있으면(이미 추가된 최종 라인 기준) 중복 빈 줄로 간주하여 건너뜀
-        if not line.strip() and final_markdown_lines and not final_markdown_lines[-1].strip():
-            continue
-        final_markdown_lines.append(line)
-    
-    # 마지막 줄이 공백이면 제거 (선택적)
-    if final_markdown_lines and not final_markdown_lines[-1].strip():
-        final_markdown_lines.pop()
-
-    return "\n".join(final_markdown_lines), used_image_block_ids_in_current_call
+
+    ctx = RenderContext(notion_client_instance, page_id, post_id, post_slug, unit_of_work)
+    started = time.perf_counter()
+    render_block_tree(blocks, ctx, "  " * indent_level)
+    elapsed = time.perf_counter() - started - ctx.image_seconds
+    metrics.observe('sync_stage_seconds', elapsed, stage='markdown_render')
+    metrics.observe('sync_stage_seconds', ctx.image_seconds, stage='image_download')
+
+    if ctx.unsupported:
+        logging.info(f"페이지(ID: {page_id})에서 지원하지 않는 블록 타입을 건너뜀: {ctx.unsupported}")
+    logging.debug(
+        f"페이지(ID: {page_id}) 렌더링: 블록 {ctx.block_count}개, {elapsed * 1000:.1f}ms "
+        f"({ctx.block_count / elapsed if elapsed else 0:,.0f} 블록/초)"
+    )
+    return ctx.writer.getvalue(), ctx.used_image_ids
 
 
 if __name__ == '__main__':
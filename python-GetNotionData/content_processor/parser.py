@@ -6,6 +6,17 @@ from datetime import datetime
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 블로그에 게시되는 Status 값
+PUBLISHED_STATUS = "발행됨"
+
+# 페이지가 현재 '발행됨' 상태인지 (보관/휴지통 페이지는 제외)
+def is_published_page(page_data):
+    if page_data.get("archived") or page_data.get("in_trash"):
+        return False
+    status_prop = page_data.get("properties", {}).get("Status", {}).get("select") or {}
+    return status_prop.get("name") == PUBLISHED_STATUS
+
+
 # Notion 페이지 API 응답으로 받은 페이지 데이터에서 주요 속성을 파싱하여 딕셔너리로 반환 
 def parse_notion_page_properties(page_data):
     # 페이지 기본 속성 정보
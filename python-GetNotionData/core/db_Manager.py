@@ -1,53 +1,215 @@
 import mysql.connector
 from mysql.connector import errorcode
+import hashlib
+import functools
+import json
 import logging
+import threading
+from contextlib import contextmanager
 from . import settings 
+from . import metrics
+from .db_pool import ConnectionPool
 import os
 
 # 로깅 설정
 # 일반적인 print문과는 다름(*)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_db_connection():
+# 모든 함수가 공유하는 커넥션 풀 (첫 사용 시 생성)
+_pool = None
+_pool_lock = threading.Lock()
+
+# 자주 실행되는 쿼리 (서버 측 prepared statement로 실행)
+# prepared 커서는 같은 문자열 객체로 재실행될 때 PREPARE를 생략하므로 모듈 상수로 둡니다.
+SQL_SELECT_POST_LAST_EDITED_TIME = "SELECT notion_last_edited_time FROM posts WHERE id = %s"
+SQL_UPSERT_IMAGE = """
+    INSERT INTO images (id, post_id, local_path, web_path, caption, content_hash,
+                        source_key, source_size, source_etag, source_last_modified)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        post_id = VALUES(post_id),
+        local_path = VALUES(local_path),
+        web_path = VALUES(web_path),
+        caption = VALUES(caption),
+        content_hash = VALUES(content_hash),
+        source_key = VALUES(source_key),
+        source_size = VALUES(source_size),
+        source_etag = VALUES(source_etag),
+        source_last_modified = VALUES(source_last_modified),
+        created_at = CURRENT_TIMESTAMP
+    """
+SQL_UPSERT_IMAGE_BLOB = """
+    INSERT INTO image_blobs (digest, local_path, size)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        local_path = VALUES(local_path),
+        size = VALUES(size)
+    """
+SQL_INSERT_IMAGE_VARIANT = """
+    INSERT INTO image_variants (image_id, format, width, height, size, local_path, web_path, source_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+SQL_DELETE_IMAGE_VARIANTS = "DELETE FROM image_variants WHERE image_id = %s"
+SQL_SELECT_IMAGE_IDS_FOR_POST = "SELECT id FROM images WHERE post_id = %s"
+SQL_SELECT_IMAGE_LOCAL_PATH = "SELECT local_path FROM images WHERE id = %s"
+SQL_DELETE_IMAGE = "DELETE FROM images WHERE id = %s"
+
+
+# 공개 함수의 호출 시간 기록 (db_call_seconds, call=함수 이름)
+# db_round_trips_total/db_query_seconds는 왕복 단위라 어느 함수가 느려졌는지 알 수 없으므로 함수 단위로도 측정합니다.
+def db_call(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with metrics.timer('db_call_seconds', call=func.__qualname__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def get_pool():
+    """공유 커넥션 풀을 반환합니다 (없으면 settings 값으로 생성)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings.require(*settings.DB_REQUIRED_SETTINGS)
+                _pool = ConnectionPool(
+                    connect_kwargs={
+                        'host': settings.DB_HOST,           # 데이터베이스 서버 주소
+                        'user': settings.DB_USER,           # 데이터베이스 사용자 이름
+                        'password': settings.DB_PASSWORD,   # 데이터베이스 비밀번호
+                        'database': settings.DB_NAME,       # 연결할 데이터베이스 이름
+                        'port': settings.DB_PORT,           # 서버 포트
+                    },
+                    size=settings.DB_POOL_SIZE,
+                    ping_interval=settings.DB_POOL_PING_INTERVAL,
+                    checkout_timeout=settings.DB_POOL_TIMEOUT,
+                )
+    return _pool
+
+def get_db_connection(read_only=False):
+    """풀에서 MySQL 연결을 빌립니다. 사용 후 반드시 close_db_connection()으로 반납해야 합니다.
+
+    read_only=True면 autocommit 연결을 빌립니다. SELECT만 하는 함수는 이것을 써야 반납할 때 ROLLBACK 왕복이 생기지 않습니다.
+    """
     try:
-        #MySQL DB연결
-        conn = mysql.connector.connect(
-            host=settings.DB_HOST,           # 데이터베이스 서버 주소
-            user=settings.DB_USER,           # 데이터베이스 사용자 이름
-            password=settings.DB_PASSWORD,   # 데이터베이스 비밀번호
-            database=settings.DB_NAME,       # 연결할 데이터베이스 이름
-            port=settings.DB_PORT            # 서버 포트
-        )
-        
-        if conn.is_connected():
-            logging.info("MySQL 데이터베이스에 성공적으로 연결되었습니다.")
-            return conn
-        
+        return get_pool().acquire(autocommit=read_only)
     except mysql.connector.Error as err:
         if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
             logging.error("MySQL 접근 권한 오류: 사용자 이름 또는 비밀번호가 잘못되었습니다.")
         elif err.errno == errorcode.ER_BAD_DB_ERROR:
-            logging.error(f"데이터베이스 '{db_Settings.DB_NAME}'가 존재하지 않습니다.")
+            logging.error(f"데이터베이스 '{settings.DB_NAME}'가 존재하지 않습니다.")
         else:
             logging.error(f"MySQL 연결 오류: {err}")
         return None
 
 def close_db_connection(conn, cursor=None):
-    """MySQL 데이터베이스 연결을 닫습니다."""
+    """커서를 닫고 연결을 풀에 반납합니다 (실제 연결은 유지됨)."""
     if cursor:
         cursor.close()
-    if conn and conn.is_connected():
-        conn.close()
-        logging.info("MySQL 데이터베이스 연결이 닫혔습니다.")
+    if conn:
+        get_pool().release(conn)
+
+def get_prepared_cursor(conn, sql):
+    """conn에 캐시된 prepared statement 커서를 반환합니다. 풀이 관리하므로 닫지 않습니다."""
+    return get_pool().prepared_cursor(conn, sql)
+
+def log_pool_stats():
+    """커넥션 풀 사용 통계를 로그로 남깁니다."""
+    if _pool is None:
+        logging.info("커넥션 풀이 사용되지 않았습니다.")
+        return
+    stats = _pool.stats()
+    logging.info(
+        f"DB 커넥션 풀 통계: 체크아웃 {stats['checkouts']}회, 대기 {stats['waits']}회 ({stats['wait_seconds']:.2f}초), "
+        f"핸드셰이크 {stats['handshakes']}회 (절약 {stats['handshakes_saved']}회), "
+        f"헬스 체크 실패 {stats['health_check_failures']}회, prepared statement {stats['prepared_statements']}개, "
+        f"autocommit 전환 {stats['autocommit_switches']}회, "
+        f"열린 연결 {stats['open_connections']}/{stats['size']}"
+    )
+
+# 기존 테이블에 나중에 추가된 컬럼 (테이블, 컬럼, 정의)
+# CREATE TABLE IF NOT EXISTS는 이미 있는 테이블을 바꾸지 않으므로 없을 때만 ALTER TABLE로 추가합니다.
+COLUMN_MIGRATIONS = [
+    ('posts', 'content_hash', 'CHAR(64) NULL AFTER content'),
+    ('posts', 'meta_hash', 'CHAR(64) NULL AFTER content_hash'),
+    ('images', 'content_hash', 'CHAR(64) NULL AFTER caption'),
+    ('images', 'source_key', 'VARCHAR(1024) NULL AFTER content_hash'),
+    ('images', 'source_size', 'BIGINT NULL AFTER source_key'),
+    ('images', 'source_etag', 'VARCHAR(255) NULL AFTER source_size'),
+    ('images', 'source_last_modified', 'VARCHAR(64) NULL AFTER source_etag'),
+]
+
+# 기존 테이블에서 나중에 타입이 바뀐 컬럼 (테이블, 컬럼, information_schema의 DATA_TYPE, 정의)
+COLUMN_TYPE_MIGRATIONS = [
+    ('sync_state', 'value', 'text', 'TEXT'), # 실패한 게시물 ID 목록, 마지막 실행 요약(JSON) 저장
+]
+
+# 기존 테이블에 나중에 추가된 인덱스 (테이블, 인덱스 이름, 컬럼)
+INDEX_MIGRATIONS = [
+    ('images', 'idx_images_content_hash', 'content_hash'),
+]
+
+def _ensure_columns(cursor):
+    cursor.execute(
+        "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()"
+    )
+    existing_columns = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+    for table, column, definition in COLUMN_MIGRATIONS:
+        if (table, column) not in existing_columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            logging.info(f"'{table}.{column}' 컬럼이 추가되었습니다.")
+    for table, column, data_type, definition in COLUMN_TYPE_MIGRATIONS:
+        current_type = existing_columns.get((table, column))
+        if current_type and current_type.lower() != data_type:
+            cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {column} {definition}")
+            logging.info(f"'{table}.{column}' 컬럼 타입을 {definition}(으)로 바꿨습니다.")
+
+    cursor.execute(
+        "SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE()"
+    )
+    existing_indexes = {(row[0], row[1]) for row in cursor.fetchall()}
+    for table, index_name, columns in INDEX_MIGRATIONS:
+        if (table, index_name) not in existing_indexes:
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({columns})")
+            logging.info(f"'{table}.{index_name}' 인덱스가 추가되었습니다.")
+
+# 스키마 버전. 테이블 정의, COLUMN_MIGRATIONS, COLUMN_TYPE_MIGRATIONS, INDEX_MIGRATIONS를 바꾸면 반드시 1 올려야 합니다.
+# DB(sync_state)에 기록된 버전이 같으면 init_db_schema()는 DDL과 information_schema 조회를 건너뜁니다.
+SCHEMA_VERSION = 2
+SCHEMA_VERSION_STATE = 'schema_version'
 
-def init_db_schema():
-    """데이터베이스 스키마(테이블)를 초기화합니다."""
+def _read_schema_version(cursor):
+    try:
+        cursor.execute("SELECT value FROM sync_state WHERE name = %s", (SCHEMA_VERSION_STATE,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except mysql.connector.Error: # sync_state 테이블이 아직 없음 (새 DB)
+        return None
+
+def _record_schema_version(conn, cursor):
+    cursor.execute(
+        "INSERT INTO sync_state (name, value) VALUES (%s, %s) ON DUPLICATE KEY UPDATE value = VALUES(value)",
+        (SCHEMA_VERSION_STATE, str(SCHEMA_VERSION))
+    )
+    conn.commit()
+    logging.info(f"DB 스키마 버전 {SCHEMA_VERSION}을 기록했습니다.")
+
+@db_call
+def init_db_schema(force=False):
+    """데이터베이스 스키마(테이블)를 초기화합니다.
+
+    DB에 기록된 스키마 버전이 SCHEMA_VERSION과 같으면 아무것도 하지 않습니다 (force=True면 항상 확인).
+    """
     conn = get_db_connection()
     if not conn:
         logging.error("DB 스키마 초기화 실패: 데이터베이스에 연결할 수 없습니다.")
         return
 
     cursor = conn.cursor()
+    if not force and _read_schema_version(cursor) == str(SCHEMA_VERSION):
+        logging.info(f"DB 스키마가 최신 상태(버전 {SCHEMA_VERSION})이므로 테이블 확인을 건너뜁니다.")
+        close_db_connection(conn, cursor)
+        return
     
     # CREATE TABLE SQL 문
     # MySQL은 IF NOT EXISTS를 지원하므로 여러 번 실행해도 안전합니다.
@@ -59,6 +221,8 @@ def init_db_schema():
         title VARCHAR(255) NOT NULL,
         description TEXT,
         content MEDIUMTEXT,
+        content_hash CHAR(64),
+        meta_hash CHAR(64),
         post_type VARCHAR(50) NOT NULL,
         category_id INT NOT NULL,
         published_date DATE NOT NULL,
@@ -76,11 +240,44 @@ def init_db_schema():
         local_path VARCHAR(512) NOT NULL,
         web_path VARCHAR(512) UNIQUE NOT NULL,
         caption TEXT,
+        content_hash CHAR(64),
+        source_key VARCHAR(1024),
+        source_size BIGINT,
+        source_etag VARCHAR(255),
+        source_last_modified VARCHAR(64),
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_images_content_hash (content_hash),
         FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
     """
 
+    # 콘텐츠 주소 이미지 저장소 (내용 해시 -> 파일). ref_count는 이 해시를 가리키는 images 행 수
+    image_blobs_table_sql = """
+    CREATE TABLE IF NOT EXISTS image_blobs (
+        digest CHAR(64) PRIMARY KEY,
+        local_path VARCHAR(512) NOT NULL,
+        size BIGINT NOT NULL,
+        ref_count INT NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+
+    # 이미지 파생본 (WebP/AVIF, 여러 너비). 원본 이미지 행이 지워지면 함께 삭제
+    image_variants_table_sql = """
+    CREATE TABLE IF NOT EXISTS image_variants (
+        image_id CHAR(100) NOT NULL,
+        format VARCHAR(10) NOT NULL,
+        width INT NOT NULL,
+        height INT NOT NULL,
+        size BIGINT,
+        local_path VARCHAR(512) NOT NULL,
+        web_path VARCHAR(512) UNIQUE NOT NULL,
+        source_hash CHAR(64) NOT NULL,
+        PRIMARY KEY (image_id, format, width),
+        FOREIGN KEY (image_id) REFERENCES images(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+
     # 카테고리 테이블
     categories_table_sql = """
     CREATE TABLE IF NOT EXISTS categories (
@@ -106,53 +303,78 @@ def init_db_schema():
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
     """
     
+    # 미리 렌더링한 본문 HTML, 목차, 단어 수, 읽기 시간. content_hash는 이 결과를 만든 입력(본문, 이미지 파생본, 렌더러 버전)의 해시
+    post_renders_table_sql = """
+    CREATE TABLE IF NOT EXISTS post_renders (
+        post_id CHAR(36) PRIMARY KEY,
+        content_hash CHAR(64) NOT NULL,
+        html MEDIUMTEXT NOT NULL,
+        toc TEXT,
+        word_count INT NOT NULL DEFAULT 0,
+        reading_minutes INT NOT NULL DEFAULT 0,
+        rendered_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+
+    # 동기화 상태 (증분 동기화 워터마크, 마지막 전체 동기화 시각 등)
+    sync_state_table_sql = """
+    CREATE TABLE IF NOT EXISTS sync_state (
+        name VARCHAR(64) PRIMARY KEY,
+        value TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """
+    
     try:
         logging.info("테이블 생성을 시작합니다...")
         cursor.execute(posts_table_sql)
         logging.info("'posts' 테이블이 준비되었습니다.")
         cursor.execute(images_table_sql)
         logging.info("'images' 테이블이 준비되었습니다.")
+        cursor.execute(image_blobs_table_sql)
+        logging.info("'image_blobs' 테이블이 준비되었습니다.")
+        cursor.execute(image_variants_table_sql)
+        logging.info("'image_variants' 테이블이 준비되었습니다.")
         cursor.execute(categories_table_sql)
         logging.info("'categories' 테이블이 준비되었습니다.")
         cursor.execute(tags_table_sql)
         logging.info("'tags' 테이블이 준비되었습니다.")
         cursor.execute(post_tags_table_sql)
         logging.info("'post_tags' 테이블이 준비되었습니다.")
+        cursor.execute(sync_state_table_sql)
+        logging.info("'sync_state' 테이블이 준비되었습니다.")
+        cursor.execute(post_renders_table_sql)
+        logging.info("'post_renders' 테이블이 준비되었습니다.")
+        _ensure_columns(cursor)
         cursor.execute("ALTER TABLE posts ADD CONSTRAINT fk_category FOREIGN KEY (category_id) REFERENCES categories(id)")
         logging.info("categories 외래 키 제약 조건 추가가 성공적으로 완료되었습니다.")
         conn.commit()
         logging.info("commit 완료: 모든 테이블이 성공적으로 생성되었습니다.")
+        _record_schema_version(conn, cursor)
     except mysql.connector.Error as err:
         # 이미 제약 조건이 존재하는 경우 발생하는 에러(1826)는 무시합니다.
         if err.errno == 1826:
-            pass
+            try:
+                _record_schema_version(conn, cursor)
+            except mysql.connector.Error as version_err:
+                logging.warning(f"DB 스키마 버전 기록 실패 (다음 실행에서 다시 확인): {version_err}")
         else:
             logging.error(f"테이블 생성 중 오류 발생: {err}")
             conn.rollback() # 오류 발생 시 롤백
     finally:
         close_db_connection(conn, cursor)
 
-#  게시물 데이터를 posts 테이블에 삽입
-def upsert_post(post_data):
-
-    conn = get_db_connection()
-    if not conn:
-        return False
-
-    cursor = conn.cursor()
-
-    # 카테고리 이름으로 ID를 가져오거나 생성
-    logging.info(f"포스트 정보 표시 '{post_data}'")
-    category_id = get_or_create_category_id(cursor, post_data['category'])
-
-    sql = """
-    INSERT INTO posts (id, slug, title, description, content, post_type, category_id, published_date, featured_image, notion_last_edited_time)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+SQL_UPSERT_POST = """
+    INSERT INTO posts (id, slug, title, description, content, content_hash, meta_hash, post_type, category_id, published_date, featured_image, notion_last_edited_time)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     ON DUPLICATE KEY UPDATE
         slug = VALUES(slug),
         title = VALUES(title),
         description = VALUES(description),
         content = VALUES(content),
+        content_hash = VALUES(content_hash),
+        meta_hash = VALUES(meta_hash),
         post_type = VALUES(post_type),
         category_id = VALUES(category_id),
         published_date = VALUES(published_date),
@@ -160,21 +382,113 @@ def upsert_post(post_data):
         notion_last_edited_time = VALUES(notion_last_edited_time),
         updated_at = CURRENT_TIMESTAMP;
     """
-    try:
-        cursor.execute(sql, (
-            post_data['id'],
-            post_data['slug'],
-            post_data['title'],
-            post_data.get('description'), # Optional
-            post_data.get('content'),     # Optional
-            post_data['post_type'],
-            category_id,    # Optional
-            post_data['published_date'],
-            post_data.get('featured_image'), # Optional
-            post_data['notion_last_edited_time']
+
+# 본문은 그대로이고 속성(제목, 설명, 카테고리 등)만 바뀐 경우: MEDIUMTEXT 본문은 다시 쓰지 않음
+SQL_UPDATE_POST_META = """
+    UPDATE posts SET
+        slug = %s, title = %s, description = %s, post_type = %s, category_id = %s,
+        published_date = %s, featured_image = %s, meta_hash = %s, notion_last_edited_time = %s
+    WHERE id = %s
+    """
+# 렌더링 결과가 모두 같은 경우: 다음 실행에서 건너뛰도록 Notion 수정 시간만 기록 (updated_at은 그대로 둠)
+SQL_TOUCH_POST = "UPDATE posts SET notion_last_edited_time = %s, updated_at = updated_at WHERE id = %s"
+SQL_SELECT_POST_HASHES = "SELECT content_hash, meta_hash FROM posts WHERE id = %s"
+
+# _write_post_row 결과
+POST_ROW_INSERTED = 'inserted'      # 새 게시물
+POST_ROW_WRITTEN = 'written'        # 본문이 바뀌어 전체를 씀
+POST_ROW_META_ONLY = 'meta_only'    # 속성만 바뀌어 본문은 쓰지 않음
+POST_ROW_IDENTICAL = 'identical'    # Notion 수정 시간만 바뀌고 렌더링 결과는 같음
+
+SQL_UPSERT_POST_RENDER = """
+    INSERT INTO post_renders (post_id, content_hash, html, toc, word_count, reading_minutes)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        content_hash = VALUES(content_hash),
+        html = VALUES(html),
+        toc = VALUES(toc),
+        word_count = VALUES(word_count),
+        reading_minutes = VALUES(reading_minutes)
+    """
+
+# 본문 해시 (SHA-256 hex). 본문이 없으면 None
+def compute_content_hash(content):
+    if content is None:
+        return None
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+# 본문 외에 화면에 나오는 게시물 속성의 해시 (카테고리는 ID 기준)
+def compute_post_meta_hash(post_data, category_id):
+    fields = [
+        post_data['slug'], post_data['title'], post_data.get('description'), post_data['post_type'],
+        category_id, post_data['published_date'], post_data.get('featured_image'),
+    ]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+# posts 행 쓰기 (commit은 호출자가 담당)
+# 저장된 해시와 비교해 바뀐 부분만 씁니다. POST_ROW_* 중 하나를 반환
+def _write_post_row(cursor, post_data, category_id):
+    content_hash = compute_content_hash(post_data.get('content'))
+    meta_hash = compute_post_meta_hash(post_data, category_id)
+
+    cursor.execute(SQL_SELECT_POST_HASHES, (post_data['id'],))
+    row = cursor.fetchone()
+    if row and row[0] == content_hash and content_hash is not None:
+        if row[1] == meta_hash:
+            cursor.execute(SQL_TOUCH_POST, (post_data['notion_last_edited_time'], post_data['id']))
+            return POST_ROW_IDENTICAL
+        cursor.execute(SQL_UPDATE_POST_META, (
+            post_data['slug'], post_data['title'], post_data.get('description'), post_data['post_type'], category_id,
+            post_data['published_date'], post_data.get('featured_image'), meta_hash, post_data['notion_last_edited_time'],
+            post_data['id']
         ))
+        return POST_ROW_META_ONLY
+
+    cursor.execute(SQL_UPSERT_POST, (
+        post_data['id'],
+        post_data['slug'],
+        post_data['title'],
+        post_data.get('description'), # Optional
+        post_data.get('content'),     # Optional
+        content_hash,
+        meta_hash,
+        post_data['post_type'],
+        category_id,    # Optional
+        post_data['published_date'],
+        post_data.get('featured_image'), # Optional
+        post_data['notion_last_edited_time']
+    ))
+    return POST_ROW_WRITTEN if row else POST_ROW_INSERTED
+
+# post_renders 행 쓰기 (commit은 호출자가 담당)
+# 해시는 렌더링 입력 해시(render['source_hash'])를 쓰고, 없으면 최종 본문의 해시를 써서 다음 실행에서 다시 렌더링되게 함
+def _write_post_render(cursor, post_id, content, render):
+    cursor.execute(SQL_UPSERT_POST_RENDER, (
+        post_id,
+        render.get('source_hash') or compute_content_hash(content),
+        render['html'],
+        json.dumps(render.get('toc', []), ensure_ascii=False),
+        render.get('word_count', 0),
+        render.get('reading_minutes', 0),
+    ))
+
+#  게시물 데이터를 posts 테이블에 삽입
+@db_call
+def upsert_post(post_data):
+
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    cursor = conn.cursor()
+
+    logging.info(f"포스트 정보 표시 '{post_data}'")
+    try:
+        # 카테고리 이름으로 ID를 가져오거나 생성
+        category_id = get_or_create_category_id(conn, cursor, post_data['category'])
+        post_row_result = _write_post_row(cursor, post_data, category_id)
         conn.commit()
-        logging.info(f"게시물 '{post_data['title']}' (ID: {post_data['id']}) 정보가 DB에 저장/업데이트되었습니다.")
+        logging.info(f"게시물 '{post_data['title']}' (ID: {post_data['id']}) 정보가 DB에 저장/업데이트되었습니다 ({post_row_result}).")
         return True
     except mysql.connector.Error as err:
         logging.error(f"게시물 '{post_data['title']}' 저장/업데이트 중 오류 발생: {err}")
@@ -187,64 +501,141 @@ def upsert_post(post_data):
         close_db_connection(conn, cursor)
 
 # 특정 게시물 ID의 Notion 최종 수정 시간을 DB에서 가져오기 (데이터 업데이트 진행 기준이됨)
+@db_call
 def get_post_notion_last_edited_time(post_id):
 
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=True)
     if not conn:
         return None
 
-    cursor = conn.cursor(dictionary=True) # 결과를 딕셔너리로 받기
+    cursor = get_prepared_cursor(conn, SQL_SELECT_POST_LAST_EDITED_TIME)
     try:
-        cursor.execute("SELECT notion_last_edited_time FROM posts WHERE id = %s", (post_id,))
-        result = cursor.fetchone()
-        if result:
-            return result['notion_last_edited_time']
+        cursor.execute(SQL_SELECT_POST_LAST_EDITED_TIME, (post_id,))
+        results = cursor.fetchall()
+        if results:
+            return results[0][0]
         return None
     except mysql.connector.Error as err:
         logging.error(f"게시물(ID: {post_id})의 최종 수정 시간 조회 중 오류 발생: {err}")
         return None
     finally:
-        close_db_connection(conn, cursor)
+        close_db_connection(conn)
+
+
 
 
+class NameIdCache:
+    """categories/tags 테이블의 이름 -> ID 캐시 (동기화 실행 단위).
+
+    첫 사용 시 SELECT 한 번으로 전체를 읽어두고, 없는 이름은 다중 행
+    INSERT ... ON DUPLICATE KEY 한 번으로 만든 뒤 ID를 다시 읽어 캐시에 추가합니다.
+    키는 casefold로 맞추지만 테이블 collation(utf8mb4_unicode_ci)은 악센트와 끝 공백도 무시하므로
+    ('Cafe'와 'Café'는 같은 행), 새로 읽은 ID는 DB가 돌려준 이름이 아니라 요청한 이름의 키로 저장합니다.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._ids = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name):
+        return name.casefold()
+
+    def reset(self):
+        with self._lock:
+            self._ids = None
+
+    def _warm(self, cursor):
+        cursor.execute(f"SELECT id, name FROM {self.table}")
+        self._ids = {self._key(name): id_ for id_, name in cursor.fetchall()}
+        logging.info(f"'{self.table}' 이름 캐시 준비 완료 ({len(self._ids)}개).")
+
+    def get_or_create_ids(self, conn, cursor, names):
+        """이름 목록을 {이름: ID}로 바꿉니다. 새 이름을 만들었다면 conn에서 바로 커밋합니다.
+
+        새 이름 생성은 게시물 트랜잭션과 분리해 커밋하므로, 반드시 게시물 쓰기를 시작하기 전에 호출해야 합니다.
+        (게시물 트랜잭션이 롤백되어도 캐시가 없는 ID를 가리키지 않도록)
+        """
+        names = [name for name in dict.fromkeys(names) if name]
+        with self._lock:
+            if self._ids is None:
+                self._warm(cursor)
+
+            missing = [name for name in names if self._key(name) not in self._ids]
+            if missing:
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (name) VALUES (%s) ON DUPLICATE KEY UPDATE name = name",
+                    [(name,) for name in missing]
+                )
+                # 요청한 이름을 그대로 돌려받도록 테이블과 조인 (같은 행인지는 서버의 collation으로 판단)
+                requested = " UNION ALL ".join(["SELECT %s AS requested"] * len(missing))
+                cursor.execute(
+                    f"SELECT r.requested, t.id FROM ({requested}) AS r JOIN {self.table} t ON t.name = r.requested",
+                    missing
+                )
+                for name, id_ in cursor.fetchall():
+                    self._ids[self._key(name)] = id_
+                conn.commit()
+                logging.info(f"'{self.table}'에 새 이름 {len(missing)}개를 추가했습니다: {missing}")
+
+            return {name: self._ids.get(self._key(name)) for name in names}
 
 
-# 카테고리 이름으로 ID를 찾거나, 없으면 새로 생성 후 ID를 반환합니다.s
-def get_or_create_category_id(cursor, category_name):
+# 동기화 실행 동안 공유하는 카테고리/태그 캐시
+_category_cache = NameIdCache('categories')
+_tag_cache = NameIdCache('tags')
+
+def reset_name_caches():
+    """카테고리/태그 캐시를 비웁니다 (동기화 실행 시작 시 호출)."""
+    _category_cache.reset()
+    _tag_cache.reset()
+
+# 카테고리 이름으로 ID를 찾거나, 없으면 새로 생성 후 ID를 반환합니다.
+def get_or_create_category_id(conn, cursor, category_name):
     if not category_name:
         return None
-    
-    # 카테고리가 이미 존재하는지 확인
-    cursor.execute("SELECT id FROM categories WHERE name = %s", (category_name,))
-    result = cursor.fetchone()
-
-    # 카테고리가 존재하면 해당 ID 반환
-    # result는 (id,) 형태의 튜플이므로, result[0]
-    if result:
-        return result[0]
-    else:
-        # 존재하지 않으면 새로 추가
-        cursor.execute("INSERT INTO categories (name) VALUES (%s)", (category_name,))
-        return cursor.lastrowid # 새로 생성된 ID 반환
-    
+    return _category_cache.get_or_create_ids(conn, cursor, [category_name]).get(category_name)
 
+# 태그 이름 목록을 {태그 이름: ID}로 반환, 없는 태그는 한 번에 생성
+def get_or_create_tag_ids(conn, cursor, tag_names):
+    return _tag_cache.get_or_create_ids(conn, cursor, tag_names)
 
-# 태그 테이블에서 검색, 없으면 새로 생성, 해당 태그 ID 반환
-def get_or_create_tag_id(cursor, tag_name):
+# 태그 이름 정리 (앞뒤 공백 제거, 빈 이름 제외)
+def normalize_tag_names(tag_names):
+    return [tag_name.strip() for tag_name in (tag_names or []) if tag_name and tag_name.strip()]
 
-    cursor.execute("SELECT id FROM tags WHERE name = %s", (tag_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0] # 튜플값 반환됨 -> 0번째값
-    else:
-        # 태그가 존재하지 않으면 새로 삽입
-        cursor.execute("INSERT INTO tags (name) VALUES (%s)", (tag_name,))
-        return cursor.lastrowid 
 
+# post_tags 연결 정보 쓰기 (commit은 호출자가 담당)
+# 기존 연결과 비교하여 추가된 (post, tag)만 INSERT, 빠진 것만 DELETE
+def _write_post_tags(cursor, post_id, tag_ids):
+    new_tag_ids = {tag_id for tag_id in tag_ids if tag_id}
+
+    cursor.execute("SELECT tag_id FROM post_tags WHERE post_id = %s", (post_id,))
+    current_tag_ids = {row[0] for row in cursor.fetchall()}
+
+    added = new_tag_ids - current_tag_ids
+    removed = current_tag_ids - new_tag_ids
+
+    if added:
+        cursor.executemany(
+            "INSERT IGNORE INTO post_tags (post_id, tag_id) VALUES (%s, %s)",
+            [(post_id, tag_id) for tag_id in added]
+        )
+    if removed:
+        placeholders = ", ".join(["%s"] * len(removed))
+        cursor.execute(
+            f"DELETE FROM post_tags WHERE post_id = %s AND tag_id IN ({placeholders})",
+            (post_id, *removed)
+        )
 
+    if added or removed:
+        logging.info(f"게시물(ID: {post_id})의 태그 연결 변경: 추가 {len(added)}개, 삭제 {len(removed)}개")
+    else:
+        logging.info(f"게시물(ID: {post_id})의 태그 연결 변경 없음.")
 
 # post_tags테이블에 연결 정보 생성
+@db_call
 def link_tags_to_post(post_id, tag_names):
 
     conn = get_db_connection()
@@ -254,30 +645,8 @@ def link_tags_to_post(post_id, tag_names):
     cursor = conn.cursor()
     
     try:
-        # 1. 해당 post_id에 대한 기존 연결 정보는 모두 삭제 후 새로 추가
-        # => 단순화
-        cursor.execute("DELETE FROM post_tags WHERE post_id = %s", (post_id,))
-        
-        # 2. 각 태그 이름에 대해 ID를 가져오거나 생성하여 post_tags에 연결
-        if tag_names: # 태그가 있는 경우에만 처리
-            for tag_name in tag_names:
-                tag_name_trimmed = tag_name.strip() # 태그 이름 앞뒤 공백 제거
-                if not tag_name_trimmed: # 빈 태그 이름은 건너뛰기
-                    continue
-                
-                tag_id = get_or_create_tag_id(cursor, tag_name_trimmed)
-                if tag_id:
-                    # post_tags 테이블에 연결 정보 삽입 (중복 시 무시)
-                    # PRIMARY KEY (post_id, tag_id)로 인해 이미 존재하면 에러 발생 가능
-                    # => INSERT IGNORE를 사용 - 중복되지 않는 데이터만 삽입
-                    cursor.execute(
-                        "INSERT IGNORE INTO post_tags (post_id, tag_id) VALUES (%s, %s)",
-                        (post_id, tag_id)
-                    )
-            logging.info(f"게시물(ID: {post_id})에 대한 태그 연결이 업데이트되었습니다: {tag_names}")
-        else:
-            logging.info(f"게시물(ID: {post_id})에 연결할 태그가 없습니다. 기존 연결이 삭제되었습니다.")
-
+        tag_ids = get_or_create_tag_ids(conn, cursor, normalize_tag_names(tag_names)).values()
+        _write_post_tags(cursor, post_id, tag_ids)
         conn.commit()
         return True
     except mysql.connector.Error as err:
@@ -291,7 +660,47 @@ def link_tags_to_post(post_id, tag_names):
     finally:
         close_db_connection(conn, cursor)
 
+# IN (...) 절 하나에 넣을 최대 값 수 (너무 긴 쿼리를 피하기 위해 나눠서 실행)
+IN_CLAUSE_CHUNK_SIZE = 500
+
+def _chunks(values, size=IN_CLAUSE_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+# images 행 쓰기 (commit은 호출자가 담당)
+# 콘텐츠 주소 저장소에 새로 저장한 이미지(content_addressed)는 image_blobs 행도 함께 씁니다.
+def _write_image_rows(cursor, images):
+    blobs = [
+        (img['content_hash'], img['local_path'], img['content_size'])
+        for img in images if img.get('content_addressed')
+    ]
+    if blobs:
+        cursor.executemany(SQL_UPSERT_IMAGE_BLOB, blobs)
+    cursor.executemany(SQL_UPSERT_IMAGE, [
+        (
+            img['id'], img['post_id'], img['local_path'], img['web_path'], img.get('caption'), img.get('content_hash'),
+            img.get('source_key'), img.get('source_size'), img.get('source_etag'), img.get('source_last_modified')
+        )
+        for img in images
+    ])
+
+# 주어진 해시들의 image_blobs.ref_count를 images 기준으로 다시 계산 (commit은 호출자가 담당)
+def _refresh_blob_ref_counts(cursor, digests):
+    digests = [digest for digest in digests if digest]
+    for chunk in _chunks(digests):
+        cursor.execute(
+            "UPDATE image_blobs SET ref_count = "
+            "(SELECT COUNT(*) FROM images WHERE images.content_hash = image_blobs.digest) "
+            f"WHERE digest IN ({_placeholders(chunk)})",
+            tuple(chunk)
+        )
+
 # 이미지 정보를 images 테이블에 삽입
+@db_call
 def upsert_image_info(image_data):
     
     conn = get_db_connection()
@@ -300,24 +709,11 @@ def upsert_image_info(image_data):
 
     cursor = conn.cursor()
     
-    sql = """
-    INSERT INTO images (id, post_id, local_path, web_path, caption)
-    VALUES (%s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-        post_id = VALUES(post_id),
-        local_path = VALUES(local_path),
-        web_path = VALUES(web_path),
-        caption = VALUES(caption),
-        created_at = CURRENT_TIMESTAMP; 
-    """
     try:
-        cursor.execute(sql, (
-            image_data['id'],
-            image_data['post_id'],
-            image_data['local_path'],
-            image_data['web_path'],
-            image_data.get('caption') 
-        ))
+        cursor.execute("SELECT content_hash FROM images WHERE id = %s", (image_data['id'],))
+        row = cursor.fetchone()
+        _write_image_rows(cursor, [image_data])
+        _refresh_blob_ref_counts(cursor, {image_data.get('content_hash'), row[0] if row else None})
         conn.commit()
         logging.info(f"이미지 정보(ID: {image_data['id']}, Post ID: {image_data['post_id']})가 DB에 저장/업데이트되었습니다.")
         return True
@@ -333,53 +729,56 @@ def upsert_image_info(image_data):
 
 
 # 특정 게시물 ID에 연결된 모든 이미지의 ID(Notion block ID) 목록을 DB에서 가져옵니다
+@db_call
 def get_image_ids_for_post(post_id):
 
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=True)
     if not conn:
         return []
 
-    cursor = conn.cursor()
+    cursor = get_prepared_cursor(conn, SQL_SELECT_IMAGE_IDS_FOR_POST)
     image_ids = []
     try:
-        cursor.execute("SELECT id FROM images WHERE post_id = %s", (post_id,))
+        cursor.execute(SQL_SELECT_IMAGE_IDS_FOR_POST, (post_id,))
         results = cursor.fetchall()
         image_ids = [row[0] for row in results]
     except mysql.connector.Error as err:
         logging.error(f"게시물(ID: {post_id})의 이미지 ID 목록 조회 중 오류 발생: {err}")
     finally:
-        close_db_connection(conn, cursor)
+        close_db_connection(conn)
     return image_ids
 
+@db_call
 def get_image_local_path(image_id):
     """특정 이미지 ID (Notion block ID)의 로컬 저장 경로를 DB에서 가져옵니다."""
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=True)
     if not conn:
         return None
     
-    cursor = conn.cursor()
+    cursor = get_prepared_cursor(conn, SQL_SELECT_IMAGE_LOCAL_PATH)
     try:
-        cursor.execute("SELECT local_path FROM images WHERE id = %s", (image_id,))
-        result = cursor.fetchone()
-        if result:
-            return result[0]
+        cursor.execute(SQL_SELECT_IMAGE_LOCAL_PATH, (image_id,))
+        results = cursor.fetchall()
+        if results:
+            return results[0][0]
         return None
     except mysql.connector.Error as err:
         logging.error(f"이미지(ID: {image_id})의 로컬 경로 조회 중 오류 발생: {err}")
         return None
     finally:
-        close_db_connection(conn, cursor)
+        close_db_connection(conn)
 
 # 특정 이미지 ID에 해당하는 정보를 images 테이블에서 삭제
+@db_call
 def delete_image_info_by_id(image_id):
     
     conn = get_db_connection()
     if not conn:
         return False
 
-    cursor = conn.cursor()
+    cursor = get_prepared_cursor(conn, SQL_DELETE_IMAGE)
     try:
-        cursor.execute("DELETE FROM images WHERE id = %s", (image_id,))
+        cursor.execute(SQL_DELETE_IMAGE, (image_id,))
         conn.commit()
         if cursor.rowcount > 0:
             logging.info(f"이미지 정보(ID: {image_id})가 DB에서 삭제되었습니다.")
@@ -390,12 +789,488 @@ def delete_image_info_by_id(image_id):
         logging.error(f"이미지 정보(ID: {image_id}) 삭제 중 오류 발생: {err}")
         conn.rollback()
         return False
+    finally:
+        close_db_connection(conn)
+
+# 여러 게시물에 연결된 이미지를 {게시물 ID: {이미지 ID: 로컬 경로}}로 한 번에 가져옵니다 (오류 시 None)
+@db_call
+def get_image_paths_for_posts(post_ids):
+
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+
+    cursor = conn.cursor()
+    image_paths = {}
+    try:
+        for chunk in _chunks(post_ids):
+            cursor.execute(
+                f"SELECT post_id, id, local_path FROM images WHERE post_id IN ({_placeholders(chunk)})", tuple(chunk)
+            )
+            for post_id, image_id, local_path in cursor.fetchall():
+                image_paths.setdefault(post_id, {})[image_id] = local_path
+        return image_paths
+    except mysql.connector.Error as err:
+        logging.error(f"게시물 {len(post_ids)}개의 이미지 경로 조회 중 오류 발생: {err}")
+        return None
     finally:
         close_db_connection(conn, cursor)
 
+# 여러 이미지 정보를 하나의 트랜잭션으로 삭제 (공유 파일의 참조 수도 함께 갱신)
+@db_call
+def delete_images_by_ids(image_ids):
+    image_ids = list(image_ids)
+    if not image_ids:
+        return True
+
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    cursor = conn.cursor()
+    try:
+        affected_digests = set()
+        for chunk in _chunks(image_ids):
+            cursor.execute(
+                f"SELECT DISTINCT content_hash FROM images WHERE id IN ({_placeholders(chunk)}) AND content_hash IS NOT NULL",
+                tuple(chunk)
+            )
+            affected_digests.update(row[0] for row in cursor.fetchall())
+            cursor.execute(f"DELETE FROM images WHERE id IN ({_placeholders(chunk)})", tuple(chunk))
+        _refresh_blob_ref_counts(cursor, affected_digests)
+        conn.commit()
+        logging.info(f"이미지 정보 {len(image_ids)}개가 DB에서 삭제되었습니다.")
+        return True
+    except mysql.connector.Error as err:
+        logging.error(f"이미지 정보 {len(image_ids)}개 삭제 중 오류 발생: {err}")
+        conn.rollback()
+        return False
+    finally:
+        close_db_connection(conn, cursor)
+
+# 여러 게시물을 하나의 트랜잭션으로 삭제 (images, image_variants, post_tags는 ON DELETE CASCADE)
+# 삭제된 게시물의 {게시물 ID: slug}를 반환 (오류 시 None)
+@db_call
+def delete_posts_by_ids(post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    cursor = conn.cursor()
+    try:
+        deleted_slugs = {}
+        for chunk in _chunks(post_ids):
+            cursor.execute(f"SELECT id, slug FROM posts WHERE id IN ({_placeholders(chunk)})", tuple(chunk))
+            deleted_slugs.update({row[0]: row[1] for row in cursor.fetchall()})
+            cursor.execute(f"DELETE FROM posts WHERE id IN ({_placeholders(chunk)})", tuple(chunk))
+        conn.commit()
+        logging.info(f"게시물 {len(deleted_slugs)}개가 DB에서 삭제되었습니다.")
+        return deleted_slugs
+    except mysql.connector.Error as err:
+        logging.error(f"게시물 {len(post_ids)}개 삭제 중 오류 발생: {err}")
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn, cursor)
+
+# 특정 게시물에 연결된 이미지의 {이미지 ID: 로컬 경로}를 한 번에 가져옵니다
+def get_image_paths_for_post(post_id):
+    records = get_image_records_for_post(post_id)
+    if records is None:
+        return None
+    return {image_id: record['local_path'] for image_id, record in records.items()}
+
+# 특정 게시물에 연결된 이미지의 {이미지 ID: {'local_path', 'web_path', 'content_hash', 'source_*'}}를 한 번에 가져옵니다
+@db_call
+def get_image_records_for_post(post_id):
+
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT id, local_path, web_path, content_hash, source_key, source_size, source_etag, source_last_modified "
+            "FROM images WHERE post_id = %s",
+            (post_id,)
+        )
+        return {row.pop('id'): row for row in cursor.fetchall()}
+    except mysql.connector.Error as err:
+        logging.error(f"게시물(ID: {post_id})의 이미지 정보 조회 중 오류 발생: {err}")
+        return None
+    finally:
+        close_db_connection(conn, cursor)
+
+# 어떤 이미지도 참조하지 않는 image_blobs 행을 삭제하고 {해시: 로컬 경로}를 반환 (오류 시 None)
+# 게시물 처리 중에는 다른 게시물이 같은 파일을 새로 참조할 수 있으므로, 모든 게시물 처리가 끝난 뒤 호출합니다.
+# 실제 파일 삭제는 호출자가 커밋 이후에 합니다.
+@db_call
+def delete_unreferenced_image_blobs():
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    cursor = conn.cursor()
+    try:
+        # 게시물 삭제(ON DELETE CASCADE)로 사라진 참조까지 반영하도록 전체 참조 수를 다시 계산
+        cursor.execute(
+            "UPDATE image_blobs b "
+            "LEFT JOIN (SELECT content_hash, COUNT(*) AS refs FROM images "
+            "           WHERE content_hash IS NOT NULL GROUP BY content_hash) r ON r.content_hash = b.digest "
+            "SET b.ref_count = COALESCE(r.refs, 0)"
+        )
+        cursor.execute("SELECT digest, local_path FROM image_blobs WHERE ref_count = 0")
+        unreferenced = {row[0]: row[1] for row in cursor.fetchall()}
+        if unreferenced:
+            cursor.executemany(
+                "DELETE FROM image_blobs WHERE digest = %s AND ref_count = 0",
+                [(digest,) for digest in unreferenced]
+            )
+        conn.commit()
+        return unreferenced
+    except mysql.connector.Error as err:
+        logging.error(f"참조되지 않는 이미지 파일 정보 정리 중 오류 발생: {err}")
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn, cursor)
+
+
+# 이미지 파일을 가리키는 모든 DB 행을 local_path 바이트 순서로 스트리밍 (저장소 GC용)
+# (local_path, 테이블 이름, 행 키)를 batch_size개씩 받아오므로 행 수와 관계없이 메모리가 일정합니다.
+# 정렬은 DB가 하고, 클라이언트는 버퍼 없는 커서로 읽습니다. 조회 오류는 예외를 그대로 전달합니다.
+SQL_SELECT_ALL_IMAGE_PATHS = """
+    SELECT local_path, 'images', id, NULL, NULL FROM images
+    UNION ALL
+    SELECT local_path, 'image_blobs', digest, NULL, NULL FROM image_blobs
+    UNION ALL
+    SELECT local_path, 'image_variants', image_id, format, width FROM image_variants
+    ORDER BY BINARY local_path
+    """
+
+def iter_image_path_rows(batch_size=1000):
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        raise mysql.connector.Error(msg="DB 연결을 가져오지 못했습니다.")
+
+    cursor = conn.cursor(buffered=False)
+    finished = False
+    try:
+        cursor.execute(SQL_SELECT_ALL_IMAGE_PATHS)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for local_path, table, key, fmt, width in rows:
+                yield local_path, table, key if table != 'image_variants' else (key, fmt, width)
+        finished = True
+    finally:
+        if not finished:
+            # 중간에 멈춘 경우 읽지 않은 결과를 버려야 연결을 풀에 반납할 수 있음
+            try:
+                conn.consume_results()
+            except mysql.connector.Error:
+                pass
+        close_db_connection(conn, cursor)
+
+# 파일이 없는 이미지 관련 행을 하나의 트랜잭션으로 삭제 (저장소 GC용)
+# image_ids: images.id, variant_keys: (image_id, format, width), blob_digests: image_blobs.digest
+@db_call
+def delete_dangling_image_rows(image_ids=(), variant_keys=(), blob_digests=()):
+    image_ids, variant_keys, blob_digests = list(image_ids), list(variant_keys), list(blob_digests)
+    if not (image_ids or variant_keys or blob_digests):
+        return True
+
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    cursor = conn.cursor()
+    try:
+        affected_digests = set(blob_digests)
+        for chunk in _chunks(image_ids):
+            cursor.execute(
+                f"SELECT DISTINCT content_hash FROM images WHERE id IN ({_placeholders(chunk)}) AND content_hash IS NOT NULL",
+                tuple(chunk)
+            )
+            affected_digests.update(row[0] for row in cursor.fetchall())
+            cursor.execute(f"DELETE FROM images WHERE id IN ({_placeholders(chunk)})", tuple(chunk))
+        if variant_keys:
+            cursor.executemany(
+                "DELETE FROM image_variants WHERE image_id = %s AND format = %s AND width = %s", variant_keys
+            )
+        for chunk in _chunks(blob_digests):
+            cursor.execute(f"DELETE FROM image_blobs WHERE digest IN ({_placeholders(chunk)})", tuple(chunk))
+        _refresh_blob_ref_counts(cursor, affected_digests)
+        conn.commit()
+        logging.info(
+            f"파일이 없는 행 삭제: images {len(image_ids)}개, image_variants {len(variant_keys)}개, image_blobs {len(blob_digests)}개"
+        )
+        return True
+    except mysql.connector.Error as err:
+        logging.error(f"파일이 없는 이미지 행 삭제 중 오류 발생: {err}")
+        conn.rollback()
+        return False
+    finally:
+        close_db_connection(conn, cursor)
+
+
+class PostUnitOfWork:
+    """게시물 하나에 대한 쓰기(게시물 행, 태그, 이미지 행, 미사용 이미지 삭제)를 모아 하나의 트랜잭션으로 적용합니다.
+
+    처리 도중에는 아무것도 DB에 쓰지 않고, commit() 한 번에 모든 변경이 반영되거나 모두 롤백됩니다.
+    images.post_id 외래 키 때문에 게시물 행 -> 태그 -> 이미지 순서로 씁니다.
+    """
+
+    def __init__(self, post_id):
+        self.post_id = post_id
+        self.post_data = None
+        self.tag_names = None           # None이면 태그는 건드리지 않음
+        self.render = None              # 미리 렌더링한 HTML 등 (None이면 post_renders는 건드리지 않음)
+        self.post_row_result = None     # 커밋 후 _write_post_row 결과 (POST_ROW_*)
+        self.images = {}                # 이미지 ID -> image_data (같은 ID는 마지막 값 사용)
+        self.image_ids_to_delete = set()
+        self.image_variants = {}        # 이미지 ID -> 파생본 목록
+        self._variant_futures = {}      # 이미지 ID -> 인코딩 작업 (프로세스 풀 Future)
+        self._existing_images = None
+
+    def existing_images(self):
+        """DB에 이미 저장된 이 게시물의 이미지 {ID: 이미지 정보(경로, 해시, 출처 지문)} (처음 호출 시 한 번 조회)."""
+        if self._existing_images is None:
+            self._existing_images = get_image_records_for_post(self.post_id) or {}
+        return self._existing_images
+
+    def set_post(self, post_data):
+        self.post_data = post_data
+
+    def set_tags(self, tag_names):
+        self.tag_names = list(tag_names or [])
+
+    def set_render(self, render):
+        self.render = render
+
+    def add_image(self, image_data):
+        self.images[image_data['id']] = image_data
+        self.image_ids_to_delete.discard(image_data['id'])
+
+    def delete_images(self, image_ids):
+        self.image_ids_to_delete.update(i for i in image_ids if i not in self.images)
+
+    def add_image_variants(self, image_id, variants, future=None):
+        self.image_variants[image_id] = list(variants)
+        if future is not None:
+            self._variant_futures[image_id] = future
+        else:
+            self._variant_futures.pop(image_id, None)
+
+    def variants_for(self, image_id):
+        return self.image_variants.get(image_id, [])
+
+    def _wait_for_variants(self):
+        """인코딩 작업이 끝나길 기다립니다. 실패한 이미지의 파생본은 버리고 본문의 참조를 원본 경로로 되돌립니다."""
+        for image_id, future in self._variant_futures.items():
+            try:
+                encoded_sizes = dict(future.result())
+            except Exception as e:
+                logging.warning(f"이미지(ID: {image_id}) 파생본 인코딩 실패, 원본을 사용합니다: {e}")
+                failed_variants = self.image_variants.pop(image_id, [])
+                original_web_path = self.images.get(image_id, {}).get('web_path')
+                if original_web_path and self.post_data and self.post_data.get('content'):
+                    content = self.post_data['content']
+                    for variant in failed_variants:
+                        content = content.replace(variant['web_path'], original_web_path)
+                    self.post_data['content'] = content
+                if original_web_path and self.render:
+                    rendered_html = self.render['html']
+                    for variant in failed_variants:
+                        rendered_html = rendered_html.replace(variant['web_path'], original_web_path)
+                    self.render['html'] = rendered_html
+                if self.render:
+                    self.render['source_hash'] = None # 파생본이 빠진 결과이므로 다음 실행에서 다시 렌더링
+                continue
+            for variant in self.image_variants.get(image_id, []):
+                if variant['local_path'] in encoded_sizes:
+                    variant['size'] = encoded_sizes[variant['local_path']]
+        self._variant_futures = {}
+
+    @db_call
+    def commit(self):
+        """모은 쓰기를 하나의 트랜잭션으로 적용합니다. 성공 시 True."""
+        if self.post_data is None:
+            logging.error(f"게시물(ID: {self.post_id}) 단위 작업에 게시물 데이터가 없어 커밋하지 않습니다.")
+            return False
+
+        # 파생본 인코딩은 DB 연결을 잡기 전에 기다림 (대기 중 커넥션 풀을 점유하지 않도록)
+        self._wait_for_variants()
+
+        conn = get_db_connection()
+        if not conn:
+            return False
+
+        cursor = conn.cursor()
+        try:
+            # 카테고리/태그 ID 확보 (새 이름 생성은 게시물 트랜잭션 전에 별도로 커밋됨)
+            category_id = get_or_create_category_id(conn, cursor, self.post_data['category'])
+            if self.tag_names is not None:
+                tag_ids = get_or_create_tag_ids(conn, cursor, normalize_tag_names(self.tag_names)).values()
+
+            post_row_result = _write_post_row(cursor, self.post_data, category_id)
+            if self.render is not None:
+                _write_post_render(cursor, self.post_id, self.post_data.get('content'), self.render)
+            if self.tag_names is not None:
+                _write_post_tags(cursor, self.post_id, tag_ids)
+            if self.images or self.image_ids_to_delete:
+                # 바뀌거나 지워지는 이미지가 가리키던 파일의 참조 수도 다시 계산해야 하므로 미리 조회
+                cursor.execute(
+                    "SELECT DISTINCT content_hash FROM images WHERE post_id = %s AND content_hash IS NOT NULL",
+                    (self.post_id,)
+                )
+                affected_digests = {row[0] for row in cursor.fetchall()}
+                affected_digests.update(img.get('content_hash') for img in self.images.values())
+            if self.images:
+                _write_image_rows(cursor, self.images.values())
+                # 파생본은 이미지마다 통째로 교체 (원본이 바뀌었거나 파생본이 없어진 경우 포함)
+                cursor.executemany(SQL_DELETE_IMAGE_VARIANTS, [(image_id,) for image_id in self.images])
+                variant_rows = [
+                    (image_id, v['format'], v['width'], v['height'], v.get('size'), v['local_path'], v['web_path'], v['source_hash'])
+                    for image_id, variants in self.image_variants.items() if image_id in self.images
+                    for v in variants
+                ]
+                if variant_rows:
+                    cursor.executemany(SQL_INSERT_IMAGE_VARIANT, variant_rows)
+            if self.image_ids_to_delete:
+                cursor.executemany(SQL_DELETE_IMAGE, [(image_id,) for image_id in self.image_ids_to_delete])
+            if self.images or self.image_ids_to_delete:
+                _refresh_blob_ref_counts(cursor, affected_digests)
+            conn.commit()
+            self.post_row_result = post_row_result
+            logging.info(
+                f"게시물 '{self.post_data['title']}' (ID: {self.post_id}) 단위 작업 커밋 완료 "
+                f"(게시물 행: {post_row_result}, 이미지 {len(self.images)}개 저장, {len(self.image_ids_to_delete)}개 삭제, "
+                f"파생본 {sum(len(v) for v in self.image_variants.values())}개)."
+            )
+            return True
+        except mysql.connector.Error as err:
+            logging.error(f"게시물(ID: {self.post_id}) 단위 작업 커밋 중 오류 발생: {err}")
+            conn.rollback()
+            return False
+        except KeyError as e:
+            logging.error(f"게시물(ID: {self.post_id}) 단위 작업 커밋 실패: 필수 키 '{e}'가 누락되었습니다.")
+            conn.rollback()
+            return False
+        finally:
+            close_db_connection(conn, cursor)
+
+@db_call
+def get_post_sync_snapshot():
+    """DB의 모든 게시물에 대해 {id: {'notion_last_edited_time', 'slug', 'content_hash', 'rendered_hash'}}를 한 번의 쿼리로 가져옵니다.
+
+    rendered_hash는 저장된 미리 렌더링 HTML을 만든 입력의 해시입니다 (html_renderer.compute_render_hash, 없으면 None).
+
+    동기화 실행 동안 게시물 최신 여부 판단은 이 스냅샷으로 메모리에서 처리합니다.
+    조회 실패 시 None을 반환합니다.
+    """
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT p.id, p.notion_last_edited_time, p.slug, p.content_hash, r.content_hash "
+            "FROM posts p LEFT JOIN post_renders r ON r.post_id = p.id"
+        )
+        return {
+            row[0]: {'notion_last_edited_time': row[1], 'slug': row[2], 'content_hash': row[3], 'rendered_hash': row[4]}
+            for row in cursor.fetchall()
+        }
+    except mysql.connector.Error as err:
+        logging.error(f"DB에서 게시물 스냅샷 조회 중 오류 발생: {err}")
+        return None
+    finally:
+        close_db_connection(conn, cursor)
+
+# sync_state 테이블에서 값 읽기 (없거나 오류 시 None)
+@db_call
+def get_sync_state(name):
+
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        return None
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT value FROM sync_state WHERE name = %s", (name,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    except mysql.connector.Error as err:
+        logging.error(f"동기화 상태('{name}') 조회 중 오류 발생: {err}")
+        return None
+    finally:
+        close_db_connection(conn, cursor)
+
+# sync_state 테이블에 값 저장
+@db_call
+def set_sync_state(name, value):
+
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO sync_state (name, value) VALUES (%s, %s) ON DUPLICATE KEY UPDATE value = VALUES(value)",
+            (name, value)
+        )
+        conn.commit()
+        return True
+    except mysql.connector.Error as err:
+        logging.error(f"동기화 상태('{name}') 저장 중 오류 발생: {err}")
+        conn.rollback()
+        return False
+    finally:
+        close_db_connection(conn, cursor)
+
+# MySQL 네임드 락 (GET_LOCK): 동기화가 여러 프로세스/컨테이너에서 겹쳐 실행되지 않도록 함
+# 락은 연결에 묶여 있으므로 with 블록이 끝날 때까지 풀 연결 하나를 점유합니다 (프로세스가 죽으면 MySQL이 자동 해제).
+@contextmanager
+def named_lock(name, timeout=0):
+    """name 락을 잡고 있는 동안 with 블록을 실행합니다. 획득했으면 True, 아니면(다른 실행이 잡고 있거나 DB 오류) False를 내보냅니다."""
+    conn = get_db_connection(read_only=True)
+    if not conn:
+        yield False
+        return
+
+    cursor = conn.cursor()
+    acquired = False
+    try:
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+            row = cursor.fetchone()
+            acquired = bool(row) and row[0] == 1 # 0: 시간 초과, NULL: 오류
+        except mysql.connector.Error as err:
+            logging.error(f"DB 락('{name}') 획득 중 오류 발생: {err}")
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                cursor.fetchone()
+            except mysql.connector.Error as err:
+                logging.warning(f"DB 락('{name}') 해제 중 오류 발생 (연결이 끊기면 MySQL이 자동 해제): {err}")
+        close_db_connection(conn, cursor)
+
+@db_call
 def get_all_post_ids_from_db():
     """DB에 저장된 모든 게시물의 ID 목록을 반환합니다."""
-    conn = get_db_connection()
+    conn = get_db_connection(read_only=True)
     if not conn:
         return []
     
@@ -412,6 +1287,7 @@ def get_all_post_ids_from_db():
     return post_ids
 
 
+@db_call
 def delete_post_by_id(post_id):
     """특정 ID의 게시물을 DB에서 삭제하고, 연관된 로컬 이미지 폴더도 (비어있다면) 삭제 시도합니다."""
     conn = get_db_connection()
@@ -478,4 +1354,4 @@ if __name__ == '__main__':
     # 이 파일을 직접 실행하면 DB 스키마를 초기화합니다.
     # 실제 운영 환경에서는 main.py에서 필요에 따라 호출하도록 합니다.
     print("DB 스키마 초기화를 시도합니다...")
-    init_db_schema()
+    init_db_schema(force=True)
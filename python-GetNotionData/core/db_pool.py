@@ -0,0 +1,232 @@
+# MySQL 커넥션 풀
+# db_Manager의 모든 함수가 이 풀을 공유하여 매 호출마다 TCP+인증 핸드셰이크를 하지 않도록 합니다.
+
+import logging
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errors
+
+from . import metrics
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+# 서버와 왕복하는 연결 메서드 -> 메트릭 라벨 (커서의 execute와 prepared statement는 cmd_* 메서드를 거침)
+# C 확장(CMySQLConnection)의 commit/rollback은 cmd_query를 거치지 않고 바로 서버에 보내므로 따로 감쌉니다.
+_ROUND_TRIP_COMMANDS = {
+    'cmd_query': 'query', 'cmd_stmt_prepare': 'prepare', 'cmd_stmt_execute': 'execute',
+    'commit': 'commit', 'rollback': 'rollback',
+}
+
+def instrument_connection(conn):
+    """conn의 서버 왕복 메서드를 감싸 횟수와 시간을 기록합니다 (인스턴스 속성으로 덮어써 해당 연결에만 적용)."""
+    # 순수 파이썬 구현의 commit/rollback은 안에서 cmd_query를 부르므로, 감싼 메서드 안의 호출은 다시 세지 않음
+    # (연결은 한 번에 한 스레드만 쓰므로 연결별 상태로 충분)
+    active = []
+    for method_name, command in _ROUND_TRIP_COMMANDS.items():
+        method = getattr(conn, method_name, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _command=command, **kwargs):
+            if active:
+                return _method(*args, **kwargs)
+            active.append(_command)
+            try:
+                metrics.inc('db_round_trips_total', command=_command)
+                with metrics.timer('db_query_seconds', command=_command):
+                    return _method(*args, **kwargs)
+            finally:
+                active.pop()
+
+        setattr(conn, method_name, timed)
+
+
+class ConnectionPool:
+    """고정 크기의 MySQL 커넥션 풀 (체크아웃 시 헬스 체크, 연결별 prepared statement 캐시, 사용 통계).
+
+    읽기 전용 체크아웃(acquire(autocommit=True))은 autocommit 연결을 빌려줍니다. autocommit이 꺼진 연결에서는 SELECT만 해도
+    트랜잭션이 열려 반납할 때 ROLLBACK 왕복이 한 번 더 필요하기 때문입니다. 연결마다 autocommit 상태를 기억해
+    같은 상태의 유휴 연결을 먼저 빌려주고, 없을 때만 상태를 바꿉니다 (SET autocommit 왕복 1회).
+    """
+
+    def __init__(self, connect_kwargs, size=5, ping_interval=30, checkout_timeout=30):
+        self._connect_kwargs = dict(connect_kwargs)
+        self.size = max(1, int(size))
+        self.ping_interval = ping_interval        # 이 시간(초) 이상 놀던 연결은 체크아웃 시 ping 확인 (0이면 항상)
+        self.checkout_timeout = checkout_timeout  # 풀이 가득 찼을 때 최대 대기 시간(초)
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock) # 연결이 반납/폐기될 때 대기 중인 체크아웃을 깨움
+        self._idle = {False: [], True: []}  # autocommit 여부 -> [(conn, 마지막 반납 시각)] - 최근 사용한 연결부터 재사용
+        self._autocommit = {}           # id(conn) -> autocommit 여부 (서버에 묻지 않도록 기록)
+        self._created = 0               # 현재 살아있는 연결 수
+        self._prepared = {}             # id(conn) -> {sql: prepared cursor}
+
+        self._stats = {
+            'checkouts': 0,       # 연결 대여 횟수
+            'waits': 0,           # 풀이 가득 차서 대기한 횟수
+            'wait_seconds': 0.0,  # 대기한 총 시간
+            'handshakes': 0,      # 실제로 새 연결을 맺은 횟수
+            'health_check_failures': 0,
+            'prepared_statements': 0,
+            'autocommit_switches': 0,  # 유휴 연결의 autocommit 상태를 바꾼 횟수
+        }
+
+    # 새 연결 생성 (실제 TCP+인증 핸드셰이크)
+    def _connect(self, autocommit):
+        conn = mysql.connector.connect(**self._connect_kwargs, autocommit=autocommit)
+        instrument_connection(conn)
+        with self._lock:
+            self._autocommit[id(conn)] = autocommit
+            self._stats['handshakes'] += 1
+        metrics.inc('db_connections_total')
+        logging.info("MySQL 데이터베이스에 새 연결을 맺었습니다 (풀).")
+        return conn
+
+    # 체크아웃 시 헬스 체크 (오래 놀던 연결만 ping)
+    def _is_healthy(self, conn, idle_since):
+        if self.ping_interval and time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except errors.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._available:
+            self._created -= 1
+            self._autocommit.pop(id(conn), None)
+            cursors = self._prepared.pop(id(conn), {})
+            self._available.notify()
+        for cursor in cursors.values():
+            try:
+                cursor.close()
+            except errors.Error:
+                pass
+        try:
+            conn.close()
+        except errors.Error:
+            pass
+
+    def acquire(self, autocommit=False):
+        """풀에서 연결을 빌립니다. 여유가 없으면 checkout_timeout 동안 대기합니다.
+
+        autocommit=True는 읽기만 하는 호출용입니다 (트랜잭션이 열리지 않아 반납할 때 롤백하지 않음).
+        """
+        conn = self._checkout(autocommit)
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return conn
+
+    # 유휴 연결(같은 autocommit 상태 우선)을 꺼내거나 새로 만들 자리를 예약. (conn, 반납 시각), 새로 만들 차례면 (None, None)
+    def _take_idle(self, autocommit):
+        wait_start = None
+        with self._available:
+            try:
+                while True:
+                    for mode in (autocommit, not autocommit):
+                        if self._idle[mode]:
+                            return self._idle[mode].pop()
+                    if self._created < self.size:
+                        self._created += 1
+                        return None, None
+
+                    # 풀이 가득 참 -> 반납될 때까지 대기
+                    if wait_start is None:
+                        wait_start = time.monotonic()
+                        self._stats['waits'] += 1
+                    remaining = wait_start + self.checkout_timeout - time.monotonic()
+                    if remaining <= 0:
+                        raise errors.PoolError(
+                            f"커넥션 풀에서 {self.checkout_timeout}초 동안 사용 가능한 연결을 얻지 못했습니다 (size={self.size})."
+                        )
+                    self._available.wait(remaining)
+            finally:
+                if wait_start is not None:
+                    self._stats['wait_seconds'] += time.monotonic() - wait_start
+
+    def _checkout(self, autocommit):
+        while True:
+            conn, idle_since = self._take_idle(autocommit)
+            if conn is None:
+                try:
+                    return self._connect(autocommit)
+                except errors.Error:
+                    with self._available:
+                        self._created -= 1
+                        self._available.notify()
+                    raise
+
+            if not self._is_healthy(conn, idle_since):
+                logging.warning("풀의 MySQL 연결이 끊어져 있어 폐기 후 다시 연결합니다.")
+                with self._lock:
+                    self._stats['health_check_failures'] += 1
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                switch = self._autocommit.get(id(conn)) != autocommit
+            if switch:
+                try:
+                    conn.autocommit = autocommit
+                except errors.Error:
+                    self._discard(conn)
+                    continue
+                with self._lock:
+                    self._autocommit[id(conn)] = autocommit
+                    self._stats['autocommit_switches'] += 1
+            return conn
+
+    def release(self, conn, discard=False):
+        """연결을 풀에 반납합니다. 끝나지 않은 트랜잭션은 롤백합니다 (autocommit 연결은 열린 트랜잭션이 없음)."""
+        if conn is None:
+            return
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except errors.Error:
+                discard = True
+        if discard:
+            self._discard(conn)
+            return
+        with self._available:
+            self._idle[self._autocommit.get(id(conn), False)].append((conn, time.monotonic()))
+            self._available.notify()
+
+    def prepared_cursor(self, conn, sql):
+        """연결별로 캐시된 서버 측 prepared statement 커서를 반환합니다.
+
+        같은 sql 문자열 객체로 다시 execute하면 PREPARE 없이 EXECUTE만 수행됩니다.
+        반환된 커서는 풀이 관리하므로 호출자가 닫으면 안 됩니다.
+        """
+        with self._lock:
+            cursors = self._prepared.setdefault(id(conn), {})
+            cursor = cursors.get(sql)
+        if cursor is None:
+            cursor = conn.cursor(prepared=True)
+            with self._lock:
+                cursors[sql] = cursor
+                self._stats['prepared_statements'] += 1
+        return cursor
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self.size
+            snapshot['open_connections'] = self._created
+        snapshot['handshakes_saved'] = max(0, snapshot['checkouts'] - snapshot['handshakes'])
+        return snapshot
+
+    def close_all(self):
+        """풀의 유휴 연결을 모두 닫습니다."""
+        with self._lock:
+            idle = self._idle[False] + self._idle[True]
+            self._idle = {False: [], True: []}
+        for conn, _ in idle:
+            self._discard(conn)
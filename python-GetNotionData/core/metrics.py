@@ -0,0 +1,224 @@
+# 동기화 계측 (카운터, 히스토그램)
+# 프로세스 전체가 공유하는 레지스트리에 단계별 소요 시간과 횟수를 누적하고,
+# 실행이 끝나면 Prometheus 텍스트 형식(textfile collector용)과 JSON 요약으로 내보냅니다.
+# 상주 실행에서는 같은 데이터를 로컬 HTTP 엔드포인트(/metrics, /status)로도 제공합니다.
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 소요 시간 히스토그램 구간 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 메트릭 이름 -> (종류, 설명). 여기 없는 이름도 쓸 수 있지만 HELP 줄이 붙지 않습니다.
+METRIC_HELP = {
+    'sync_stage_seconds': ('histogram', "동기화 단계별 소요 시간 (stage: db_snapshot, block_fetch, markdown_render, image_download, html_render, db_commit, delete_posts, blob_gc, run)"),
+    'sync_post_seconds': ('histogram', "게시물 하나의 처리 시간 (result: updated, unchanged, skipped, failed)"),
+    'sync_posts_total': ('counter', "처리한 게시물 수 (result별)"),
+    'sync_posts_deleted_total': ('counter', "DB에서 삭제한 게시물 수"),
+    'sync_runs_total': ('counter', "동기화 실행 횟수 (result: ok, partial, failed, locked)"),
+    'notion_request_seconds': ('histogram', "Notion API 호출 시간 (속도 제한 대기와 재시도 포함, endpoint별)"),
+    'notion_requests_total': ('counter', "Notion API로 실제로 보낸 요청 수 (재시도 포함)"),
+    'notion_throttled_total': ('counter', "Notion API 429 응답 수"),
+    'notion_retried_total': ('counter', "Notion API 재시도 횟수"),
+    'notion_failed_total': ('counter', "재시도 후에도 실패한 Notion API 호출 수"),
+    'notion_bucket_wait_seconds_total': ('counter', "속도 제한 토큰 버킷 대기 시간 합계"),
+    'notion_retry_wait_seconds_total': ('counter', "Notion API 재시도 대기 시간 합계"),
+    'image_download_seconds': ('histogram', "이미지 다운로드 시간"),
+    'db_round_trips_total': ('counter', "MySQL 서버 왕복 횟수 (command: query, prepare, execute, commit, rollback)"),
+    'db_query_seconds': ('histogram', "MySQL 서버 왕복 시간 (command별)"),
+    'db_call_seconds': ('histogram', "db_Manager 함수 호출 시간 (연결 대기와 모든 왕복 포함, call: 함수 이름)"),
+    'db_connections_total': ('counter', "새로 맺은 MySQL 연결 수"),
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_key, extra=()):
+    items = list(label_key) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in items) + '}'
+
+
+# snapshot()/JSON 요약용 라벨 표기 (예: "stage=block_fetch", 라벨이 없으면 "")
+def _plain_labels(label_key):
+    return ','.join(f'{name}={value}' for name, value in label_key)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """스레드 간 공유하는 카운터/히스토그램 저장소 (값은 프로세스가 살아있는 동안 누적)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}     # (이름, 라벨) -> 값
+        self._histograms = {}   # (이름, 라벨) -> [구간별 개수..., 합계, 개수]
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        """{'counters': {이름: {라벨 문자열: 값}}, 'histograms': {이름: {라벨 문자열: {'count', 'sum'}}}}"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (state[-2], state[-1]) for key, state in self._histograms.items()}
+        result = {'counters': {}, 'histograms': {}}
+        for (name, label_key), value in sorted(counters.items()):
+            result['counters'].setdefault(name, {})[_plain_labels(label_key)] = value
+        for (name, label_key), (total, count) in sorted(histograms.items()):
+            result['histograms'].setdefault(name, {})[_plain_labels(label_key)] = {'count': count, 'sum': total}
+        return result
+
+    def render_prometheus(self):
+        """Prometheus 텍스트 노출 형식 (0.0.4)으로 모든 메트릭을 반환합니다."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(state)) for key, state in self._histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, default_type):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, help_text = METRIC_HELP.get(name, (default_type, None))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, label_key), value in counters:
+            describe(name, 'counter')
+            lines.append(f"{name}{_format_labels(label_key)} {_format_value(value)}")
+        for (name, label_key), state in histograms:
+            describe(name, 'histogram')
+            for bound, count in zip(self.buckets + (math.inf,), state[:len(self.buckets)] + [state[-1]]):
+                lines.append(f"{name}_bucket{_format_labels(label_key, [('le', _format_value(bound))])} {count}")
+            lines.append(f"{name}_sum{_format_labels(label_key)} {_format_value(state[-2])}")
+            lines.append(f"{name}_count{_format_labels(label_key)} {state[-1]}")
+        return '\n'.join(lines) + '\n'
+
+
+# 두 snapshot()의 차이 (한 번의 실행 동안 늘어난 값만, 바뀌지 않은 항목은 생략)
+def snapshot_delta(before, after):
+    delta = {'counters': {}, 'histograms': {}}
+    for name, series in after['counters'].items():
+        for labels, value in series.items():
+            diff = value - before['counters'].get(name, {}).get(labels, 0)
+            if diff:
+                delta['counters'].setdefault(name, {})[labels] = round(diff, 6) if isinstance(diff, float) else diff
+    for name, series in after['histograms'].items():
+        for labels, state in series.items():
+            previous = before['histograms'].get(name, {}).get(labels, {'count': 0, 'sum': 0.0})
+            count = state['count'] - previous['count']
+            if count:
+                total = state['sum'] - previous['sum']
+                delta['histograms'].setdefault(name, {})[labels] = {
+                    'count': count, 'sum': round(total, 6), 'avg': round(total / count, 6),
+                }
+    return delta
+
+
+# 파일을 임시 파일에 쓴 뒤 교체 (textfile collector가 쓰다 만 파일을 읽지 않도록)
+def write_file_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+# 모든 모듈이 공유하는 레지스트리
+_registry = MetricsRegistry()
+
+def get_metrics():
+    return _registry
+
+def inc(name, amount=1, **labels):
+    _registry.inc(name, amount, **labels)
+
+def observe(name, value, **labels):
+    _registry.observe(name, value, **labels)
+
+def timer(name, **labels):
+    return _registry.timer(name, **labels)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    status_provider = None # 마지막 실행 결과(dict)를 반환하는 함수
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/metrics':
+            self._send(200, 'text/plain; version=0.0.4; charset=utf-8', _registry.render_prometheus())
+        elif path == '/status':
+            status = self.status_provider() if self.status_provider else None
+            self._send(200 if status else 503, 'application/json; charset=utf-8',
+                       json.dumps(status or {'result': 'pending'}, ensure_ascii=False))
+        else:
+            self._send(404, 'text/plain; charset=utf-8', 'not found\n')
+
+    def _send(self, code, content_type, text):
+        body = text.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # 스크레이프마다 로그를 남기지 않음
+        pass
+
+
+def start_metrics_server(host, port, status_provider=None):
+    """/metrics(Prometheus 텍스트)와 /status(마지막 실행 결과 JSON)를 제공하는 HTTP 서버를 백그라운드 스레드로 시작합니다."""
+    handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'status_provider': staticmethod(status_provider)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logging.info(f"메트릭 HTTP 엔드포인트 시작: http://{host}:{server.server_address[1]}/metrics")
+    return server
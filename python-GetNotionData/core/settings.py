@@ -10,6 +10,13 @@ load_dotenv(dotenv_path=dotenv_path)
 NOTION_API_KEY = os.environ.get('NOTION_API_KEY')
 NOTION_DATABASE_ID = os.environ.get('NOTION_DATABASE_ID')
 
+# Notion API 호출 속도 제한 (Notion 문서 기준 평균 약 3 req/s)
+NOTION_RATE_LIMIT_PER_SEC = float(os.environ.get('NOTION_RATE_LIMIT_PER_SEC', 3))
+NOTION_MAX_CONCURRENCY = int(os.environ.get('NOTION_MAX_CONCURRENCY', 3)) # 동시 요청 수 상한 (429 발생 시 자동으로 줄어듦)
+NOTION_MAX_RETRIES = int(os.environ.get('NOTION_MAX_RETRIES', 5)) # 429/일시적 오류 재시도 횟수
+
+BLOCK_FETCH_WORKERS = int(os.environ.get('BLOCK_FETCH_WORKERS', 3)) # 같은 깊이의 자식 블록을 동시에 조회할 스레드 수
+
 # MySQL DB Connection Info
 DB_HOST = os.environ.get('DB_HOST')
 DB_USER = os.environ.get('DB_USER')
@@ -17,33 +24,120 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD')
 DB_NAME = os.environ.get('DB_NAME')
 DB_PORT = int(os.environ.get('DB_PORT', 3306)) # MySQL 기본 포트
 
+# MySQL 커넥션 풀 설정 (max_connections = 50 인 서버이므로 작게 유지)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 30)) # 이 시간(초) 이상 유휴 상태였던 연결은 체크아웃 시 ping 확인
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30)) # 풀이 가득 찼을 때 연결을 기다리는 최대 시간(초)
+
+# 게시물 동시 처리 워커 수 (1이면 순차 처리)
+SYNC_WORKERS = int(os.environ.get('SYNC_WORKERS', 4))
+
+# 이미지 파일 삭제 스레드 수 (게시물 일괄 삭제, 미사용 이미지 정리 시)
+FILE_REMOVE_WORKERS = int(os.environ.get('FILE_REMOVE_WORKERS', 4))
+
+# 이미지 저장소 GC(image_gc.py): 이 시간(초)보다 최근에 바뀐 파일은 진행 중인 동기화의 것일 수 있어 건드리지 않음
+IMAGE_GC_MIN_AGE = int(os.environ.get('IMAGE_GC_MIN_AGE', 3600))
+
+# 동기화 방식: incremental(워터마크 이후 수정된 페이지만 조회) 또는 full(매번 전체 조회 + 삭제 확인)
+SYNC_MODE = os.environ.get('SYNC_MODE', 'incremental').lower()
+FULL_SYNC_INTERVAL = int(os.environ.get('FULL_SYNC_INTERVAL', 6 * 3600)) # 증분 모드에서도 이 간격(초)마다 전체 동기화
+SYNC_WATERMARK_OVERLAP = int(os.environ.get('SYNC_WATERMARK_OVERLAP', 120)) # 증분 조회 시 워터마크보다 앞당겨 조회할 시간(초)
+
+# 상주 실행(main.py --daemon)
+SYNC_POLL_INTERVAL = int(os.environ.get('SYNC_POLL_INTERVAL', 60)) # 변경 확인 간격(초, Notion 요청 1회)
+SYNC_POLL_JITTER = float(os.environ.get('SYNC_POLL_JITTER', 0.2)) # 확인 간격을 ±이 비율만큼 무작위로 흔듦
+SYNC_DAEMON_INTERVAL = int(os.environ.get('SYNC_DAEMON_INTERVAL', 1800)) # 변경이 없어도 이 간격(초)마다 동기화 (실패한 게시물 재시도 등)
+SYNC_LOCK_NAME = os.environ.get('SYNC_LOCK_NAME', 'notion_sync') # 동기화가 겹치지 않도록 잡는 MySQL 락 이름
+SYNC_LOCK_TIMEOUT = int(os.environ.get('SYNC_LOCK_TIMEOUT', 0)) # 락을 기다리는 시간(초), 0이면 바로 포기
+
 # Image Storage Path (Host Path)
 # 이 경로는 Python 스크립트가 실행되는 환경(호스트)에서 이미지를 저장할 실제 물리적 경로입니다.
 # Docker를 사용한다면, 이 경로가 Docker 컨테이너로 볼륨 마운트될 수 있습니다.
 IMAGE_HOST_STORAGE_PATH = os.environ.get('IMAGE_HOST_STORAGE_PATH')
 
+# 이미지 저장 방식
+#   content: 내용 해시(SHA-256)로 이름 붙인 파일을 objects/ 아래에 한 번만 저장하고 게시물 간 공유 (참조 수로 관리)
+#   post: 기존 방식 (<slug>/<블록ID>.<확장자>)
+IMAGE_STORAGE_MODE = os.environ.get('IMAGE_STORAGE_MODE', 'content').lower()
+
+# 이미지 파생본 (다운로드한 원본에서 WebP/AVIF를 여러 너비로 생성, 프로세스 풀에서 인코딩)
+IMAGE_VARIANTS_ENABLED = os.environ.get('IMAGE_VARIANTS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+IMAGE_VARIANT_WIDTHS = sorted({int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '640,1280,1920').split(',') if w.strip()})
+IMAGE_VARIANT_DEFAULT_WIDTH = int(os.environ.get('IMAGE_VARIANT_DEFAULT_WIDTH', 1280)) # 마크다운 본문에 넣을 기본 너비
+IMAGE_VARIANT_AVIF = os.environ.get('IMAGE_VARIANT_AVIF', 'false').lower() in ('1', 'true', 'yes') # WebP 외에 AVIF도 생성
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 80))
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 1)) # 인코딩 프로세스 수 (컨테이너 CPU 0.3 기준)
+
+# Notion 블록 자식 목록 캐시 (SQLite). 기본 위치는 이미지 저장 경로 안의 .cache 디렉터리
+# 블록마다 last_edited_time, has_children이 그대로이면 적중합니다 (notion_handler/block_cache.py 참고)
+BLOCK_CACHE_ENABLED = os.environ.get('BLOCK_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+BLOCK_CACHE_PATH = os.environ.get('BLOCK_CACHE_PATH') or (
+    os.path.join(IMAGE_HOST_STORAGE_PATH, '.cache', 'notion_blocks.sqlite3') if IMAGE_HOST_STORAGE_PATH else None
+)
+BLOCK_CACHE_MAX_BYTES = int(os.environ.get('BLOCK_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+BLOCK_CACHE_MAX_AGE = int(os.environ.get('BLOCK_CACHE_MAX_AGE', 7 * 24 * 3600)) # 초, 0이면 무제한
+
+# Notion API 응답 기록/재생 (개발용, notion_handler/cassette.py)
+#   off: 사용 안 함, record: 실제 API 응답을 카세트에 기록, replay: 카세트의 응답만 사용 (Notion에 요청하지 않음)
+NOTION_CASSETTE_MODE = os.environ.get('NOTION_CASSETTE_MODE', 'off').lower()
+NOTION_CASSETTE_PATH = os.environ.get('NOTION_CASSETTE_PATH') or (
+    os.path.join(IMAGE_HOST_STORAGE_PATH, '.cache', 'notion_cassette.sqlite3') if IMAGE_HOST_STORAGE_PATH else None
+)
+NOTION_REPLAY_LATENCY = float(os.environ.get('NOTION_REPLAY_LATENCY', 0)) # 재생할 때 요청마다 더할 지연(초), 예: 0.3
+
+# 마지막 동기화 실행 결과(JSON). 기본 위치는 이미지 저장 경로 안의 .cache 디렉터리
+SYNC_STATUS_PATH = os.environ.get('SYNC_STATUS_PATH') or (
+    os.path.join(IMAGE_HOST_STORAGE_PATH, '.cache', 'sync_status.json') if IMAGE_HOST_STORAGE_PATH else None
+)
+
+# 동기화 메트릭 (core/metrics.py)
+# 실행이 끝날 때마다 Prometheus textfile collector 형식으로 기록 (빈 값이면 기록하지 않음)
+METRICS_TEXTFILE_PATH = os.environ.get('METRICS_TEXTFILE_PATH') or (
+    os.path.join(IMAGE_HOST_STORAGE_PATH, '.cache', 'sync_metrics.prom') if IMAGE_HOST_STORAGE_PATH else None
+)
+# 상주 실행에서 /metrics, /status를 제공할 주소 (포트 0이면 끔)
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9464))
+
+# 이미지 다운로드용 공유 HTTP 세션 (keep-alive로 연결/TLS 핸드셰이크 재사용)
+IMAGE_HTTP_POOL_CONNECTIONS = int(os.environ.get('IMAGE_HTTP_POOL_CONNECTIONS', 10)) # 연결 풀을 유지할 호스트 수
+IMAGE_HTTP_POOL_MAXSIZE = int(os.environ.get('IMAGE_HTTP_POOL_MAXSIZE', max(4, SYNC_WORKERS * 2))) # 호스트당 유지할 연결 수
+IMAGE_DOWNLOAD_TIMEOUT = int(os.environ.get('IMAGE_DOWNLOAD_TIMEOUT', 10)) # 초
+IMAGE_DOWNLOAD_RETRIES = int(os.environ.get('IMAGE_DOWNLOAD_RETRIES', 2)) # 연결 오류/5xx 재시도 횟수
+
+# 미리 렌더링한 HTML의 읽기 시간 계산 기준 (분당 단어 수, 공백으로 나눈 단어 기준)
+READING_WORDS_PER_MINUTE = int(os.environ.get('READING_WORDS_PER_MINUTE', 200))
+
 # Next.js API 라우트를 통해 접근될 이미지 기본 웹 경로
 IMAGE_WEB_BASE_PATH = "/api/images"
 
 # 유효성 검사 (필수 환경 변수)
-required_settings = {
-    "NOTION_API_KEY": NOTION_API_KEY,
-    "NOTION_DATABASE_ID": NOTION_DATABASE_ID,
-    "DB_USER": DB_USER,
-    "DB_PASSWORD": DB_PASSWORD,
-    "DB_NAME": DB_NAME
-}
-
-missing_settings = [key for key, value in required_settings.items() if not value]
-if missing_settings:
-    raise ValueError(f"필수 환경 변수가 설정되지 않았습니다: {', '.join(missing_settings)}")
-
-print("환경 변수 로드 완료:")
-print(f"  NOTION_API_KEY: {f'설정됨' if NOTION_API_KEY else '누락됨'}")
-print(f"  NOTION_DATABASE_ID: {f'설정됨' if NOTION_DATABASE_ID else '누락됨'}")
-print(f"  DB_HOST: {DB_HOST}")
-print(f"  DB_USER: {f'설정됨' if DB_USER else '누락됨'}")
-print(f"  DB_PASSWORD: {f'설정됨' if DB_PASSWORD else '누락됨'}")
-print(f"  DB_NAME: {f'설정됨' if DB_NAME else '누락됨'}")
-print(f"  DB_PORT: {DB_PORT}")
-print(f"  IMAGE_HOST_STORAGE_PATH: {IMAGE_HOST_STORAGE_PATH}")
\ No newline at end of file
+# 임포트할 때 검사하지 않고, 값을 실제로 쓰는 곳(Notion 클라이언트, DB 커넥션 풀)을 처음 만들 때 검사합니다.
+# 파서/렌더러만 임포트하는 스크립트나 도구는 Notion/DB 설정 없이도 동작합니다.
+NOTION_REQUIRED_SETTINGS = ('NOTION_API_KEY', 'NOTION_DATABASE_ID')
+DB_REQUIRED_SETTINGS = ('DB_USER', 'DB_PASSWORD', 'DB_NAME')
+
+def require(*names):
+    """names 설정이 모두 있는지 확인하고, 없으면 ValueError를 냅니다."""
+    missing_settings = [name for name in names if not globals().get(name)]
+    if missing_settings:
+        raise ValueError(f"필수 환경 변수가 설정되지 않았습니다: {', '.join(missing_settings)}")
+
+
+def print_summary():
+    """로드한 주요 설정을 출력합니다 (실행 진입점에서 한 번 호출)."""
+    print("환경 변수 로드 완료:")
+    print(f"  NOTION_API_KEY: {f'설정됨' if NOTION_API_KEY else '누락됨'}")
+    print(f"  NOTION_DATABASE_ID: {f'설정됨' if NOTION_DATABASE_ID else '누락됨'}")
+    print(f"  DB_HOST: {DB_HOST}")
+    print(f"  DB_USER: {f'설정됨' if DB_USER else '누락됨'}")
+    print(f"  DB_PASSWORD: {f'설정됨' if DB_PASSWORD else '누락됨'}")
+    print(f"  DB_NAME: {f'설정됨' if DB_NAME else '누락됨'}")
+    print(f"  DB_PORT: {DB_PORT}")
+    print(f"  DB_POOL_SIZE: {DB_POOL_SIZE}")
+    print(f"  SYNC_WORKERS: {SYNC_WORKERS}")
+    print(f"  SYNC_MODE: {SYNC_MODE}")
+    if NOTION_CASSETTE_MODE != 'off':
+        print(f"  NOTION_CASSETTE_MODE: {NOTION_CASSETTE_MODE} ({NOTION_CASSETTE_PATH})")
+    print(f"  IMAGE_HOST_STORAGE_PATH: {IMAGE_HOST_STORAGE_PATH}")
+    print(f"  IMAGE_STORAGE_MODE: {IMAGE_STORAGE_MODE}")
@@ -0,0 +1,60 @@
+# 동기화 상태 (sync_state 테이블의 키와 값 해석)
+# main.py(한 번 실행)와 sync_daemon.py(상주 실행)가 함께 사용합니다.
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from core import settings
+from core import db_Manager
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 증분 동기화 상태 키 (sync_state 테이블)
+WATERMARK_STATE = 'notion_last_edited_watermark' # 이 시각 이후 수정된 페이지만 조회
+LAST_FULL_SYNC_STATE = 'last_full_sync_at'       # 마지막 전체 동기화(삭제 확인 포함) 시각
+LAST_RUN_STATE = 'last_run'                      # 마지막 실행 결과 요약 (JSON)
+FAILED_POSTS_STATE = 'failed_post_ids'           # 처리에 실패해 다음 실행에서 다시 조회할 페이지 ID 목록 (JSON)
+
+# Notion 필터에 쓰는 ISO 8601 (UTC) 형식
+def format_notion_timestamp(dt):
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+def parse_notion_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+# 증분 조회를 시작할 시각 (워터마크 - SYNC_WATERMARK_OVERLAP, Notion 필터 형식). 워터마크가 없으면 None
+# Notion의 last_edited_time은 분 단위로 기록되므로 워터마크보다 조금 앞에서부터 겹쳐서 조회합니다.
+def watermark_edited_since():
+    watermark = db_Manager.get_sync_state(WATERMARK_STATE)
+    if not watermark:
+        return None
+    return format_notion_timestamp(parse_notion_timestamp(watermark) - timedelta(seconds=settings.SYNC_WATERMARK_OVERLAP))
+
+
+# 지난 실행에서 실패한 페이지 ID 목록 (없거나 읽을 수 없으면 빈 목록)
+def load_failed_post_ids():
+    value = db_Manager.get_sync_state(FAILED_POSTS_STATE)
+    try:
+        return json.loads(value) if value else []
+    except ValueError:
+        logging.warning(f"sync_state의 '{FAILED_POSTS_STATE}' 값을 읽을 수 없어 무시합니다.")
+        return []
+
+
+# 이번 실행을 전체 동기화로 할지 결정
+# (SYNC_MODE=full 이거나, 워터마크가 없거나, 마지막 전체 동기화 후 FULL_SYNC_INTERVAL이 지났으면 전체 동기화)
+def is_full_sync_due(now):
+    if settings.SYNC_MODE == 'full':
+        return True
+    watermark = db_Manager.get_sync_state(WATERMARK_STATE)
+    last_full_sync_at = db_Manager.get_sync_state(LAST_FULL_SYNC_STATE)
+    if not watermark or not last_full_sync_at:
+        return True
+    try:
+        elapsed = (now - parse_notion_timestamp(last_full_sync_at)).total_seconds()
+    except ValueError:
+        return True
+    return elapsed >= settings.FULL_SYNC_INTERVAL
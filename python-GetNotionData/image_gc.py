@@ -0,0 +1,326 @@
+# 이미지 저장소(IMAGE_HOST_STORAGE_PATH) 전체 정리 (GC)
+# 동기화 중 정리는 DB가 알고 있는 이미지만 다루므로, 중단된 실행이 남긴 파일, slug 변경으로 남은 <이전 slug>/ 폴더,
+# DB 저장에 실패한 이미지 파일 등은 계속 남습니다. 이 스크립트는 저장소 전체를 DB와 비교해 정리합니다.
+#
+# 파일 시스템(os.scandir)과 DB(images, image_blobs, image_variants의 local_path)를 모두 경로 순서로 읽으면서
+# 병합 정렬처럼 한 번에 비교하므로, 파일이 수십만 개여도 메모리 사용량은 폴더 하나의 항목 수 정도입니다.
+#   - 고아 파일: 어떤 DB 행도 가리키지 않는 파일 (남은 .part 임시 파일 포함)
+#   - 끊긴 행: 가리키는 파일이 없는 DB 행
+#
+# 사용법 (python-GetNotionData 디렉터리에서):
+#   python image_gc.py                     # 보고만 함 (dry-run, 기본)
+#   python image_gc.py --delete            # 고아 파일과 빈 폴더 삭제
+#   python image_gc.py --delete-dangling   # 끊긴 DB 행 삭제 (--delete와 함께 사용 가능)
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from core import settings
+from core import db_Manager
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 다운로드 중인 임시 파일 확장자 (image_handler.download_image_to_temp)
+TEMP_FILE_SUFFIX = '.part'
+
+# 끊긴 행을 이 개수만큼 모아 한 트랜잭션으로 삭제
+DANGLING_DELETE_BATCH = 500
+
+
+class StorageGC:
+    """저장소 폴더와 DB의 이미지 경로를 정렬된 순서로 함께 훑어 고아 파일과 끊긴 행을 찾습니다."""
+
+    def __init__(self, root, delete_files=False, delete_rows=False, min_age=3600, report_limit=20):
+        self.root = os.path.normpath(root)
+        self.delete_files = delete_files
+        self.delete_rows = delete_rows
+        self.min_age = min_age            # 이보다 최근에 바뀐 파일/폴더는 진행 중인 동기화의 것일 수 있어 건드리지 않음
+        self.report_limit = report_limit  # 개별 로그로 남길 최대 항목 수 (종류별)
+        self.skip_dirs = self._protected_dirs()
+
+        self._now = time.time()
+        self._stack = []                  # 폴더 순회 스택: [상대 경로 접두어, 항목 이터레이터, 절대 경로, 남은 항목 수, 순회 전 수정 시각]
+        self._dangling = {'images': [], 'image_variants': [], 'image_blobs': []}
+        self._reported = {'orphan': 0, 'dangling': 0}
+        self.stats = {
+            'dirs_scanned': 0, 'files_scanned': 0, 'bytes_scanned': 0,
+            'rows_scanned': 0, 'rows_outside_root': 0, 'files_referenced': 0,
+            'orphan_files': 0, 'orphan_bytes': 0, 'temp_files': 0, 'skipped_recent': 0,
+            'files_deleted': 0, 'bytes_deleted': 0, 'dirs_removed': 0, 'empty_dirs': 0,
+            'dangling_images': 0, 'dangling_image_variants': 0, 'dangling_image_blobs': 0, 'rows_deleted': 0,
+            'errors': 0,
+        }
+
+    # 저장소 안에 있지만 이미지가 아닌 폴더 (블록 캐시 SQLite 등)
+    def _protected_dirs(self):
+        protected = {'.cache'}
+        if settings.BLOCK_CACHE_PATH:
+            cache_dir = os.path.relpath(os.path.dirname(os.path.abspath(settings.BLOCK_CACHE_PATH)), os.path.abspath(self.root))
+            if not cache_dir.startswith(os.pardir) and cache_dir != os.curdir:
+                protected.add(cache_dir)
+        return protected
+
+    # ---- 파일 시스템 쪽: 상대 경로의 문자열 순서대로 파일을 내보냄 ----
+
+    # 폴더 항목을 정렬. 폴더 이름 뒤에 구분자를 붙여 정렬하면, 깊이 우선 순회 순서가 전체 경로의 문자열 순서와 같아짐
+    # (예: 'a-b' < 'a/c' 이므로 'a-b' 파일이 'a/' 폴더보다 먼저)
+    def _sorted_entries(self, path):
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name + os.sep if is_dir else entry.name, entry))
+        entries.sort(key=lambda item: item[0])
+        self.stats['dirs_scanned'] += 1
+        return iter(entries)
+
+    def _keep_current(self):
+        """현재 폴더에 남는 항목이 하나 있음을 기록 (폴더를 지우지 않도록)."""
+        if self._stack:
+            self._stack[-1][3] += 1
+
+    def _iter_files(self):
+        """(저장소 기준 상대 경로, DirEntry)를 경로 순서로 내보냅니다."""
+        self._stack = [['', self._sorted_entries(self.root), self.root, 0, None]]
+        while self._stack:
+            prefix, entries = self._stack[-1][:2]
+            item = next(entries, None)
+            if item is None:
+                frame = self._stack.pop()
+                if frame[0]: # 루트 폴더 자체는 지우지 않음
+                    self._finish_dir(frame[2], frame[3], frame[4])
+                continue
+
+            sort_key, entry = item
+            rel_path = prefix + entry.name
+            if sort_key.endswith(os.sep):
+                if rel_path in self.skip_dirs:
+                    self._keep_current()
+                    continue
+                try:
+                    # 안의 파일을 지우면 폴더 수정 시각이 바뀌므로 순회 전에 읽어 둠
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                    self._stack.append([rel_path + os.sep, self._sorted_entries(entry.path), entry.path, 0, mtime])
+                except OSError as e:
+                    logging.error(f"폴더를 읽을 수 없습니다 ({entry.path}): {e}")
+                    self.stats['errors'] += 1
+                    self._keep_current()
+                continue
+
+            if not entry.is_file(follow_symlinks=False): # 심볼릭 링크, 특수 파일은 건드리지 않음
+                self._keep_current()
+                continue
+            yield rel_path, entry
+
+    # 폴더의 모든 항목을 처리한 뒤: 남은 항목이 없고 오래된 폴더면 삭제 (slug 변경으로 남은 폴더 등)
+    def _finish_dir(self, dir_path, remaining, mtime):
+        if remaining:
+            self._keep_current()
+            return
+        if self._now - mtime < self.min_age:
+            self._keep_current()
+            return
+        self.stats['empty_dirs'] += 1
+        if not self.delete_files:
+            logging.info(f"[dry-run] 비게 될 폴더: {dir_path}")
+            return
+        try:
+            os.rmdir(dir_path)
+            self.stats['dirs_removed'] += 1
+            logging.info(f"빈 폴더 삭제됨: {dir_path}")
+        except OSError: # 그 사이 새 파일이 생긴 경우 등
+            self._keep_current()
+
+    # ---- DB 쪽: 저장소 안의 경로만 상대 경로로 바꿔 내보냄 ----
+
+    def _iter_rows(self):
+        prefix = self.root + os.sep
+        for local_path, table, key in db_Manager.iter_image_path_rows():
+            self.stats['rows_scanned'] += 1
+            normalized = os.path.normpath(local_path) if local_path else ''
+            if not normalized.startswith(prefix):
+                self.stats['rows_outside_root'] += 1
+                continue
+            yield normalized[len(prefix):], table, key
+
+    # ---- 비교 ----
+
+    def _handle_orphan(self, rel_path, entry):
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError: # 순회 중 삭제됨
+            return
+        self.stats['files_scanned'] += 1
+        self.stats['bytes_scanned'] += stat.st_size
+        if self._now - stat.st_mtime < self.min_age:
+            self.stats['skipped_recent'] += 1
+            self._keep_current()
+            return
+
+        self.stats['orphan_files'] += 1
+        self.stats['orphan_bytes'] += stat.st_size
+        if rel_path.endswith(TEMP_FILE_SUFFIX):
+            self.stats['temp_files'] += 1
+
+        if not self.delete_files:
+            # 삭제했다고 가정하고 폴더는 남은 항목으로 세지 않음 (삭제될 빈 폴더도 함께 보고)
+            self._report('orphan', f"[dry-run] 고아 파일: {entry.path} ({stat.st_size} bytes)")
+            return
+        try:
+            os.remove(entry.path)
+            self.stats['files_deleted'] += 1
+            self.stats['bytes_deleted'] += stat.st_size
+            self._report('orphan', f"고아 파일 삭제됨: {entry.path} ({stat.st_size} bytes)")
+        except OSError as e:
+            logging.error(f"고아 파일 삭제 실패 ({entry.path}): {e}")
+            self.stats['errors'] += 1
+            self._keep_current()
+
+    def _handle_referenced(self, entry):
+        self.stats['files_scanned'] += 1
+        self.stats['files_referenced'] += 1
+        try:
+            self.stats['bytes_scanned'] += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+        self._keep_current()
+
+    def _handle_dangling(self, rel_path, table, key):
+        self.stats[f'dangling_{table}'] += 1
+        action = "삭제 예정" if self.delete_rows else "[dry-run]"
+        self._report('dangling', f"{action} 파일이 없는 {table} 행: {key} -> {os.path.join(self.root, rel_path)}")
+        if not self.delete_rows:
+            return
+        self._dangling[table].append(key)
+        if sum(len(keys) for keys in self._dangling.values()) >= DANGLING_DELETE_BATCH:
+            self._flush_dangling()
+
+    def _flush_dangling(self):
+        batch = self._dangling
+        count = sum(len(keys) for keys in batch.values())
+        if not count:
+            return
+        self._dangling = {'images': [], 'image_variants': [], 'image_blobs': []}
+        if db_Manager.delete_dangling_image_rows(batch['images'], batch['image_variants'], batch['image_blobs']):
+            self.stats['rows_deleted'] += count
+        else:
+            self.stats['errors'] += 1
+
+    def _report(self, kind, message):
+        self._reported[kind] += 1
+        if self._reported[kind] <= self.report_limit:
+            logging.info(message)
+        elif self._reported[kind] == self.report_limit + 1:
+            logging.info(f"... 이후 항목은 개별 로그를 생략합니다 (--report-limit).")
+
+    @staticmethod
+    def _check_order(previous, current, source):
+        # 두 쪽의 정렬 순서가 다르면 병합 비교 결과를 믿을 수 없으므로 중단 (잘못된 삭제 방지)
+        if previous is not None and current < previous:
+            raise RuntimeError(f"{source} 경로가 정렬 순서대로 오지 않았습니다: {previous!r} > {current!r}")
+
+    def run(self):
+        started = time.monotonic()
+        files = self._iter_files()
+        rows = self._iter_rows()
+        file_item = next(files, None)
+        row_item = next(rows, None)
+        last_file = last_row = None
+
+        while file_item is not None or row_item is not None:
+            file_path = file_item[0] if file_item is not None else None
+            row_path = row_item[0] if row_item is not None else None
+
+            if row_path is None or (file_path is not None and file_path < row_path):
+                self._check_order(last_file, file_path, "파일")
+                last_file = file_path
+                self._handle_orphan(*file_item)
+                file_item = next(files, None)
+            elif file_path is None or row_path < file_path:
+                self._check_order(last_row, row_path, "DB")
+                last_row = row_path
+                self._handle_dangling(*row_item)
+                row_item = next(rows, None)
+            else:
+                # 같은 파일을 여러 행이 가리킬 수 있음 (images + image_blobs)
+                self._check_order(last_file, file_path, "파일")
+                last_file = last_row = file_path
+                while row_item is not None and row_item[0] == file_path:
+                    row_item = next(rows, None)
+                self._handle_referenced(file_item[1])
+                file_item = next(files, None)
+
+        self._flush_dangling()
+        self.stats['elapsed_seconds'] = time.monotonic() - started
+        return self.stats
+
+    def log_stats(self):
+        stats = self.stats
+        elapsed = stats.get('elapsed_seconds', 0.0)
+        files_per_sec = stats['files_scanned'] / elapsed if elapsed else 0.0
+        rows_per_sec = stats['rows_scanned'] / elapsed if elapsed else 0.0
+        mode = "삭제" if (self.delete_files or self.delete_rows) else "dry-run"
+        logging.info(
+            f"이미지 저장소 GC 완료 ({mode}, {elapsed:.2f}초): 폴더 {stats['dirs_scanned']}개, "
+            f"파일 {stats['files_scanned']}개 ({stats['bytes_scanned'] / 1024 / 1024:.1f}MB, {files_per_sec:.0f}개/초), "
+            f"DB 행 {stats['rows_scanned']}개 ({rows_per_sec:.0f}개/초, 저장소 밖 경로 {stats['rows_outside_root']}개)"
+        )
+        logging.info(
+            f"  참조되는 파일 {stats['files_referenced']}개, 고아 파일 {stats['orphan_files']}개 "
+            f"({stats['orphan_bytes'] / 1024 / 1024:.1f}MB, 임시 파일 {stats['temp_files']}개), "
+            f"최근 파일이라 건너뜀 {stats['skipped_recent']}개, 빈 폴더 {stats['empty_dirs']}개"
+        )
+        logging.info(
+            f"  파일이 없는 행: images {stats['dangling_images']}개, image_variants {stats['dangling_image_variants']}개, "
+            f"image_blobs {stats['dangling_image_blobs']}개"
+        )
+        logging.info(
+            f"  삭제: 파일 {stats['files_deleted']}개 ({stats['bytes_deleted'] / 1024 / 1024:.1f}MB), "
+            f"폴더 {stats['dirs_removed']}개, DB 행 {stats['rows_deleted']}개, 오류 {stats['errors']}개"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="이미지 저장소의 고아 파일과 파일이 없는 DB 행을 찾아 정리합니다 (기본: 보고만 함).")
+    parser.add_argument('--delete', action='store_true', help="고아 파일과 빈 폴더를 삭제합니다.")
+    parser.add_argument('--delete-dangling', action='store_true', help="파일이 없는 images/image_variants/image_blobs 행을 삭제합니다.")
+    parser.add_argument('--min-age', type=int, default=settings.IMAGE_GC_MIN_AGE,
+                        help="이 시간(초)보다 최근에 바뀐 파일과 폴더는 건드리지 않습니다 (진행 중인 동기화 보호).")
+    parser.add_argument('--report-limit', type=int, default=20, help="종류별로 개별 로그를 남길 최대 항목 수.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = settings.IMAGE_HOST_STORAGE_PATH
+    if not root or not os.path.isdir(root):
+        logging.error(f"IMAGE_HOST_STORAGE_PATH가 없거나 폴더가 아닙니다: {root}")
+        return 1
+
+    gc = StorageGC(
+        root, delete_files=args.delete, delete_rows=args.delete_dangling,
+        min_age=args.min_age, report_limit=args.report_limit
+    )
+    logging.info(
+        f"이미지 저장소 GC 시작: {gc.root} (파일 삭제: {args.delete}, 행 삭제: {args.delete_dangling}, "
+        f"최소 경과 시간: {args.min_age}초, 제외 폴더: {sorted(gc.skip_dirs)})"
+    )
+    try:
+        gc.run()
+    except Exception as e:
+        logging.error(f"이미지 저장소 GC 중 오류 발생: {e}", exc_info=True)
+        gc.log_stats()
+        return 1
+    gc.log_stats()
+    return 1 if gc.stats['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,33 @@
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+import argparse
+import heapq
+import itertools
+import json
 import logging
 import os 
+import sys
+import time
 
 try:
     from core import settings
     from core import db_Manager
-    from notion_handler.client import get_notion_client
-    from notion_handler.api import get_published_blog_posts_from_notion_api
-    from content_processor.parser import parse_notion_page_properties
-    from content_processor.image_handler import download_and_save_image 
-    from content_processor.markdown_converter import convert_blocks_to_markdown
+    from core import metrics
+    from core.sync_state import (
+        WATERMARK_STATE, LAST_FULL_SYNC_STATE, LAST_RUN_STATE, FAILED_POSTS_STATE,
+        format_notion_timestamp, watermark_edited_since, is_full_sync_due, load_failed_post_ids
+    )
+    from notion_handler.client import get_notion_client, get_rate_limiter
+    from notion_handler.cassette import CassetteClient
+    from notion_handler.block_cache import get_block_cache
+    from notion_handler.api import PUBLISHED_FILTER, build_edited_since_filter, iter_database_pages, iter_pages_by_id
+    from content_processor.parser import parse_notion_page_properties, is_published_page
+    from content_processor.image_handler import (
+        download_and_save_image, is_content_store_path, remove_image_variant_files, shutdown_variant_pool,
+        reset_image_stats, log_image_stats
+    )
+    from content_processor.markdown_converter import convert_blocks_to_markdown, fetch_page_block_tree
+    from content_processor.html_renderer import compute_render_hash, render_post_html
     from utils.file_utils import ensure_directory_exists 
 except ImportError as e:
     logging.error(f"모듈 임포트 중 오류 발생: {e}. PYTHONPATH 설정을 확인하거나, python-GetNotionData 디렉터리에서 스크립트를 실행하세요.")
@@ -18,15 +36,30 @@ except ImportError as e:
 # 로깅 설정
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# process_single_post 처리 결과
+POST_UPDATED = 'updated'
+POST_SKIPPED = 'skipped'
+POST_UNCHANGED = 'unchanged' # Notion에서 수정됐지만 렌더링 결과가 같아 수정 시간만 기록
+POST_FAILED = 'failed'
+
+
+# DB 스냅샷 항목과 Notion 최종 수정 시간을 비교하여 게시물이 최신인지 판단 (DB 조회 없음)
+def is_post_up_to_date(db_post_snapshot, notion_last_edited_time):
+    if not db_post_snapshot:
+        return False
+    db_last_edited_time = db_post_snapshot.get('notion_last_edited_time')
+    return bool(db_last_edited_time) and db_last_edited_time >= notion_last_edited_time
+
 
 # 단일 Notion 페이지 데이터를 처리하여 DB에 저장/업데이트
-def process_single_post(notion_client, page_data):
+# db_snapshot: db_Manager.get_post_sync_snapshot() 결과. 없으면 게시물마다 DB에서 최종 수정 시간을 조회
+def process_single_post(notion_client, page_data, db_snapshot=None):
     
     # 1. Notion 페이지 속성 파싱
     parsed_props = parse_notion_page_properties(page_data)
     if not parsed_props:
         logging.error(f"페이지 속성 파싱 실패 (ID: {page_data.get('id')}). 이 페이지를 건너뜁니다.")
-        return
+        return POST_FAILED
 
     page_id = parsed_props['id']
     post_slug = parsed_props['slug']
@@ -36,60 +69,60 @@ def process_single_post(notion_client, page_data):
     # 필수 값 누락 시 건너뛰기
     if not post_slug:
         logging.warning(f"'{post_title}' (ID: {page_id})의 슬러그가 없어 건너뜁니다.")
-        return
+        return POST_SKIPPED
     if not notion_last_edited_time_str_from_api:
         logging.warning(f"'{post_title}' (ID: {page_id})의 Notion 최종 수정 시간이 없어 건너뜁니다.")
-        return
+        return POST_SKIPPED
 
     # 2. DB에 저장된 최종 수정 시간과 비교하여 업데이트 여부 결정
-    db_last_edited_time_str = db_Manager.get_post_notion_last_edited_time(page_id)
     notion_last_edited_time_str_from_api = datetime.strptime(notion_last_edited_time_str_from_api, "%Y-%m-%d %H:%M:%S")
+    if db_snapshot is not None:
+        db_post_snapshot = db_snapshot.get(page_id)
+    else:
+        db_post_snapshot = {'notion_last_edited_time': db_Manager.get_post_notion_last_edited_time(page_id)}
     
-    if db_last_edited_time_str and db_last_edited_time_str >= notion_last_edited_time_str_from_api:
+    if is_post_up_to_date(db_post_snapshot, notion_last_edited_time_str_from_api):
         logging.info(f"'{post_title}' (ID: {page_id}) 게시물은 DB에 최신 상태이므로 건너뜁니다.")
-        return
+        return POST_SKIPPED
 
     logging.info(f"'{post_title}' (ID: {page_id}) 게시물 처리 시작 (DB 업데이트 필요).")
 
 
-    # 순서 수정
-
-    # 3. 게시물 기본 정보 DB에 저장/업데이트 (이미지 경로 없이 먼저)
-    #    featured_image 필드는 나중에 이미지 처리 후 업데이트하거나, 초기에는 NULL 또는 빈 값으로 저장
-    post_data_for_db_initial = {
-        'id': page_id,
-        'slug': post_slug,
-        'title': post_title,
-        'description': parsed_props.get('description'),
-        'content': "# Placeholder for content, will be updated after image processing", # 임시 값 또는 빈 값
-        'post_type': parsed_props['post_type'],
-        'category': parsed_props.get('category'),
-        'published_date': parsed_props['published_date'],
-        'featured_image': None, # 초기에는 대표 이미지 경로 없음
-        'notion_last_edited_time': notion_last_edited_time_str_from_api 
-    }
-
-    if not db_Manager.upsert_post(post_data_for_db_initial):
-        logging.error(f"'{post_title}' (ID: {page_id}) 게시물 기본 정보 DB 저장 실패. 이 페이지를 건너뜁니다.")
-        return
-
-    logging.info(f"'{post_title}' (ID: {page_id}) 게시물 기본 Normal 정보 저장")
-
+    # 3. 게시물 하나의 모든 DB 쓰기(게시물, 태그, 이미지, 미사용 이미지 삭제)를 모아 한 번에 커밋
+    #    처리 도중에는 DB에 쓰지 않으므로 임시 본문(placeholder)이 노출되지 않음
+    unit_of_work = db_Manager.PostUnitOfWork(page_id)
 
     # 4. 게시물 본문 마크다운 변환 및 본문 내 이미지 처리
     # convert_blocks_to_markdown 함수는 내부적으로 image_handler.download_and_save_image 호출
+    with metrics.timer('sync_stage_seconds', stage='block_fetch'):
+        blocks = fetch_page_block_tree(notion_client, page_id)
+    if blocks is None:
+        logging.error(f"'{post_title}' (ID: {page_id})의 본문 변환 실패. 이 페이지를 건너뜁니다.")
+        return POST_FAILED
+    # markdown_render / image_download 단계 시간은 convert_blocks_to_markdown이 나눠서 기록
     markdown_content, used_image_block_ids_from_content = convert_blocks_to_markdown(
         notion_client_instance=notion_client,
         page_id=page_id, # Notion 페이지 ID (블록 자식 조회용)
         post_id=page_id, # DB의 posts.id와 동일하게 사용 (images.post_id용)
-        post_slug=post_slug
+        post_slug=post_slug,
+        blocks=blocks,
+        unit_of_work=unit_of_work
     )
-    if markdown_content.startswith("# Error"): # 마크다운 변환 실패 시
-        logging.error(f"'{post_title}' (ID: {page_id})의 본문 변환 실패. 이 페이지를 건너뜁니다.")
-        return
 
-    # 4. 대표 이미지(커버) 처리
+    # 4-1. 본문 HTML, 목차, 읽기 시간 미리 렌더링 (같은 블록 트리 사용)
+    #      본문, 이미지 파생본 목록, 렌더러 버전이 모두 같으면(렌더링 입력 해시가 같으면) 저장된 결과 유지
+    render_hash = compute_render_hash(markdown_content, unit_of_work, used_image_block_ids_from_content)
+    if render_hash == (db_post_snapshot or {}).get('rendered_hash'):
+        logging.info(f"'{post_title}' (ID: {page_id}) 본문과 이미지가 바뀌지 않아 HTML 렌더링을 건너뜁니다.")
+    else:
+        with metrics.timer('sync_stage_seconds', stage='html_render'):
+            render = render_post_html(blocks, unit_of_work)
+        render['source_hash'] = render_hash
+        unit_of_work.set_render(render)
+
+    # 5. 대표 이미지(커버) 처리
     featured_image_web_path = None
+    cover_image_id_for_db = None
     if parsed_props.get('cover_image_url'):
         # 커버 이미지는 고유 ID
         cover_image_id_for_db = f"cover-{page_id}"
@@ -100,7 +133,8 @@ def process_single_post(notion_client, page_data):
             post_id=page_id,
             post_slug=post_slug,
             image_caption=f"{post_title} Cover Image", # 캡션 예시
-            is_cover=True
+            is_cover=True,
+            unit_of_work=unit_of_work
         )
         if featured_image_web_path:
             logging.info(f"'{post_title}' 커버 이미지 처리 완료: {featured_image_web_path}")
@@ -110,12 +144,11 @@ def process_single_post(notion_client, page_data):
             logging.warning(f"{cover_image_id_for_db}")
             logging.warning(f"{page_id}")
             logging.warning(f"{post_slug}")
-            logging.warning(f"isCover = {is_cover}")
             logging.warning("")
 
 
-    # 5. DB에 저장할 게시물 데이터 준비
-    post_data_for_db = {
+    # 6. DB에 저장할 게시물 데이터 준비
+    unit_of_work.set_post({
         'id': page_id,
         'slug': post_slug,
         'title': post_title,
@@ -126,138 +159,506 @@ def process_single_post(notion_client, page_data):
         'published_date': parsed_props['published_date'],
         'featured_image': featured_image_web_path, # 처리된 웹 경로 또는 None
         'notion_last_edited_time': notion_last_edited_time_str_from_api # API에서 받은 형식 그대로 전달 (DB에서 DATETIME으로 저장됨)
+    })
+
+    # 7. 태그 정보
+    unit_of_work.set_tags(parsed_props.get('tags', []))
+
+    # 8. 미사용 이미지 정리 (현재 게시물에 한해)
+    #   - DB에 있는 이 게시물의 이미지 중 본문/커버에서 더 이상 사용하지 않는 것은 같은 트랜잭션에서 삭제
+    #   - 실제 파일은 커밋이 성공한 뒤에 삭제 (DB가 없는 파일을 가리키지 않도록)
+    #   - 콘텐츠 주소 저장소의 파일은 다른 게시물과 공유될 수 있으므로 여기서 지우지 않음 (실행 끝에 참조 수로 정리)
+    currently_used_image_ids = set(used_image_block_ids_from_content)
+    if featured_image_web_path:
+        currently_used_image_ids.add(cover_image_id_for_db)
+    unused_image_paths = {
+        image_id: record['local_path'] for image_id, record in unit_of_work.existing_images().items()
+        if image_id not in currently_used_image_ids
     }
+    unit_of_work.delete_images(unused_image_paths.keys())
 
-    # 6. 게시물 정보 DB에 저장/업데이트
-    if not db_Manager.upsert_post(post_data_for_db):
+    # 9. 게시물 정보 DB에 저장/업데이트 (하나의 트랜잭션)
+    with metrics.timer('sync_stage_seconds', stage='db_commit'): # 이미지 파생본 대기 포함
+        committed = unit_of_work.commit()
+    if not committed:
         logging.error(f"'{post_title}' (ID: {page_id}) 게시물 정보 DB 저장 실패. 이 페이지를 건너뜁니다.")
-        return
+        return POST_FAILED
 
-    # 7. 태그 정보 DB에 저장/업데이트
-    notion_tags = parsed_props.get('tags', [])
-    if not db_Manager.link_tags_to_post(page_id, notion_tags):
-        logging.warning(f"'{post_title}' (ID: {page_id}) 태그 정보 DB 저장 실패.")
-        # 태그 저장 실패는 게시물 저장에 영향을 주지 않도록 처리 (선택적)
-
-    # 8. (선택적) 미사용 이미지 정리 (현재 게시물에 한해)
-    #   - DB에서 해당 post_id의 이미지 ID 목록(images 테이블) 가져오기
-    #   - used_image_block_ids_from_content (본문 이미지) 와 featured_image_web_path (커버 이미지의 ID) 를 합쳐 현재 사용 중인 이미지 ID 세트 생성
-    #   - DB 목록에는 있는데 현재 사용 목록에 없는 이미지 ID는 DB에서 삭제하고, 실제 파일도 삭제
-    #   이 로직은 복잡하므로 별도 함수로 분리하거나, 스크립트 실행 후 한 번에 모든 게시물 대상으로 실행하는 것이 더 효율적일 수 있음
-    #   간단한 예시:
-    cleanup_unused_images_for_post(page_id, used_image_block_ids_from_content, cover_image_id_for_db if featured_image_web_path else None)
+    remove_local_image_files(unused_image_paths.values())
+    if unused_image_paths:
+        logging.info(f"게시물(ID: {page_id})의 미사용 이미지 {len(unused_image_paths)}개 정리 완료.")
 
+    if unit_of_work.post_row_result == db_Manager.POST_ROW_IDENTICAL:
+        logging.info(f"'{post_title}' (ID: {page_id}) 게시물 처리 완료 (렌더링 결과 동일, 수정 시간만 갱신).")
+        return POST_UNCHANGED
     logging.info(f"'{post_title}' (ID: {page_id}) 게시물 처리 완료.")
+    return POST_UPDATED
+
+# 로컬 이미지 파일 삭제 (없으면 경고만)
+def remove_local_image_file(local_path):
+    if not local_path:
+        return
+    try:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+            logging.info(f"삭제된 로컬 이미지 파일: {local_path}")
+        else:
+            logging.warning(f"삭제할 로컬 이미지 파일을 찾을 수 없음: {local_path}")
+    except OSError as e:
+        logging.error(f"로컬 이미지 파일 삭제 중 오류 ({local_path}): {e}")
+
+# 여러 로컬 이미지 파일을 스레드 풀로 동시에 삭제
+# 콘텐츠 주소 저장소의 공유 파일은 건너뜀 (실행 끝에 참조 수로 정리)
+def remove_local_image_files(local_paths):
+    paths = [path for path in set(local_paths) if path and not is_content_store_path(path)]
+    if not paths:
+        return
+    if len(paths) == 1 or settings.FILE_REMOVE_WORKERS <= 1:
+        for path in paths:
+            remove_local_image_file(path)
+        return
+    with ThreadPoolExecutor(max_workers=settings.FILE_REMOVE_WORKERS, thread_name_prefix="file-remove") as executor:
+        list(executor.map(remove_local_image_file, paths))
+
+# 비어 있는 게시물 이미지 폴더 삭제 (post 저장 방식의 <slug>/ 폴더)
+def remove_empty_post_image_dirs(post_slugs):
+    if not settings.IMAGE_HOST_STORAGE_PATH:
+        return
+    for post_slug in post_slugs:
+        if not post_slug:
+            continue
+        post_image_dir = os.path.join(settings.IMAGE_HOST_STORAGE_PATH, post_slug)
+        try:
+            os.rmdir(post_image_dir) # 비어 있을 때만 삭제됨
+            logging.info(f"게시물 이미지 폴더(비어있음) 삭제됨: {post_image_dir}")
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logging.info(f"게시물 이미지 폴더에 아직 파일이 남아있어 폴더는 삭제하지 않음: {post_image_dir}")
 
 # 특정 게시물에 대해 더 이상 사용되지 않는 이미지 파일과 DB 정보를 정리
+# (이미지 조회 한 번, 일괄 삭제 한 번의 트랜잭션, 파일 삭제는 커밋 후 병렬로)
 def cleanup_unused_images_for_post(post_id, used_content_image_ids, cover_image_id):
 
     logging.info(f"게시물(ID: {post_id})의 미사용 이미지 정리 시작...")
 
-    # DB에 저장된 이 게시물의 모든 이미지 ID (Notion Block ID 또는 cover-post_id)
-    db_image_ids_for_post = db_Manager.get_image_ids_for_post(post_id) 
-    
+    # DB에 저장된 이 게시물의 모든 이미지 {ID (Notion Block ID 또는 cover-post_id): 로컬 경로}
+    db_image_paths = db_Manager.get_image_paths_for_post(post_id)
+    if db_image_paths is None:
+        logging.warning(f"게시물(ID: {post_id})의 이미지 정보를 조회하지 못해 정리를 건너뜁니다.")
+        return
+
     currently_used_image_ids = set(used_content_image_ids)
     if cover_image_id:
         currently_used_image_ids.add(cover_image_id)
-        
-    ids_to_delete_from_db = []
-    for db_img_id in db_image_ids_for_post:
-        if db_img_id not in currently_used_image_ids:
-            ids_to_delete_from_db.append(db_img_id)
-            
-    if not ids_to_delete_from_db:
+
+    unused_image_paths = {
+        image_id: local_path for image_id, local_path in db_image_paths.items()
+        if image_id not in currently_used_image_ids
+    }
+    if not unused_image_paths:
         logging.info(f"게시물(ID: {post_id}): 삭제할 미사용 이미지 없음.")
         return
 
-    for image_id_to_delete in ids_to_delete_from_db:
-        local_path = db_Manager.get_image_local_path(image_id_to_delete)
-        if local_path:
-            try:
-                if os.path.exists(local_path):
-                    os.remove(local_path)
-                    logging.info(f"삭제된 로컬 이미지 파일: {local_path}")
-                else:
-                    logging.warning(f"삭제할 로컬 이미지 파일을 찾을 수 없음: {local_path}")
-            except OSError as e:
-                logging.error(f"로컬 이미지 파일 삭제 중 오류 ({local_path}): {e}")
-        
-        if not db_Manager.delete_image_info_by_id(image_id_to_delete):
-            logging.warning(f"DB에서 이미지 정보(ID: {image_id_to_delete}) 삭제 실패.")
-            
-    logging.info(f"게시물(ID: {post_id})의 미사용 이미지 {len(ids_to_delete_from_db)}개 정리 완료.")
-
-
-# python-GetNotionData/main.py 수정 제안
-
-# ... (기존 import 및 함수 정의) ...
-
-def main_sync_process():
-    """전체 Notion 동기화 프로세스를 실행합니다."""
-    logging.info("Notion 동기화 프로세스 시작...")
+    if not db_Manager.delete_images_by_ids(unused_image_paths.keys()):
+        logging.warning(f"게시물(ID: {post_id})의 미사용 이미지 정보 DB 삭제 실패. 파일은 남겨둡니다.")
+        return
+    remove_local_image_files(unused_image_paths.values())
 
-    db_Manager.init_db_schema() # DB 스키마 초기화 (기존 유지)
+    logging.info(f"게시물(ID: {post_id})의 미사용 이미지 {len(unused_image_paths)}개 정리 완료.")
 
-    # 1. Notion 클라이언트 가져오기
-    notion_client = get_notion_client()
-    if not notion_client:
-        logging.critical("Notion 클라이언트 초기화 실패. 스크립트를 종료합니다.")
+
+# 어떤 이미지도 참조하지 않게 된 콘텐츠 주소 저장소 파일 정리
+# 처리 중인 다른 게시물이 같은 파일을 새로 참조할 수 있으므로, 모든 게시물 처리가 끝난 뒤에만 호출합니다.
+def release_unreferenced_image_blobs():
+    unreferenced = db_Manager.delete_unreferenced_image_blobs()
+    if not unreferenced:
         return
+    for digest, local_path in unreferenced.items():
+        remove_local_image_file(local_path)
+        remove_image_variant_files(digest)
+    logging.info(f"참조되지 않는 공유 이미지 파일 {len(unreferenced)}개 정리 완료.")
+
 
-    # 2. Notion API에서 현재 '발행됨' 상태인 모든 게시물 ID 목록 가져오기
-    logging.info("Notion API에서 현재 '발행됨' 상태의 모든 페이지 ID를 조회합니다...")
-    notion_post_ids_set = set()
+# 예외가 나도 다른 게시물 처리에 영향이 없도록 감싸서 실행
+def process_single_post_safely(notion_client, page_data, db_snapshot):
     try:
-        # get_published_blog_posts_from_notion_api 함수는 페이지 전체 데이터를 반환하므로,
-        # ID만 추출하거나, ID만 가져오는 별도 API 호출 함수를 고려할 수 있습니다.
-        # 여기서는 기존 함수를 활용하여 ID만 추출합니다.
-        published_pages_data_from_notion = get_published_blog_posts_from_notion_api(notion_client)
-        if published_pages_data_from_notion:
-            for page_data in published_pages_data_from_notion:
-                if page_data.get('id'):
-                    notion_post_ids_set.add(page_data.get('id'))
-        logging.info(f"Notion API에서 {len(notion_post_ids_set)}개의 '발행됨' 페이지 ID를 가져왔습니다.")
+        return process_single_post(notion_client, page_data, db_snapshot)
     except Exception as e:
-        logging.error(f"Notion API에서 페이지 ID 목록 조회 중 오류 발생: {e}")
-        return # ID 목록 조회 실패 시 동기화 중단
+        logging.error(f"게시물(ID: {page_data.get('id')}) 처리 중 예기치 않은 오류 발생: {e}", exc_info=True)
+        return POST_FAILED
 
-    # 3. DB에 저장된 모든 게시물 ID 목록 가져오기
-    logging.info("DB에서 기존 게시물 ID 목록을 조회합니다...")
-    db_post_ids_set = set(db_Manager.get_all_post_ids_from_db()) # db_Manager에 새 함수 필요
-    logging.info(f"DB에서 {len(db_post_ids_set)}개의 게시물 ID를 가져왔습니다.")
+# --profile 실행에서만 설정되는 게시물별 프로파일러 (utils.profiling.PostProfiler, 평소에는 None)
+_post_profiler = None
 
-    # 4. 삭제된 게시물 처리: DB에는 있지만 Notion API 결과에는 없는 게시물
-    #    (Notion에서 삭제되었거나, '발행됨' 상태가 아니거나, 다른 DB로 옮겨졌거나 등)
-    posts_to_delete_ids = list(db_post_ids_set - notion_post_ids_set)
-    
-    if posts_to_delete_ids:
-        logging.info(f"Notion에 더 이상 존재하지 않거나 '발행됨' 상태가 아닌 게시물 {len(posts_to_delete_ids)}개를 DB에서 삭제합니다: {posts_to_delete_ids}")
-        for post_id_to_delete in posts_to_delete_ids:
-            logging.info(f"게시물 ID '{post_id_to_delete}' 삭제 처리 시작...")
-            # 4.1 연결된 이미지 정보 및 실제 파일 삭제 (cleanup_unused_images_for_post 함수 재활용 또는 확장)
-            #     이때 해당 post_id의 모든 이미지를 삭제 대상으로 간주 (used_content_image_ids와 cover_image_id를 빈 값으로 전달)
-            cleanup_unused_images_for_post(post_id_to_delete, [], None) # 해당 포스트의 모든 이미지 정리
-            
-            # 4.2 DB에서 게시물 관련 정보 삭제 (posts, post_tags 등)
-            #     db_Manager에 게시물 및 관련 레코드(태그 연결 등) 삭제 함수 필요
-            if db_Manager.delete_post_by_id(post_id_to_delete): # CASCADE 설정으로 post_tags도 자동 삭제될 수 있음
-                logging.info(f"게시물 ID '{post_id_to_delete}'가 DB에서 성공적으로 삭제되었습니다.")
-            else:
-                logging.error(f"게시물 ID '{post_id_to_delete}' DB 삭제 실패.")
+# 게시물 하나를 처리하고 (결과, 소요 시간)을 반환
+def process_single_post_timed(notion_client, page_data, db_snapshot):
+    started = time.perf_counter()
+    if _post_profiler is None:
+        result = process_single_post_safely(notion_client, page_data, db_snapshot)
     else:
+        result = _post_profiler.run(page_data.get('id') or '', process_single_post_safely, notion_client, page_data, db_snapshot)
+    elapsed = time.perf_counter() - started
+    metrics.observe('sync_post_seconds', elapsed, result=result)
+    return result, elapsed
+
+
+# 실행 결과에 남길 가장 오래 걸린 게시물 수
+SLOWEST_POSTS_REPORTED = 10
+
+
+# 게시물 목록을 처리 (workers > 1 이면 스레드 풀로 동시에 처리)
+# Notion 블록 조회, 이미지 다운로드, DB 대기가 대부분이므로 스레드로 겹쳐서 처리합니다.
+# notion_client(httpx 기반)와 db_Manager(커넥션 풀, 이름 캐시 잠금)는 스레드 간 공유해도 안전합니다.
+# pages는 제너레이터여도 되며, 도착하는 대로 처리하고 동시에 잡아두는 페이지는 최대 workers * 2개입니다.
+# pages 순회 중 예외가 나면 이미 받은 게시물까지만 처리하고 results['listing_failed']를 True로 둡니다.
+def sync_posts(notion_client, pages, db_snapshot, workers=1):
+    results = {POST_UPDATED: 0, POST_UNCHANGED: 0, POST_SKIPPED: 0, POST_FAILED: 0, 'listing_failed': False}
+    failed_post_ids = []
+    slowest = [] # (소요 시간, 게시물 ID, 결과) 최소 힙
+
+    def record(post_id, outcome):
+        result, elapsed = outcome
+        results[result] += 1
+        metrics.inc('sync_posts_total', result=result)
+        if result == POST_FAILED:
+            failed_post_ids.append(post_id)
+        entry = (elapsed, post_id or '', result)
+        if len(slowest) < SLOWEST_POSTS_REPORTED:
+            heapq.heappush(slowest, entry)
+        else:
+            heapq.heappushpop(slowest, entry)
+
+    try:
+        if workers <= 1:
+            for page_data in pages:
+                record(page_data.get('id'), process_single_post_timed(notion_client, page_data, db_snapshot))
+                logging.info("-" * 30)
+        else:
+            if workers > settings.DB_POOL_SIZE:
+                logging.warning(f"동기화 워커 수({workers})가 DB 커넥션 풀 크기({settings.DB_POOL_SIZE})보다 커서 연결 대기가 생길 수 있습니다.")
+            logging.info(f"{workers}개의 워커로 게시물을 동시에 처리합니다.")
+            max_in_flight = workers * 2
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="post-sync") as executor:
+                pending = {} # future -> 게시물 ID (페이지 데이터는 작업이 끝나면 놓아줌)
+
+                def drain(return_when):
+                    done, _ = wait(pending, return_when=return_when)
+                    for future in done:
+                        record(pending.pop(future), future.result())
+
+                try:
+                    for page_data in pages:
+                        if len(pending) >= max_in_flight:
+                            drain(FIRST_COMPLETED)
+                        future = executor.submit(process_single_post_timed, notion_client, page_data, db_snapshot)
+                        pending[future] = page_data.get('id')
+                finally:
+                    if pending:
+                        drain(ALL_COMPLETED)
+    except Exception as e:
+        logging.error(f"Notion 페이지 목록 조회 중 오류 발생: {e}")
+        results['listing_failed'] = True
+
+    logging.info(
+        f"게시물 처리 결과: 업데이트 {results[POST_UPDATED]}개, 내용 동일 {results[POST_UNCHANGED]}개, "
+        f"건너뜀 {results[POST_SKIPPED]}개, "
+        f"실패 {results[POST_FAILED]}개"
+    )
+    if failed_post_ids:
+        logging.warning(f"처리에 실패한 게시물 ID: {failed_post_ids}")
+    results['failed_post_ids'] = failed_post_ids
+    results['slowest_posts'] = [
+        {'post_id': post_id, 'seconds': round(elapsed, 3), 'result': result}
+        for elapsed, post_id, result in sorted(slowest, reverse=True)
+    ]
+    return results
+
+
+# Notion/DB에서 사라진 게시물 삭제 (연결된 이미지 파일 및 DB 정보 포함)
+def delete_removed_posts(posts_to_delete_ids):
+    if not posts_to_delete_ids:
         logging.info("DB에서 삭제할 게시물이 없습니다.")
+        return
+
+    logging.info(f"Notion에 더 이상 존재하지 않거나 '발행됨' 상태가 아닌 게시물 {len(posts_to_delete_ids)}개를 DB에서 삭제합니다: {posts_to_delete_ids}")
+
+    # 1. 삭제할 게시물들의 이미지 경로를 한 번에 조회 (게시물 행이 지워지면 images도 CASCADE로 함께 삭제됨)
+    image_paths_by_post = db_Manager.get_image_paths_for_posts(posts_to_delete_ids)
+    if image_paths_by_post is None:
+        logging.error("삭제할 게시물의 이미지 정보 조회 실패. 게시물 삭제를 다음 실행으로 미룹니다.")
+        return
+
+    # 2. 게시물(태그 연결, 이미지, 파생본 포함)을 하나의 트랜잭션으로 삭제
+    deleted_slugs = db_Manager.delete_posts_by_ids(posts_to_delete_ids)
+    if deleted_slugs is None:
+        logging.error(f"게시물 {len(posts_to_delete_ids)}개 DB 삭제 실패.")
+        return
+
+    # 3. 커밋 후 실제 이미지 파일을 병렬로 삭제하고, 비게 된 게시물 이미지 폴더 정리
+    remove_local_image_files(
+        local_path
+        for post_id in deleted_slugs
+        for local_path in image_paths_by_post.get(post_id, {}).values()
+    )
+    remove_empty_post_image_dirs(deleted_slugs.values())
 
-    # 5. 신규 또는 업데이트된 게시물 처리 (기존 로직)
-    if not published_pages_data_from_notion:
+    metrics.inc('sync_posts_deleted_total', len(deleted_slugs))
+    logging.info(f"게시물 {len(deleted_slugs)}개와 연결된 이미지를 삭제했습니다: {list(deleted_slugs)}")
+
+
+def main_sync_process(full_sync=None, init_schema=True):
+    """Notion 동기화 프로세스를 실행합니다.
+
+    full_sync=True 이면 발행된 모든 페이지를 조회하고 삭제된 게시물도 정리하는 전체 동기화,
+    False 이면 워터마크 이후 수정된 페이지만 조회하는 증분 동기화, None 이면 설정과 마지막 전체 동기화 시각으로 결정합니다.
+    init_schema=False 이면 스키마 확인을 건너뜁니다 (상주 실행은 시작할 때 한 번만 확인).
+    게시물 처리 결과(sync_posts 결과 + 'full_sync')를 반환하고, 시작 전에 중단되면 None을 반환합니다.
+    """
+    logging.info("Notion 동기화 프로세스 시작...")
+    run_started_at = datetime.now(timezone.utc)
+
+    if init_schema:
+        db_Manager.init_db_schema() # DB 스키마 초기화 (기존 유지)
+    db_Manager.reset_name_caches() # 카테고리/태그 이름 캐시는 실행 단위로 사용
+    block_cache = get_block_cache()
+    if block_cache:
+        block_cache.reset_stats() # 블록 캐시 적중/실패는 실행 단위로 보고
+    reset_image_stats()
+
+    # 1. Notion 클라이언트 가져오기
+    notion_client = get_notion_client()
+    if not notion_client:
+        logging.critical("Notion 클라이언트 초기화 실패. 스크립트를 종료합니다.")
+        return None
+
+    if full_sync is None:
+        full_sync = is_full_sync_due(run_started_at)
+
+    # 2. DB에 저장된 모든 게시물의 (최종 수정 시간, slug, 본문 해시) 스냅샷을 한 번에 가져오기
+    #    이후 게시물별 최신 여부 판단은 이 스냅샷으로 메모리에서 처리 (게시물마다 DB 조회하지 않음)
+    logging.info("DB에서 기존 게시물 스냅샷을 조회합니다...")
+    with metrics.timer('sync_stage_seconds', stage='db_snapshot'):
+        db_snapshot = db_Manager.get_post_sync_snapshot()
+    if db_snapshot is None:
+        logging.error("DB 게시물 스냅샷 조회 실패. 동기화를 중단합니다.")
+        return None
+    db_post_ids_set = set(db_snapshot)
+    logging.info(f"DB에서 {len(db_post_ids_set)}개의 게시물 스냅샷을 가져왔습니다.")
+
+    # 3. Notion 페이지 목록을 next_cursor 배치가 도착하는 대로 처리 (목록 전체를 메모리에 모으지 않음)
+    #    삭제 판단에 필요한 페이지 ID만 모아두고, 삭제는 목록 조회가 끝까지 성공한 뒤에 수행
+    seen_page_ids = set()
+    unpublished_ids = set()
+    unretrieved_ids = [] # 재시도하려 했지만 조회에 실패한 페이지 ID (다음 실행에서 다시 시도)
+    if full_sync:
+        # 전체 동기화: 현재 '발행됨' 상태인 모든 게시물
+        logging.info("전체 동기화: Notion API에서 현재 '발행됨' 상태의 모든 페이지를 조회하며 처리합니다...")
+        notion_pages = iter_database_pages(notion_client, PUBLISHED_FILTER)
+    else:
+        # 증분 동기화: 워터마크 이후 수정된 페이지만 조회 (상태 무관)
+        #    Notion의 last_edited_time은 분 단위로 기록되므로 SYNC_WATERMARK_OVERLAP만큼 겹쳐서 조회
+        edited_since = watermark_edited_since()
+        logging.info(f"증분 동기화: Notion 데이터베이스에서 {edited_since} 이후 수정된 페이지를 조회하며 처리합니다...")
+        notion_pages = iter_database_pages(notion_client, build_edited_since_filter(edited_since))
+
+        # 지난 실행에서 실패한 게시물은 수정되지 않았어도 목록 조회가 끝난 뒤 하나씩 다시 조회
+        # (전체 동기화는 발행된 페이지를 모두 조회하므로 따로 재시도하지 않음)
+        retry_ids = load_failed_post_ids()
+        if retry_ids:
+            logging.info(f"지난 실행에서 실패한 게시물 {len(retry_ids)}개를 다시 처리합니다.")
+
+            def retry_pages():
+                pending = [page_id for page_id in retry_ids if page_id not in seen_page_ids and page_id not in unpublished_ids]
+                yield from iter_pages_by_id(notion_client, pending, unretrieved_ids)
+
+            notion_pages = itertools.chain(notion_pages, retry_pages())
+
+    def published_pages():
+        for page_data in notion_pages:
+            if not page_data.get('id'):
+                continue
+            if is_published_page(page_data):
+                seen_page_ids.add(page_data['id'])
+                yield page_data
+            else:
+                unpublished_ids.add(page_data['id'])
+
+    # 4. 신규 또는 업데이트된 게시물 처리
+    workers = settings.SYNC_WORKERS
+    if _post_profiler is not None and workers > 1:
+        # tracemalloc은 프로세스 전체 기준이므로 게시물별 메모리를 나누려면 순차 처리해야 함
+        logging.info("프로파일링 모드에서는 게시물을 순차 처리합니다.")
+        workers = 1
+    results = sync_posts(notion_client, published_pages(), db_snapshot, workers)
+    results['full_sync'] = full_sync
+    if results['listing_failed']:
+        # 목록이 중간에 끊겼으면 삭제 판단을 할 수 없으므로 (모든 게시물이 삭제 대상이 될 수 있음) 여기서 중단
+        logging.error("Notion 페이지 목록 조회가 완료되지 않아 삭제 처리와 동기화 상태 저장을 건너뜁니다.")
+        return results
+    if not seen_page_ids:
         logging.info("Notion에서 가져올 발행된 게시물이 없습니다 (신규/업데이트 대상).")
     else:
-        logging.info(f"Notion에서 가져온 {len(published_pages_data_from_notion)}개의 발행된 게시물에 대해 신규/업데이트 처리를 시작합니다.")
-        for page_data in published_pages_data_from_notion:
-            process_single_post(notion_client, page_data) # 기존 함수 사용
-            logging.info("-" * 30)
+        logging.info(f"Notion에서 가져온 {len(seen_page_ids)}개의 발행된 게시물을 처리했습니다.")
 
+    # 5. 삭제된 게시물 처리
+    if full_sync:
+        # DB에는 있지만 Notion API 결과에는 없는 게시물
+        # (Notion에서 삭제되었거나, '발행됨' 상태가 아니거나, 다른 DB로 옮겨졌거나 등)
+        posts_to_delete_ids = list(db_post_ids_set - seen_page_ids)
+    else:
+        # 발행 취소된 게시물 (Notion에서 완전히 삭제된 페이지는 다음 전체 동기화에서 정리)
+        logging.info(f"증분 동기화: 수정된 페이지 중 '발행됨' {len(seen_page_ids)}개, 그 외 {len(unpublished_ids)}개")
+        posts_to_delete_ids = list(unpublished_ids & db_post_ids_set)
+    with metrics.timer('sync_stage_seconds', stage='delete_posts'):
+        delete_removed_posts(posts_to_delete_ids)
+
+    # 6. 더 이상 참조되지 않는 공유 이미지 파일 정리 (게시물 처리와 삭제가 모두 끝난 뒤)
+    with metrics.timer('sync_stage_seconds', stage='blob_gc'):
+        release_unreferenced_image_blobs()
+
+    # 7. 동기화 상태 저장
+    #    워터마크는 항상 이번 실행 시작 시각으로 올리고 (계속 실패하는 게시물 하나 때문에 증분 조회 범위가 늘어나지 않도록),
+    #    실패한 게시물은 ID를 따로 저장해 다음 실행에서 직접 다시 조회함
+    failed_ids = sorted(set(results['failed_post_ids']) | set(unretrieved_ids))
+    if failed_ids:
+        logging.warning(f"실패한 게시물 {len(failed_ids)}개는 다음 실행에서 다시 처리합니다.")
+    db_Manager.set_sync_state(FAILED_POSTS_STATE, json.dumps(failed_ids))
+    db_Manager.set_sync_state(WATERMARK_STATE, format_notion_timestamp(run_started_at))
+    if full_sync:
+        db_Manager.set_sync_state(LAST_FULL_SYNC_STATE, format_notion_timestamp(run_started_at))
+
+    db_Manager.log_pool_stats()
+    get_rate_limiter().log_stats()
+    log_image_stats()
+    if block_cache:
+        block_cache.log_report()
+    if isinstance(notion_client, CassetteClient):
+        notion_client.log_report()
     logging.info("Notion 동기화 프로세스 완료.")
+    return results
+
+
+# 동기화 실행 결과 요약 (ok: 성공, partial: 일부 게시물 실패, failed: 중단됨, locked: 다른 실행이 진행 중이라 건너뜀)
+def summarize_run(results, started_at, duration, locked=False):
+    if locked:
+        result = 'locked'
+    elif results is None or results['listing_failed']:
+        result = 'failed'
+    elif results[POST_FAILED]:
+        result = 'partial'
+    else:
+        result = 'ok'
+    status = {
+        'result': result,
+        'started_at': format_notion_timestamp(started_at),
+        'duration_seconds': round(duration, 3),
+        'pid': os.getpid(),
+    }
+    if results is not None:
+        status['full_sync'] = results['full_sync']
+        status['posts'] = {key: results[key] for key in (POST_UPDATED, POST_UNCHANGED, POST_SKIPPED, POST_FAILED)}
+        status['slowest_posts'] = results.get('slowest_posts', [])
+    return status
+
+# 이번 실행의 단계별 소요 시간 요약 로그
+def log_stage_metrics(run_metrics):
+    stages = run_metrics['histograms'].get('sync_stage_seconds', {})
+    if not stages:
+        return
+    parts = [
+        f"{labels.partition('=')[2]} {stat['sum']:.2f}초/{stat['count']}회"
+        for labels, stat in sorted(stages.items(), key=lambda item: -item[1]['sum'])
+    ]
+    round_trips = sum(run_metrics['counters'].get('db_round_trips_total', {}).values())
+    api_calls = sum(run_metrics['counters'].get('notion_requests_total', {}).values())
+    logging.info(f"단계별 소요 시간: {', '.join(parts)} / Notion 요청 {api_calls}회, DB 왕복 {round_trips}회")
+
+# 누적 메트릭을 Prometheus textfile collector용 파일로 기록
+def write_metrics_textfile():
+    if not settings.METRICS_TEXTFILE_PATH:
+        return
+    try:
+        metrics.write_file_atomic(settings.METRICS_TEXTFILE_PATH, metrics.get_metrics().render_prometheus())
+    except OSError as e:
+        logging.warning(f"메트릭 파일 기록 실패 ({settings.METRICS_TEXTFILE_PATH}): {e}")
+
+# 마지막 실행 결과를 상태 파일(JSON, 임시 파일에 쓴 뒤 교체)과 sync_state 테이블에 기록
+def write_run_status(status):
+    if settings.SYNC_STATUS_PATH:
+        try:
+            ensure_directory_exists(os.path.dirname(settings.SYNC_STATUS_PATH))
+            temp_path = f"{settings.SYNC_STATUS_PATH}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, settings.SYNC_STATUS_PATH)
+        except OSError as e:
+            logging.warning(f"동기화 상태 파일 기록 실패 ({settings.SYNC_STATUS_PATH}): {e}")
+    if status['result'] != 'locked':
+        db_Manager.set_sync_state(LAST_RUN_STATE, json.dumps(
+            {key: status[key] for key in ('result', 'started_at', 'duration_seconds')}
+        ))
+
+
+# DB 락을 잡고 동기화를 한 번 실행한 뒤 결과를 기록하고 반환
+# 다른 프로세스가 동기화 중이면 실행하지 않고 result='locked'를 반환합니다.
+def run_sync_once(full_sync=None, init_schema=True):
+    started_at = datetime.now(timezone.utc)
+    started = time.monotonic()
+    metrics_before = metrics.get_metrics().snapshot()
+    with db_Manager.named_lock(settings.SYNC_LOCK_NAME, settings.SYNC_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            logging.warning(f"다른 동기화가 실행 중이거나 DB에 연결할 수 없어 이번 실행을 건너뜁니다 (락: {settings.SYNC_LOCK_NAME}).")
+            results = None
+        else:
+            results = main_sync_process(full_sync, init_schema=init_schema)
+    duration = time.monotonic() - started
+    status = summarize_run(results, started_at, duration, locked=not acquired)
+    metrics.inc('sync_runs_total', result=status['result'])
+    metrics.observe('sync_stage_seconds', duration, stage='run')
+    status['metrics'] = metrics.snapshot_delta(metrics_before, metrics.get_metrics().snapshot())
+    log_stage_metrics(status['metrics'])
+    write_run_status(status)
+    write_metrics_textfile()
+    logging.info(f"동기화 실행 결과: {status['result']} ({status['duration_seconds']}초)")
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notion 데이터베이스의 발행된 게시물을 MySQL과 이미지 저장소로 동기화합니다.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="종료하지 않고 주기적으로 변경을 확인하며 동기화 (설정: SYNC_POLL_INTERVAL, SYNC_DAEMON_INTERVAL)")
+    parser.add_argument('--profile', nargs='?', const='', metavar='DIR',
+                        help="게시물별 cProfile/tracemalloc 측정 후 보고서와 pstats 파일을 DIR에 기록 (기본: profiles/<실행 시각>)")
+    parser.add_argument('--full', action='store_true',
+                        help="SYNC_MODE와 관계없이 전체 동기화 (카세트 재생 시에는 이 옵션으로 실행)")
+    args = parser.parse_args(argv)
+    if args.daemon and args.profile is not None:
+        parser.error("--profile은 한 번 실행할 때만 사용할 수 있습니다 (--daemon과 함께 사용 불가).")
+    if args.daemon and args.full:
+        parser.error("--full은 한 번 실행할 때만 사용할 수 있습니다 (상주 실행은 FULL_SYNC_INTERVAL로 전체 동기화).")
+
+    settings.print_summary()
+    global _post_profiler
+    try:
+        if args.daemon:
+            from sync_daemon import SyncDaemon
+            SyncDaemon(run_sync_once).run()
+            return 0
+        if args.profile is not None:
+            from utils.profiling import PostProfiler
+            output_dir = args.profile or os.path.join('profiles', datetime.now().strftime('%Y%m%d-%H%M%S'))
+            _post_profiler = PostProfiler(output_dir, discard_results={POST_SKIPPED})
+            _post_profiler.start()
+        status = run_sync_once(full_sync=True if args.full else None)
+        return 0 if status['result'] in ('ok', 'locked') else 1
+    finally:
+        if _post_profiler is not None:
+            _post_profiler.write_report()
+            _post_profiler.stop()
+            _post_profiler = None
+        shutdown_variant_pool()
 
 
 if __name__ == "__main__":
-    main_sync_process()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,6 +1,8 @@
 
 # Notion API를 통한 데이터(페이지, 블록)조회 함수
 
+from notion_client.errors import APIErrorCode, APIResponseError
+
 from . import client
 from core import settings
 import logging
@@ -9,39 +11,106 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
+# 발행 상태 필터
+PUBLISHED_FILTER = {
+    "property": "Status",
+    "select": {
+        "equals": "발행됨"
+    }
+}
+
+
+# last_edited_time이 edited_since 이후인 페이지 필터 (edited_since: ISO 8601 문자열)
+def build_edited_since_filter(edited_since):
+    return {
+        "timestamp": "last_edited_time",
+        "last_edited_time": {
+            "on_or_after": edited_since
+        }
+    }
+
+
+# 데이터베이스 조회 결과를 next_cursor 배치가 도착할 때마다 한 페이지씩 내보내는 제너레이터
+# 전체 목록을 메모리에 모으지 않으므로, 호출자는 다음 배치를 받는 동안 앞선 페이지를 처리할 수 있습니다.
+# 조회 중 오류가 나면 예외를 그대로 전달합니다 (이미 내보낸 페이지는 유효).
+def iter_database_pages(notion, query_filter):
+    next_cursor = None
+    while True:
+        response = notion.databases.query(
+            database_id=settings.NOTION_DATABASE_ID,
+            filter=query_filter,
+            sorts=[
+                {
+                    "property": "PublishedDate",
+                    "direction": "descending"
+                }
+            ],
+            start_cursor=next_cursor
+        )
+        next_cursor = response.get("next_cursor")
+        yield from response.get("results", [])
+        if not next_cursor:
+            break
+
+
+# edited_since 이후 수정된 페이지의 (ID, last_edited_time)을 최근 수정 순으로 최대 limit개 조회 (요청 1회)
+# 상주 실행에서 동기화가 필요한지 가볍게 확인하는 용도. (목록, 더 있는지 여부)를 반환하며 오류는 그대로 전달합니다.
+def peek_edited_pages(notion, edited_since, limit=100):
+    response = notion.databases.query(
+        database_id=settings.NOTION_DATABASE_ID,
+        filter=build_edited_since_filter(edited_since),
+        sorts=[
+            {
+                "timestamp": "last_edited_time",
+                "direction": "descending"
+            }
+        ],
+        page_size=limit
+    )
+    pages = [(page['id'], page.get('last_edited_time')) for page in response.get("results", [])]
+    return pages, bool(response.get("has_more"))
+
+
+# 페이지 ID 목록의 페이지를 하나씩 조회해 내보내는 제너레이터 (지난 실행에서 실패한 게시물 재시도용)
+# 조회에 실패한 ID는 failed_ids에 추가하고 건너뜁니다. 삭제되었거나 접근할 수 없는 페이지(object_not_found)는
+# 다시 시도해도 소용없으므로 추가하지 않습니다 (DB의 게시물은 다음 전체 동기화에서 정리).
+def iter_pages_by_id(notion, page_ids, failed_ids):
+    for page_id in page_ids:
+        try:
+            yield notion.pages.retrieve(page_id=page_id)
+        except APIResponseError as e:
+            if e.code == APIErrorCode.ObjectNotFound:
+                logging.warning(f"재시도할 페이지(ID: {page_id})를 찾을 수 없어 재시도 목록에서 뺍니다.")
+            else:
+                logging.error(f"재시도할 페이지(ID: {page_id}) 조회 중 오류 발생: {e}")
+                failed_ids.append(page_id)
+        except Exception as e:
+            logging.error(f"재시도할 페이지(ID: {page_id}) 조회 중 오류 발생: {e}")
+            failed_ids.append(page_id)
+
+
+# 블록의 직계 자식 블록을 next_cursor 배치 단위로 내보내는 제너레이터 (오류는 그대로 전달)
+def iter_block_children(notion, block_id):
+    next_cursor = None
+    while True:
+        response = notion.blocks.children.list(block_id=block_id, start_cursor=next_cursor)
+        next_cursor = response.get("next_cursor")
+        yield from response.get("results", [])
+        if not next_cursor:
+            break
+
+
 # 발행된 포스트 데이터 가져오기
-def get_published_blog_posts_from_notion_api(notion=client.get_notion_client()):
-    
+def get_published_blog_posts_from_notion_api(notion=None):
+    notion = notion or client.get_notion_client()
     notion_database_id = settings.NOTION_DATABASE_ID
 
 
     logging.info(f"Notion 데이터베이스(ID: {notion_database_id})에서 '발행됨' 상태의 페이지를 조회합니다...")
-    all_results = []
-    next_cursor = None
 
     try:
         # 페이지네이션
-        while True:
-            response = notion.databases.query(
-                database_id=notion_database_id,
-                filter={
-                    "property": "Status",
-                    "select": {
-                        "equals": "발행됨"
-                    }
-                },
-                sorts=[
-                    {
-                        "property": "PublishedDate",
-                        "direction": "descending"
-                    }
-                ],
-                start_cursor=next_cursor
-            )
-            all_results.extend(response.get("results", []))
-            next_cursor = response.get("next_cursor")
-            if not next_cursor:
-                break
+        all_results = list(iter_database_pages(notion, PUBLISHED_FILTER))
         
         logging.info(f"총 {len(all_results)}개의 '발행됨' 페이지를 Notion에서 가져왔습니다.")
         return all_results
@@ -50,26 +119,20 @@ def get_published_blog_posts_from_notion_api(notion=client.get_notion_client()):
         return []
 
 
+# 특정 Notion 페이지의 최상위 블록을 도착하는 대로 하나씩 내보내는 제너레이터 (오류는 그대로 전달)
+def iter_page_blocks(page_id: str, notion=None):
+    notion = notion or client.get_notion_client()
+    yield from iter_block_children(notion, page_id)
+
+
 # 특정 Notion 페이지 ID에 해당하는 모든 블록(콘텐츠) 정보를 반환
 def get_page_blocks(page_id: str):
 
     notion = client.get_notion_client()
     
     logging.info(f"Notion 페이지(ID: {page_id})의 블록 정보를 조회합니다...")
-    all_blocks = []
-    next_cursor = None
-
     try:
-        while True:
-            response = notion.blocks.children.list(
-                block_id=page_id,
-                start_cursor=next_cursor
-            )
-            all_blocks.extend(response.get("results", []))
-            next_cursor = response.get("next_cursor")
-            if not next_cursor:
-                break
-        
+        all_blocks = list(iter_page_blocks(page_id, notion))
         logging.info(f"총 {len(all_blocks)}개의 블록을 페이지(ID: {page_id})에서 가져왔습니다.")
         return all_blocks
     except Exception as e:
@@ -0,0 +1,171 @@
+# Notion 블록 자식 목록의 로컬 캐시 (SQLite)
+# 부모 블록의 last_edited_time과 has_children이 저장할 때와 같으면 그 블록의 자식 목록 요청을 건너뜁니다.
+#
+# 유효성은 방금 가져온 목록에 들어 있는 부모 블록의 값으로만 판단합니다 (notion_handler/block_tree.py 참고).
+# 캐시에서 꺼낸 목록의 블록은 시각이 오래되었을 수 있으므로, 그 블록의 자식은 다시 요청하고 캐시를 새로 씁니다.
+# 따라서 본문 한 곳을 고쳐도 바뀌지 않은 다른 블록들의 자식 목록은 계속 적중합니다.
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from core import settings
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 만료되는 서명 URL(Notion 내부 파일)을 가진 블록 타입. 이런 블록이 있는 자식 목록만 캐시하지 않습니다.
+FILE_BLOCK_TYPES = {'image', 'file', 'pdf', 'video', 'audio'}
+
+
+def _has_expiring_urls(blocks):
+    for block in blocks:
+        block_type = block.get('type')
+        if block_type in FILE_BLOCK_TYPES and block.get(block_type, {}).get('type') == 'file':
+            return True
+    return False
+
+
+class BlockCache:
+    """블록 ID -> (last_edited_time, has_children, 자식 블록 목록) 캐시. 크기 상한을 넘으면 오래 안 쓴 항목부터 삭제합니다."""
+
+    def __init__(self, path, max_bytes, max_age=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0, 'requests_saved': 0}
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(block_children)")}
+            if columns and 'has_children' not in columns:
+                # 페이지 버전으로 검증하던 이전 형식의 캐시는 버림
+                self._conn.execute("DROP TABLE block_children")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS block_children (
+                    block_id TEXT PRIMARY KEY,
+                    last_edited_time TEXT NOT NULL,
+                    has_children INTEGER NOT NULL,
+                    children BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_block_children_accessed ON block_children (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, block):
+        """block(방금 가져온 목록의 블록)의 캐시된 자식 목록을 반환합니다. 없거나, 블록이 바뀌었거나, 오래된 항목이면 None."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT last_edited_time, has_children, children, stored_at FROM block_children WHERE block_id = ?",
+                (block['id'],)
+            ).fetchone()
+            if (
+                row is None
+                or row[0] != block.get('last_edited_time')
+                or bool(row[1]) != bool(block.get('has_children'))
+                or (self.max_age and time.time() - row[3] > self.max_age)
+            ):
+                self._stats['misses'] += 1
+                return None
+            conn.execute("UPDATE block_children SET accessed_at = ? WHERE block_id = ?", (time.time(), block['id']))
+            self._stats['hits'] += 1
+            self._stats['requests_saved'] += 1
+        return json.loads(zlib.decompress(row[2]))
+
+    def put(self, block, children):
+        """block의 자식 목록을 저장합니다. 만료되는 파일 URL이 있는 목록은 저장하지 않고 이전 항목도 지웁니다."""
+        if not block.get('last_edited_time'):
+            return
+        if _has_expiring_urls(children):
+            with self._lock:
+                self._connect().execute("DELETE FROM block_children WHERE block_id = ?", (block['id'],))
+                self._conn.commit()
+            return
+        # 자식의 자식은 각자의 항목으로 저장되므로 제외
+        payload = zlib.compress(json.dumps(
+            [{k: v for k, v in child.items() if k != 'children'} for child in children],
+            ensure_ascii=False
+        ).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO block_children "
+                "(block_id, last_edited_time, has_children, children, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (block['id'], block['last_edited_time'], int(bool(block.get('has_children'))), payload, len(payload), now, now)
+            )
+            self._conn.commit()
+            self._stats['stored'] += 1
+
+    def evict(self):
+        """전체 크기가 max_bytes를 넘으면 오래 안 쓴 항목부터 90% 이하가 될 때까지 삭제합니다."""
+        with self._lock:
+            conn = self._connect()
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM block_children").fetchone()[0]
+            if total > self.max_bytes:
+                target = self.max_bytes * 0.9
+                evicted = 0
+                for block_id, size in conn.execute(
+                    "SELECT block_id, size FROM block_children ORDER BY accessed_at ASC"
+                ).fetchall():
+                    if total <= target:
+                        break
+                    conn.execute("DELETE FROM block_children WHERE block_id = ?", (block_id,))
+                    total -= size
+                    evicted += 1
+                self._stats['evicted'] += evicted
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for key in self._stats:
+                self._stats[key] = 0
+
+    def log_report(self):
+        """이번 실행의 캐시 적중/실패 보고 (정리 후)."""
+        self.evict()
+        stats = self.stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = (stats['hits'] / lookups * 100) if lookups else 0.0
+        logging.info(
+            f"블록 캐시: 적중 {stats['hits']}회, 실패 {stats['misses']}회 (적중률 {hit_rate:.1f}%), "
+            f"절약한 자식 목록 요청 {stats['requests_saved']}회, 저장 {stats['stored']}개, 삭제(용량 초과) {stats['evicted']}개"
+        )
+
+
+_block_cache = None
+_block_cache_lock = threading.Lock()
+
+def get_block_cache():
+    """공유 블록 캐시를 반환합니다. 비활성화되어 있거나 저장 경로가 없으면 None."""
+    global _block_cache
+    if not settings.BLOCK_CACHE_ENABLED:
+        return None
+    if settings.NOTION_CASSETTE_MODE == 'record':
+        return None # 기록 중에는 모든 자식 목록 요청이 카세트에 남도록 캐시를 건너뜀
+    path = settings.BLOCK_CACHE_PATH
+    if not path:
+        return None
+    if _block_cache is None:
+        with _block_cache_lock:
+            if _block_cache is None:
+                _block_cache = BlockCache(path, settings.BLOCK_CACHE_MAX_BYTES, settings.BLOCK_CACHE_MAX_AGE)
+    return _block_cache
@@ -0,0 +1,112 @@
+# Notion 페이지의 블록 트리를 너비 우선(BFS)으로 가져오기
+# 같은 깊이의 자식 블록 조회를 동시에 보내므로, 조회 시간은 노드 수가 아니라 트리 깊이에 비례합니다.
+# (요청 속도는 notion_handler.client의 공유 속도 제한기가 조절)
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from core import settings
+from .api import iter_block_children
+from .block_cache import get_block_cache
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 별도 페이지/데이터베이스이므로 자식을 펼치지 않는 블록 타입
+NON_EXPANDABLE_TYPES = {'child_page', 'child_database'}
+
+
+# 블록 하나의 직계 자식 블록을 페이지네이션을 따라 모두 가져옵니다
+def fetch_block_children(notion, block_id):
+    return list(iter_block_children(notion, block_id))
+
+
+# 자식 목록을 가져올 블록 ID (동기화 블록 사본은 원본 블록의 자식을 보여줌)
+def children_source_id(block):
+    if block.get('type') == 'synced_block':
+        synced_from = (block.get('synced_block') or {}).get('synced_from')
+        if synced_from and synced_from.get('block_id'):
+            return synced_from['block_id']
+    return block['id']
+
+
+# 블록의 자식 목록 조회. 동기화 블록 사본은 원본에 접근할 수 없을 수 있으므로 실패해도 빈 목록으로 둠
+def fetch_children_for(notion, block):
+    source_id = children_source_id(block)
+    if source_id == block['id']:
+        return fetch_block_children(notion, source_id)
+    try:
+        return fetch_block_children(notion, source_id)
+    except Exception as e:
+        logging.warning(f"동기화 블록(ID: {block['id']})의 원본(ID: {source_id}) 자식을 가져오지 못했습니다: {e}")
+        return []
+
+
+# 블록을 펼쳐야 하는지 (자식이 있고, expand_types에 포함되는 타입인지)
+def should_expand(block, expand_types=None):
+    if not block.get('has_children') or block.get('type') in NON_EXPANDABLE_TYPES:
+        return False
+    return expand_types is None or block.get('type') in expand_types
+
+
+def fetch_block_tree(notion, root_block_id, expand_types=None, max_workers=None, cache=None):
+    """root_block_id 아래의 블록 트리를 모두 가져와 반환합니다.
+
+    각 블록의 자식은 block['children'] 리스트로 붙습니다 (펼치지 않은 블록은 키가 없음).
+    expand_types가 주어지면 해당 타입의 블록만 자식을 가져옵니다 (None이면 모든 타입).
+    cache(기본: 공유 블록 캐시)에 last_edited_time, has_children이 같은 블록의 자식 목록이 있으면 요청하지 않습니다.
+    조회 중 오류가 나면 예외를 그대로 전달합니다.
+    """
+    max_workers = max_workers or settings.BLOCK_FETCH_WORKERS
+    cache = cache if cache is not None else get_block_cache()
+
+    root_blocks = fetch_block_children(notion, root_block_id)
+    level = [block for block in root_blocks if should_expand(block, expand_types)]
+    depth = 1
+    request_count = 1
+    # 캐시로 검증할 수 없는 블록 (자식 목록을 항상 요청)
+    #   - 동기화 블록 사본과 그 아래 블록: 원본(다른 페이지)이 바뀌어도 사본의 시각은 바뀌지 않음
+    #   - 캐시에서 꺼낸 목록의 블록: 시각이 저장할 때의 값이라 방금 가져온 목록으로 확인한 것이 아님
+    uncacheable_ids = set()
+    from_cache_ids = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="block-fetch") as executor:
+        while level:
+            for block in level:
+                if children_source_id(block) != block['id']:
+                    uncacheable_ids.add(block['id'])
+
+            # 캐시에 있는 (바뀌지 않은) 블록은 요청하지 않음
+            to_fetch = []
+            cached_ids = set()
+            for block in level:
+                cacheable = cache and block['id'] not in uncacheable_ids and block['id'] not in from_cache_ids
+                cached_children = cache.get(block) if cacheable else None
+                if cached_children is None:
+                    to_fetch.append(block)
+                else:
+                    block['children'] = cached_children
+                    cached_ids.add(block['id'])
+
+            # 같은 깊이의 나머지 블록들의 자식을 동시에 조회
+            children_lists = list(executor.map(lambda block: fetch_children_for(notion, block), to_fetch))
+            request_count += len(to_fetch)
+            for block, children in zip(to_fetch, children_lists):
+                block['children'] = children
+                if cache and block['id'] not in uncacheable_ids:
+                    cache.put(block, children)
+            depth += 1
+
+            next_level = []
+            for block in level:
+                for child in block['children']:
+                    if block['id'] in uncacheable_ids:
+                        uncacheable_ids.add(child['id'])
+                    if block['id'] in cached_ids:
+                        from_cache_ids.add(child['id'])
+                    if should_expand(child, expand_types):
+                        next_level.append(child)
+            level = next_level
+
+    logging.info(f"블록 트리 조회 완료 (ID: {root_block_id}): 깊이 {depth}, 자식 목록 요청 {request_count}회")
+    return root_blocks
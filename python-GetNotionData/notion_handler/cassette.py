@@ -0,0 +1,155 @@
+# Notion API 응답 기록/재생 (개발용 카세트, SQLite + zlib)
+# record 모드에서는 실제 요청의 (메서드, 경로, 쿼리, 본문) -> 응답을 카세트에 저장하고,
+# replay 모드에서는 Notion에 요청하지 않고 카세트의 응답만 돌려줍니다 (없는 요청은 CassetteMissError).
+# 렌더러(markdown_converter, html_renderer)나 parser를 고치면서 같은 데이터로 반복 실행할 때 사용합니다.
+#
+# 주의: 요청 내용이 정확히 같아야 재생되므로, 시각이 들어가는 증분 조회(워터마크 필터)는 기록한 실행에서만 재생됩니다.
+#       재생할 때는 전체 동기화(main.py --full)로 실행하세요. 이미지 다운로드는 카세트 대상이 아닙니다.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from notion_client import Client
+
+from core import metrics
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CASSETTE_MODES = ('off', 'record', 'replay')
+
+
+class CassetteMissError(Exception):
+    """replay 모드에서 카세트에 기록되지 않은 요청."""
+
+
+# 요청을 식별하는 키 (인증 정보 제외, dict 키 순서와 무관)
+def request_key(path, method, query=None, body=None):
+    canonical = json.dumps([method.upper(), path.strip('/'), query or {}, body or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class CassetteStore:
+    """요청 키 -> 압축된 응답 JSON 저장소."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {'recorded': 0, 'replayed': 0, 'misses': 0}
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    request_key TEXT PRIMARY KEY,
+                    method TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    request BLOB NOT NULL,
+                    response BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    recorded_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            row = self._connect().execute("SELECT response FROM responses WHERE request_key = ?", (key,)).fetchone()
+            self._stats['replayed' if row else 'misses'] += 1
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def put(self, key, path, method, query, body, response):
+        request = zlib.compress(json.dumps({'query': query, 'body': body}, ensure_ascii=False).encode('utf-8'))
+        payload = zlib.compress(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO responses (request_key, method, path, request, response, size, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, method.upper(), path.strip('/'), request, payload, len(payload), time.time())
+            )
+            self._conn.commit()
+            self._stats['recorded'] += 1
+
+    def summary(self):
+        """엔드포인트별 (응답 수, 압축 크기 합계)."""
+        from .client import endpoint_label
+        totals = {}
+        with self._lock:
+            for method, path, size in self._connect().execute("SELECT method, path, size FROM responses"):
+                label = endpoint_label(path, method)
+                count, total = totals.get(label, (0, 0))
+                totals[label] = (count + 1, total + size)
+        return totals
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def log_report(self):
+        stats = self.stats()
+        logging.info(
+            f"Notion 카세트({self.path}, 프로세스 누적): 기록 {stats['recorded']}개, 재생 {stats['replayed']}개, 없음 {stats['misses']}개"
+        )
+
+
+class CassetteClient(Client):
+    """get_notion_client()가 돌려주는 클라이언트를 대신하는 기록/재생 클라이언트.
+
+    notion_client.Client를 상속하고 모든 요청이 거치는 request()만 바꾸므로, 엔드포인트 메서드는 설치된
+    notion-client 버전의 것을 그대로 씁니다 (requirements.txt에서 databases.query가 있는 2.6 미만으로 고정).
+    record 모드는 inner(실제 클라이언트)로 요청한 뒤 응답을 저장하고, replay 모드는 카세트의 응답을 latency초 뒤에 돌려줍니다.
+    카세트 키에는 form_data와 auth가 들어가지 않습니다 (동기화는 파일 업로드나 요청별 인증을 쓰지 않음).
+    """
+
+    def __init__(self, store, mode, inner=None, latency=0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"지원하지 않는 카세트 모드: {mode}")
+        if mode == 'record' and inner is None:
+            raise ValueError("record 모드에는 실제 요청을 보낼 클라이언트(inner)가 필요합니다.")
+        super().__init__()
+        self.store = store
+        self.mode = mode
+        self.inner = inner
+        self.latency = latency
+
+    def request(self, path, method, query=None, body=None, form_data=None, auth=None):
+        key = request_key(path, method, query, body)
+        if self.mode == 'replay':
+            response = self.store.get(key)
+            if response is None:
+                metrics.inc('notion_cassette_total', result='missed')
+                raise CassetteMissError(f"카세트에 없는 요청입니다: {method.upper()} {path} query={query} body={body}")
+            if self.latency:
+                time.sleep(self.latency)
+            metrics.inc('notion_cassette_total', result='replayed')
+            return response
+
+        response = self.inner.request(path, method, query=query, body=body, form_data=form_data, auth=auth)
+        self.store.put(key, path, method, query, body, response)
+        metrics.inc('notion_cassette_total', result='recorded')
+        return response
+
+    def log_report(self):
+        self.store.log_report()
+
+
+if __name__ == '__main__':
+    # 카세트 내용 요약: python -m notion_handler.cassette
+    from core import settings
+    store = CassetteStore(settings.NOTION_CASSETTE_PATH)
+    totals = store.summary()
+    for label, (count, size) in sorted(totals.items()):
+        print(f"{label:<40} {count:>7}개 {size / 1024:>10.1f} KiB")
+    print(f"{'합계':<40} {sum(c for c, _ in totals.values()):>7}개 {sum(s for _, s in totals.values()) / 1024:>10.1f} KiB")
@@ -1,15 +1,88 @@
 # Notion 클라이언트 초기화
 
-import os
-import sys
+import re
+import threading
 from notion_client import Client
 
 from core import settings
+from core import metrics
+from .rate_limiter import NotionRateLimiter
+from .cassette import CASSETTE_MODES, CassetteClient, CassetteStore
+
+# 모든 Notion API 호출이 공유하는 속도 제한기와 클라이언트 (처음 요청할 때 생성)
+# 임포트만으로는 HTTP 클라이언트(SSL 컨텍스트 등)를 만들지 않으므로 파서/렌더러를 임포트하는 비용이 작습니다.
+_rate_limiter = None
+_notion_client = None
+_client_lock = threading.Lock()
+_rate_limiter_lock = threading.Lock()
+
+
+# 요청 경로의 ID를 지워 메트릭 라벨로 사용 (예: "POST databases/{id}/query")
+_ID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}')
+
+def endpoint_label(path, method):
+    return f"{method.upper()} {_ID_PATTERN.sub('{id}', path)}"
+
+
+class RateLimitedClient(Client):
+    """모든 요청(databases.query, blocks.children.list 등)을 공유 속도 제한기를 거쳐 보내는 Notion 클라이언트."""
+
+    def __init__(self, limiter, **kwargs):
+        try:
+            # 재시도는 속도 제한기가 담당하므로 notion-client 자체 재시도는 끔 (지원하는 버전에서만)
+            super().__init__(retry=False, **kwargs)
+        except TypeError:
+            super().__init__(**kwargs)
+        self.rate_limiter = limiter
+
+    def request(self, path, method, *args, **kwargs):
+        with metrics.timer('notion_request_seconds', endpoint=endpoint_label(path, method)):
+            return self.rate_limiter.call(super().request, path, method, *args, **kwargs)
+
+
+# NOTION_CASSETTE_MODE가 record/replay이면 실제 클라이언트 대신 카세트 클라이언트를 사용
+def build_notion_client():
+    mode = settings.NOTION_CASSETTE_MODE
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"NOTION_CASSETTE_MODE는 {', '.join(CASSETTE_MODES)} 중 하나여야 합니다: {mode}")
+    if mode != 'off' and not settings.NOTION_CASSETTE_PATH:
+        raise ValueError("카세트를 사용하려면 NOTION_CASSETTE_PATH(또는 IMAGE_HOST_STORAGE_PATH)를 설정해야 합니다.")
+    if mode == 'replay':
+        settings.require('NOTION_DATABASE_ID') # 재생에는 API 키가 필요 없음
+        return CassetteClient(CassetteStore(settings.NOTION_CASSETTE_PATH), 'replay', latency=settings.NOTION_REPLAY_LATENCY)
+    settings.require(*settings.NOTION_REQUIRED_SETTINGS)
+    client = RateLimitedClient(get_rate_limiter(), auth=settings.NOTION_API_KEY)
+    if mode == 'record':
+        return CassetteClient(CassetteStore(settings.NOTION_CASSETTE_PATH), 'record', inner=client)
+    return client
 
-notion_client = Client(auth=settings.NOTION_API_KEY)
 
 def get_notion_client():
-    return notion_client
+    global _notion_client
+    if _notion_client is None:
+        with _client_lock:
+            if _notion_client is None:
+                _notion_client = build_notion_client()
+    return _notion_client
+
+# 모든 모듈이 쓰는 클라이언트를 바꿉니다 (벤치마크의 가짜 Notion 백엔드 등). 이전 클라이언트(아직 없었으면 None)를 반환
+def set_notion_client(client):
+    global _notion_client
+    with _client_lock:
+        previous, _notion_client = _notion_client, client
+    return previous
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = NotionRateLimiter(
+                    rate_per_sec=settings.NOTION_RATE_LIMIT_PER_SEC,
+                    max_concurrency=settings.NOTION_MAX_CONCURRENCY,
+                    max_retries=settings.NOTION_MAX_RETRIES,
+                )
+    return _rate_limiter
 
 # Notion API 연결 테스트
 def test_notion_connection(notion_client):
@@ -0,0 +1,197 @@
+# Notion API 호출 속도 제한 (토큰 버킷 + 429 비율에 따라 조절되는 동시 요청 수 + Retry-After 기반 재시도)
+# Notion 문서 기준 통합(integration)당 평균 약 3 req/s 를 넘으면 HTTP 429(rate_limited)가 반환됩니다.
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+from core import metrics
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 재시도 대상 HTTP 상태 (429 + 일시적인 서버 오류)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """초당 rate개의 토큰이 채워지는 버킷. 토큰이 없으면 채워질 때까지 대기합니다."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0  # Retry-After 로 전체 요청을 멈춰야 하는 시각
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """토큰 하나를 가져옵니다. 기다린 시간(초)을 반환합니다."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """seconds 동안 모든 요청을 멈춥니다 (서버가 보낸 Retry-After 반영)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class AdaptiveConcurrencyLimiter:
+    """동시 요청 수 제한. 429가 나면 절반으로 줄이고, 연속 성공하면 하나씩 늘립니다 (AIMD)."""
+
+    def __init__(self, max_limit, min_limit=1, increase_after=20):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.increase_after = increase_after
+        self.limit = self.max_limit
+        self._in_flight = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_throttled(self):
+        with self._cond:
+            self._successes = 0
+            new_limit = max(self.min_limit, self.limit // 2)
+            if new_limit != self.limit:
+                logging.warning(f"Notion API 429 응답으로 동시 요청 수를 {self.limit} -> {new_limit}로 줄입니다.")
+                self.limit = new_limit
+
+
+def parse_retry_after(headers):
+    """Retry-After 헤더(초 또는 HTTP-date)를 초 단위로 반환합니다. 없으면 None."""
+    if not headers:
+        return None
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class NotionRateLimiter:
+    """모든 Notion API 호출이 공유하는 속도 제한기."""
+
+    def __init__(self, rate_per_sec=3.0, max_concurrency=3, max_retries=5, base_backoff=1.0, max_backoff=30.0):
+        self.bucket = TokenBucket(rate_per_sec)
+        self.concurrency = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,            # 실제로 보낸 요청 수 (재시도 포함)
+            'throttled': 0,           # 429 응답 수
+            'retried': 0,             # 재시도 횟수
+            'failed': 0,              # 재시도 후에도 실패한 호출 수
+            'bucket_wait_seconds': 0.0,
+            'retry_wait_seconds': 0.0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+        metrics.inc(f'notion_{key}_total', amount)
+
+    def _backoff(self, attempt):
+        # 지수 백오프 + 지터
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def call(self, func, *args, **kwargs):
+        """func(*args, **kwargs)를 속도 제한 아래에서 실행하고, 429/일시적 오류는 재시도합니다."""
+        attempt = 0
+        while True:
+            self._count('bucket_wait_seconds', self.bucket.acquire())
+            self.concurrency.acquire()
+            self._count('requests')
+            try:
+                result = func(*args, **kwargs)
+            except (HTTPResponseError, RequestTimeoutError) as e:
+                status = getattr(e, 'status', None)
+                retryable = isinstance(e, RequestTimeoutError) or status in RETRYABLE_STATUSES
+                retry_after = None
+                if status == 429:
+                    self._count('throttled')
+                    self.concurrency.on_throttled()
+                    retry_after = parse_retry_after(getattr(e, 'headers', None))
+
+                if not retryable or attempt >= self.max_retries:
+                    self._count('failed')
+                    raise
+
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if status == 429:
+                    # 다른 스레드의 요청도 함께 멈추도록 버킷 전체를 멈춤
+                    self.bucket.pause(delay)
+                logging.warning(f"Notion API 요청 실패 (status={status}), {delay:.2f}초 후 재시도합니다 ({attempt + 1}/{self.max_retries}).")
+                self._count('retried')
+                self._count('retry_wait_seconds', delay)
+                attempt += 1
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.release()
+
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot['concurrency_limit'] = self.concurrency.limit
+        return snapshot
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"Notion API 호출 통계: 요청 {stats['requests']}회, 429 {stats['throttled']}회, 재시도 {stats['retried']}회, "
+            f"실패 {stats['failed']}회, 버킷 대기 {stats['bucket_wait_seconds']:.2f}초, 재시도 대기 {stats['retry_wait_seconds']:.2f}초, "
+            f"현재 동시 요청 한도 {stats['concurrency_limit']}"
+        )
@@ -0,0 +1,130 @@
+# 상주 실행 모드 (main.py --daemon)
+# 컨테이너 재시작으로 main.py를 반복 실행하는 대신, 한 프로세스가 Notion 클라이언트, DB 커넥션 풀, 이미지 HTTP 세션,
+# 파생본 프로세스 풀, 블록 캐시를 계속 유지하면서 주기적으로 동기화합니다.
+#
+#   - SYNC_POLL_INTERVAL(±SYNC_POLL_JITTER)마다 워터마크 이후 수정된 페이지를 Notion 요청 1회로 확인하고,
+#     바뀐 페이지가 있을 때만 동기화를 실행합니다.
+#   - 변경이 없어도 SYNC_DAEMON_INTERVAL마다, 그리고 전체 동기화 주기(FULL_SYNC_INTERVAL)가 되면 실행합니다.
+#   - 실행은 MySQL 락(SYNC_LOCK_NAME)을 잡고 하므로 다른 프로세스의 동기화와 겹치지 않습니다.
+#   - SIGTERM/SIGINT를 받으면 진행 중인 동기화를 마친 뒤 종료합니다.
+#   - METRICS_PORT가 설정되어 있으면 /metrics(Prometheus)와 /status(마지막 실행 결과)를 HTTP로 제공합니다.
+
+import logging
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+
+from core import settings
+from core import db_Manager
+from core import metrics
+from core.sync_state import watermark_edited_since, is_full_sync_due
+from notion_handler.client import get_notion_client
+from notion_handler.api import peek_edited_pages
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class SyncDaemon:
+    """변경을 확인하며 run_sync를 주기적으로 호출하는 상주 실행기.
+
+    run_sync는 main.run_sync_once처럼 (full_sync=None, init_schema=True)를 받아 실행 결과 요약을 반환하는 함수입니다.
+    """
+
+    def __init__(self, run_sync, poll_interval=None, run_interval=None, jitter=None):
+        self.run_sync = run_sync
+        self.poll_interval = poll_interval if poll_interval is not None else settings.SYNC_POLL_INTERVAL
+        self.run_interval = run_interval if run_interval is not None else settings.SYNC_DAEMON_INTERVAL
+        self.jitter = jitter if jitter is not None else settings.SYNC_POLL_JITTER
+        self.stop_event = threading.Event()
+        self.last_run_at = None     # 마지막 동기화 시작 시각 (time.monotonic)
+        self.baseline = None        # 마지막 동기화 직전에 확인한 (페이지 ID, last_edited_time) 집합
+        self.last_status = None     # 마지막 run_sync_once 결과
+
+    def stop(self, signum=None, frame=None):
+        if not self.stop_event.is_set():
+            logging.info("종료 요청을 받았습니다. 진행 중인 동기화가 있으면 마친 뒤 종료합니다.")
+        self.stop_event.set()
+
+    def next_poll_delay(self):
+        return max(1.0, self.poll_interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    # 워터마크(겹침 포함) 이후 수정된 페이지 중 최근 수정 순 최대 100개의 (ID, last_edited_time) 집합. 확인할 수 없으면 None
+    # 더 있어도(has_more) 최근 수정된 페이지가 앞에 오므로, 새 수정은 항상 이 집합에 들어가 기준 목록과 비교할 수 있습니다.
+    def peek_changes(self):
+        edited_since = watermark_edited_since()
+        if not edited_since:
+            return None
+        try:
+            pages, has_more = peek_edited_pages(get_notion_client(), edited_since)
+        except Exception as e:
+            logging.warning(f"Notion 변경 확인 실패: {e}")
+            return None
+        if has_more:
+            logging.debug("워터마크 이후 수정된 페이지가 많아 최근 수정된 페이지만 비교합니다.")
+        return set(pages)
+
+    # 이번 확인에서 동기화를 실행해야 하는 이유 (필요 없으면 None)와 확인한 변경 목록
+    def due_reason(self):
+        if self.last_run_at is None:
+            return '시작', None
+        if time.monotonic() - self.last_run_at >= self.run_interval:
+            return '주기 도래', None
+        if is_full_sync_due(datetime.now(timezone.utc)):
+            return '전체 동기화 주기', None
+        pages = self.peek_changes()
+        if pages is None:
+            # 확인하지 못했다고 매번 실행하지는 않음 (SYNC_DAEMON_INTERVAL 주기 실행에 맡김)
+            return None, None
+        # 워터마크 겹침 구간의 이미 처리한 페이지는 제외하고, 새로 나타났거나 수정 시간이 바뀐 페이지만 변경으로 봄
+        changed = pages - (self.baseline or set())
+        if changed:
+            return f'변경된 페이지 {len(changed)}개', pages
+        return None, pages
+
+    def run_once(self, reason, pages):
+        logging.info(f"동기화를 실행합니다 (이유: {reason}).")
+        # 실행 전에 본 변경 목록을 기준으로 삼음 (실행 중 수정된 페이지는 다음 확인에서 변경으로 잡힘)
+        self.baseline = pages if pages is not None else self.peek_changes()
+        self.last_run_at = time.monotonic()
+        try:
+            self.last_status = self.run_sync(init_schema=False)
+        except Exception:
+            # 기준 목록은 유지: 같은 변경으로 확인할 때마다 다시 실행하지 않고 SYNC_DAEMON_INTERVAL 뒤에 다시 시도
+            logging.exception("동기화 실행 중 처리되지 않은 오류가 발생했습니다. 다음 주기 실행 때 다시 시도합니다.")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        logging.info(
+            f"상주 실행 시작: 변경 확인 {self.poll_interval}초(±{self.jitter:.0%}), "
+            f"최대 실행 간격 {self.run_interval}초, 락 '{settings.SYNC_LOCK_NAME}'"
+        )
+        db_Manager.init_db_schema() # 스키마 확인은 시작할 때 한 번만
+        metrics_server = None
+        if settings.METRICS_PORT:
+            try:
+                metrics_server = metrics.start_metrics_server(
+                    settings.METRICS_HOST, settings.METRICS_PORT, status_provider=lambda: self.last_status
+                )
+            except OSError as e:
+                logging.warning(f"메트릭 HTTP 엔드포인트를 시작하지 못했습니다 ({settings.METRICS_HOST}:{settings.METRICS_PORT}): {e}")
+
+        while not self.stop_event.is_set():
+            try:
+                reason, pages = self.due_reason()
+            except Exception:
+                logging.exception("동기화 필요 여부 확인 중 오류가 발생했습니다.")
+                reason, pages = None, None
+            if reason:
+                self.run_once(reason, pages)
+            else:
+                logging.debug("변경된 페이지가 없어 동기화를 건너뜁니다.")
+            self.stop_event.wait(self.next_poll_delay())
+
+        if metrics_server:
+            metrics_server.shutdown()
+        logging.info("상주 실행 종료.")
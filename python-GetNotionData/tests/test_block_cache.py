@@ -0,0 +1,91 @@
+# 블록 캐시(notion_handler/block_cache.py)와 트리 조회(block_tree.fetch_block_tree)의 재사용 테스트
+# 손으로 만든 가짜 Notion 클라이언트와 임시 SQLite 파일을 쓰므로 Notion, 네트워크 없이 실행됩니다.
+
+from notion_handler.block_cache import BlockCache
+from notion_handler.block_tree import fetch_block_tree
+
+PAGE_ID = 'page-1'
+
+
+def paragraph(block_id, content, edited='2024-01-01T00:00:00.000Z'):
+    return {
+        'id': block_id, 'type': 'paragraph', 'has_children': False, 'last_edited_time': edited,
+        'paragraph': {'rich_text': [{'type': 'text', 'plain_text': content}]},
+    }
+
+
+def toggle(block_id, edited='2024-01-01T00:00:00.000Z'):
+    return {'id': block_id, 'type': 'toggle', 'has_children': True, 'last_edited_time': edited, 'toggle': {'rich_text': []}}
+
+
+def file_image(block_id):
+    return {
+        'id': block_id, 'type': 'image', 'has_children': False, 'last_edited_time': '2024-01-01T00:00:00.000Z',
+        'image': {'type': 'file', 'file': {'url': 'https://files.notion.so/signed?expires=1'}},
+    }
+
+
+class FakeNotion:
+    """blocks.children.list만 흉내 내는 클라이언트. 요청한 블록 ID를 순서대로 기록합니다."""
+
+    def __init__(self, listings):
+        self.listings = listings # 블록 ID -> 자식 블록 목록
+        self.requests = []
+        self.blocks = self
+        self.children = self
+
+    def list(self, block_id, start_cursor=None):
+        self.requests.append(block_id)
+        return {'results': [dict(block) for block in self.listings[block_id]], 'next_cursor': None}
+
+
+def build_listings():
+    return {
+        PAGE_ID: [paragraph('p0', 'intro'), toggle('A'), toggle('B')],
+        'A': [paragraph('a1', 'apple'), toggle('A2')],
+        'A2': [paragraph('a2-1', 'nested')],
+        'B': [paragraph('b1', 'banana')],
+    }
+
+
+def make_cache(tmp_path):
+    return BlockCache(str(tmp_path / 'blocks.sqlite3'), max_bytes=10 * 1024 * 1024)
+
+
+def test_unchanged_subtrees_hit_after_editing_one_paragraph(tmp_path):
+    cache = make_cache(tmp_path)
+    listings = build_listings()
+    notion = FakeNotion(listings)
+    fetch_block_tree(notion, PAGE_ID, max_workers=2, cache=cache)
+    assert sorted(notion.requests) == sorted([PAGE_ID, 'A', 'A2', 'B'])
+
+    # B 아래 문단 하나만 수정 (수정한 블록과 그 부모의 last_edited_time이 바뀜)
+    listings['B'] = [paragraph('b1', 'blueberry', edited='2024-02-01T00:00:00.000Z')]
+    listings[PAGE_ID][2] = toggle('B', edited='2024-02-01T00:00:00.000Z')
+    notion.requests = []
+    cache.reset_stats()
+    tree = fetch_block_tree(notion, PAGE_ID, max_workers=2, cache=cache)
+
+    # A의 자식 목록은 캐시에서, 캐시 목록에 들어 있던 A2는 다시 확인, 바뀐 B는 다시 요청
+    assert 'A' not in notion.requests
+    assert sorted(notion.requests) == sorted([PAGE_ID, 'A2', 'B'])
+    assert cache.stats()['hits'] == 1
+    block_a, block_b = tree[1], tree[2]
+    assert [child['id'] for child in block_a['children']] == ['a1', 'A2']
+    assert block_a['children'][1]['children'][0]['id'] == 'a2-1'
+    assert block_b['children'][0]['paragraph']['rich_text'][0]['plain_text'] == 'blueberry'
+
+
+def test_listing_with_expiring_file_url_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    listings = build_listings()
+    listings['B'] = [file_image('img-1')]
+    notion = FakeNotion(listings)
+    fetch_block_tree(notion, PAGE_ID, max_workers=2, cache=cache)
+
+    notion.requests = []
+    fetch_block_tree(notion, PAGE_ID, max_workers=2, cache=cache)
+
+    # 파일 URL이 있는 B만 다시 요청하고, 같은 페이지의 A는 계속 캐시에서 가져옴
+    assert 'B' in notion.requests
+    assert 'A' not in notion.requests
@@ -0,0 +1,73 @@
+# 카테고리/태그 이름 캐시(db_Manager.NameIdCache) 테스트
+# utf8mb4_unicode_ci처럼 대소문자, 악센트, 끝 공백을 무시하고 이름을 비교하는 가짜 테이블을 씁니다 (MySQL 불필요).
+
+import unicodedata
+
+from core.db_Manager import NameIdCache
+
+
+def collation_key(name):
+    """utf8mb4_unicode_ci의 비교와 같은 키 (대소문자, 악센트, 끝 공백 무시)."""
+    decomposed = unicodedata.normalize('NFKD', name.rstrip(' '))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+class FakeNameTable:
+    """name에 UNIQUE 키가 있는 categories/tags 테이블과 그 커서/연결."""
+
+    def __init__(self, names=()):
+        self.rows = {}  # id -> name
+        self.inserts = 0
+        self.commits = 0
+        self._result = []
+        for name in names:
+            self._insert(name)
+
+    def _find(self, name):
+        return next((id_ for id_, row_name in self.rows.items() if collation_key(row_name) == collation_key(name)), None)
+
+    def _insert(self, name):
+        if self._find(name) is None: # ON DUPLICATE KEY: 같은 것으로 비교되는 이름이 있으면 아무것도 안 함
+            self.rows[len(self.rows) + 1] = name
+
+    # 커서
+    def executemany(self, sql, params):
+        assert sql.startswith("INSERT")
+        self.inserts += 1
+        for (name,) in params:
+            self._insert(name)
+
+    def execute(self, sql, params=None):
+        if "JOIN" in sql:
+            self._result = [(name, self._find(name)) for name in params if self._find(name) is not None]
+        else:
+            assert params is None
+            self._result = list(self.rows.items())
+
+    def fetchall(self):
+        return self._result
+
+    # 연결
+    def commit(self):
+        self.commits += 1
+
+
+def test_accent_and_trailing_space_variants_map_to_existing_row():
+    table = FakeNameTable(['Cafe'])
+    cache = NameIdCache('tags')
+
+    ids = cache.get_or_create_ids(table, table, ['Café', 'cafe ', 'Tea'])
+
+    assert ids == {'Café': 1, 'cafe ': 1, 'Tea': 2}
+    assert table.rows == {1: 'Cafe', 2: 'Tea'}
+
+
+def test_resolved_variant_is_cached_without_another_insert():
+    table = FakeNameTable(['Cafe'])
+    cache = NameIdCache('categories')
+
+    cache.get_or_create_ids(table, table, ['Café'])
+    assert (table.inserts, table.commits) == (1, 1)
+
+    assert cache.get_or_create_ids(table, table, ['Café', 'CAFE']) == {'Café': 1, 'CAFE': 1}
+    assert (table.inserts, table.commits) == (1, 1)
@@ -0,0 +1,169 @@
+# 마크다운 변환(markdown_converter)과 HTML 렌더링(html_renderer)의 출력 고정 테스트
+# 손으로 만든 블록 트리를 쓰므로 Notion, DB, 네트워크 없이 실행됩니다. 이미지 저장은 단위 작업에 기록만 하는 함수로 바꿉니다.
+# python-GetNotionData 디렉터리에서: python -m pytest tests
+
+import pytest
+
+from core import settings
+from core.db_Manager import PostUnitOfWork
+from content_processor import markdown_converter
+from content_processor.html_renderer import render_post_html
+
+PAGE_ID = 'page-1'
+POST_SLUG = 'hello-world'
+IMAGE_ID = 'image-1'
+
+
+def text(content, **annotations):
+    return {'type': 'text', 'text': {'content': content, 'link': None}, 'annotations': annotations, 'plain_text': content}
+
+
+def block(block_id, block_type, payload, children=None):
+    result = {'id': block_id, 'type': block_type, block_type: payload, 'has_children': bool(children)}
+    if children:
+        result['children'] = children
+    return result
+
+
+def item(block_id, block_type, content, children=None):
+    return block(block_id, block_type, {'rich_text': [text(content)]}, children)
+
+
+def table_row(block_id, *cells):
+    return block(block_id, 'table_row', {'cells': [[text(cell)] for cell in cells]})
+
+
+def build_tree():
+    return [
+        block('h1', 'heading_2', {'rich_text': [text('Getting Started')]}),
+        block('p1', 'paragraph', {'rich_text': [text('Read '), text('this', bold=True), text(' first.')]}),
+        item('b1', 'bulleted_list_item', 'Fruit', [
+            item('b1-1', 'bulleted_list_item', 'Apple'),
+            item('b1-2', 'numbered_list_item', 'Step one', [
+                item('b1-2-1', 'numbered_list_item', 'Nested step'),
+            ]),
+        ]),
+        item('b2', 'bulleted_list_item', 'Vegetable'),
+        item('n1', 'numbered_list_item', 'First'),
+        item('n2', 'numbered_list_item', 'Second'),
+        item('t1', 'toggle', 'More details', [
+            block('t1-p', 'paragraph', {'rich_text': [text('Hidden text')]}),
+        ]),
+        block('tbl', 'table', {'table_width': 2, 'has_column_header': True, 'has_row_header': False}, [
+            table_row('r1', 'Name', 'Value'),
+            table_row('r2', 'a|b', '1'),
+        ]),
+        block(IMAGE_ID, 'image', {
+            'type': 'external', 'external': {'url': 'https://example.com/cat.png'}, 'caption': [text('A cat')],
+        }),
+    ]
+
+
+VARIANTS = [
+    {'format': 'webp', 'width': 640, 'web_path': '/images/hello-world/cat-640.webp'},
+    {'format': 'webp', 'width': 1280, 'web_path': '/images/hello-world/cat-1280.webp'},
+    {'format': 'avif', 'width': 640, 'web_path': '/images/hello-world/cat-640.avif'},
+]
+
+
+@pytest.fixture
+def unit_of_work(monkeypatch):
+    """이미지를 내려받지 않고 원본 경로와 파생본만 단위 작업에 기록합니다."""
+    def fake_download(image_url, image_block_id, post_id, post_slug, image_caption=None, is_cover=False, unit_of_work=None):
+        web_path = f"/images/{post_slug}/cat.png"
+        unit_of_work.add_image({'id': image_block_id, 'web_path': web_path, 'caption': image_caption})
+        unit_of_work.add_image_variants(image_block_id, VARIANTS)
+        return web_path
+
+    monkeypatch.setattr(markdown_converter, 'download_and_save_image', fake_download)
+    monkeypatch.setattr(markdown_converter, 'select_default_variant', lambda variants: variants[0] if variants else None)
+    monkeypatch.setattr(settings, 'READING_WORDS_PER_MINUTE', 200)
+    return PostUnitOfWork(PAGE_ID)
+
+
+def convert(tree, unit_of_work):
+    return markdown_converter.convert_blocks_to_markdown(
+        notion_client_instance=None, page_id=PAGE_ID, post_id=PAGE_ID, post_slug=POST_SLUG,
+        blocks=tree, unit_of_work=unit_of_work,
+    )
+
+
+EXPECTED_MARKDOWN = """\
+## Getting Started
+
+Read **this** first.
+
+- Fruit
+  - Apple
+  1. Step one
+     1. Nested step
+- Vegetable
+1. First
+1. Second
+
+▸ More details
+
+Hidden text
+
+| Name | Value |
+| --- | --- |
+| a\\|b | 1 |
+
+![A cat](/images/hello-world/cat-640.webp)
+*A cat*"""
+
+EXPECTED_HTML = (
+    '<h2 id="getting-started">Getting Started</h2>'
+    '<p>Read <strong>this</strong> first.</p>'
+    '<ul><li>Fruit<ul><li>Apple</li></ul><ol><li>Step one<ol><li>Nested step</li></ol></li></ol></li>'
+    '<li>Vegetable</li></ul>'
+    '<ol><li>First</li><li>Second</li></ol>'
+    '<details><summary>More details</summary><p>Hidden text</p></details>'
+    '<table><thead><tr><th scope="col">Name</th><th scope="col">Value</th></tr></thead>'
+    '<tbody><tr><td>a|b</td><td>1</td></tr></tbody></table>'
+    '<figure><picture>'
+    '<source type="image/avif" srcset="/images/hello-world/cat-640.avif 640w" sizes="(max-width: 896px) 100vw, 896px">'
+    '<source type="image/webp" srcset="/images/hello-world/cat-640.webp 640w, /images/hello-world/cat-1280.webp 1280w"'
+    ' sizes="(max-width: 896px) 100vw, 896px">'
+    '<img src="/images/hello-world/cat.png" alt="A cat" loading="lazy" decoding="async">'
+    '</picture><figcaption>A cat</figcaption></figure>'
+)
+
+
+def test_markdown_from_block_tree(unit_of_work):
+    markdown, used_image_ids = convert(build_tree(), unit_of_work)
+
+    assert markdown == EXPECTED_MARKDOWN
+    assert used_image_ids == {IMAGE_ID}
+
+
+def test_render_block_tree_with_prefix(unit_of_work):
+    ctx = markdown_converter.RenderContext(None, PAGE_ID, PAGE_ID, POST_SLUG, unit_of_work)
+    markdown_converter.render_block_tree(build_tree()[2:4], ctx, prefix='  ')
+
+    assert ctx.writer.getvalue() == (
+        "  - Fruit\n"
+        "    - Apple\n"
+        "    1. Step one\n"
+        "       1. Nested step\n"
+        "  - Vegetable"
+    )
+    assert ctx.block_count == 5
+
+
+def test_html_from_same_block_tree(unit_of_work):
+    tree = build_tree()
+    convert(tree, unit_of_work) # 이미지 정보는 마크다운 변환 때 단위 작업에 기록됨
+    render = render_post_html(tree, unit_of_work)
+
+    assert render['html'] == EXPECTED_HTML
+    assert render['toc'] == [{'level': 2, 'text': 'Getting Started', 'id': 'getting-started'}]
+    assert render['word_count'] == 24
+    assert render['reading_minutes'] == 1
+
+
+def test_html_without_saved_image_uses_safe_original_url():
+    tree = [block(IMAGE_ID, 'image', {'type': 'external', 'external': {'url': 'javascript:alert(1)'}, 'caption': []})]
+    tree.append(block('p', 'paragraph', {'rich_text': [text('<b>x</b>')]}))
+
+    assert render_post_html(tree)['html'] == '<p>&lt;b&gt;x&lt;/b&gt;</p>'
@@ -9,7 +9,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 def ensure_directory_exists(directory_path):
     if not os.path.exists(directory_path):
         try:
-            os.makedirs(directory_path)
+            os.makedirs(directory_path, exist_ok=True) # 여러 스레드가 동시에 만들어도 안전하도록
             logging.info(f"디렉터리 생성됨: {directory_path}")
         except OSError as e:
             logging.error(f"디렉터리 생성 실패 ({directory_path}): {e}")
@@ -0,0 +1,162 @@
+# 게시물별 CPU/메모리 프로파일링 (main.py --profile)
+# 게시물 하나를 처리하는 동안만 cProfile과 tracemalloc으로 측정하고,
+# 실행이 끝나면 "가장 느린 / 메모리를 가장 많이 쓴 게시물" 보고서와 게시물별 pstats 파일을 남깁니다.
+# pstats 파일은 snakeviz, flameprof, python -m pstats 로 열 수 있습니다.
+#
+# tracemalloc은 프로세스 전체의 할당을 추적하므로 게시물을 순차 처리할 때만 게시물별로 나눠 볼 수 있습니다.
+# (이미지 파생본 인코딩은 별도 프로세스에서 실행되므로 여기에 잡히지 않습니다)
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# 보고서의 각 순위 목록 길이와 게시물별로 남길 할당 위치 수
+DEFAULT_TOP_N = 20
+ALLOCATION_SITES_PER_POST = 5
+
+# 할당 위치 집계에서 제외할 프레임 (측정 도구 자체)
+_TRACEMALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _safe_file_name(label):
+    return re.sub(r'[^0-9A-Za-z_.-]', '_', label)[:80] or 'post'
+
+
+def max_rss_kb():
+    """프로세스의 최대 RSS(KB). 알 수 없으면 None."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Linux: KB 단위
+
+
+class PostProfiler:
+    """게시물 처리 함수를 감싸 cProfile/tracemalloc 결과를 모으고 보고서를 씁니다 (한 번에 한 게시물씩 측정)."""
+
+    def __init__(self, output_dir, top_n=DEFAULT_TOP_N, discard_results=(), tracemalloc_frames=10):
+        self.output_dir = output_dir
+        self.stats_dir = os.path.join(output_dir, 'posts')
+        self.top_n = top_n
+        self.discard_results = set(discard_results)   # 이 결과의 게시물은 pstats 파일을 남기지 않음 (예: 건너뜀)
+        self.tracemalloc_frames = tracemalloc_frames
+        self.entries = []
+        self._lock = threading.Lock() # 게시물을 동시에 측정하지 않도록 (tracemalloc은 프로세스 전체 기준)
+        self._started_tracemalloc = False
+
+    def start(self):
+        os.makedirs(self.stats_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._started_tracemalloc = True
+        logging.info(f"프로파일링 모드: 게시물별 결과를 {self.output_dir} 에 기록합니다.")
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def run(self, label, func, *args, **kwargs):
+        """func(*args, **kwargs)를 측정하며 실행하고 결과를 그대로 반환합니다."""
+        with self._lock:
+            profile = cProfile.Profile()
+            tracemalloc.reset_peak()
+            memory_before, _ = tracemalloc.get_traced_memory()
+            snapshot_before = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+            wall_started = time.perf_counter()
+            cpu_started = time.thread_time()
+
+            profile.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profile.disable()
+                cpu_seconds = time.thread_time() - cpu_started
+                wall_seconds = time.perf_counter() - wall_started
+                memory_after, memory_peak = tracemalloc.get_traced_memory()
+                snapshot_after = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+
+            entry = {
+                'label': label,
+                'result': result,
+                'wall_seconds': round(wall_seconds, 4),
+                'cpu_seconds': round(cpu_seconds, 4),
+                'peak_alloc_bytes': max(0, memory_peak - memory_before),   # 처리 중 최대로 늘어난 할당량
+                'retained_bytes': memory_after - memory_before,            # 처리 후에도 남아 있는 할당량
+                'allocation_sites': [
+                    f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size_diff:+d} B ({stat.count_diff:+d})"
+                    for stat in snapshot_after.compare_to(snapshot_before, 'lineno')[:ALLOCATION_SITES_PER_POST]
+                    if stat.size_diff > 0
+                ],
+                'pstats': None,
+            }
+            del snapshot_before, snapshot_after
+            if result not in self.discard_results:
+                path = os.path.join(self.stats_dir, f"{len(self.entries):04d}-{_safe_file_name(label)}.pstats")
+                profile.dump_stats(path)
+                entry['pstats'] = path
+            self.entries.append(entry)
+        return result
+
+    def _format_table(self, title, entries):
+        lines = [title, f"{'순위':>4} {'시간(초)':>9} {'CPU(초)':>8} {'최대 할당(KB)':>13} {'잔류(KB)':>9}  {'결과':<9} 게시물"]
+        for rank, entry in enumerate(entries, 1):
+            lines.append(
+                f"{rank:>4} {entry['wall_seconds']:>9.3f} {entry['cpu_seconds']:>8.3f} "
+                f"{entry['peak_alloc_bytes'] / 1024:>13.1f} {entry['retained_bytes'] / 1024:>9.1f}  "
+                f"{str(entry['result']):<9} {entry['label']}"
+            )
+            if entry['pstats']:
+                lines.append(f"{'':>6}pstats: {entry['pstats']}")
+        return lines
+
+    def write_report(self):
+        """report.txt, report.json, all_posts.pstats(모든 게시물 합산)를 쓰고 report.txt 경로를 반환합니다."""
+        slowest = sorted(self.entries, key=lambda entry: entry['wall_seconds'], reverse=True)[:self.top_n]
+        heaviest = sorted(self.entries, key=lambda entry: entry['peak_alloc_bytes'], reverse=True)[:self.top_n]
+
+        stats_files = [entry['pstats'] for entry in self.entries if entry['pstats']]
+        combined_path = None
+        if stats_files:
+            combined_path = os.path.join(self.output_dir, 'all_posts.pstats')
+            pstats.Stats(*stats_files).dump_stats(combined_path)
+
+        rss_kb = max_rss_kb()
+        lines = [
+            f"게시물 프로파일: {len(self.entries)}개, 합계 {sum(e['wall_seconds'] for e in self.entries):.2f}초, "
+            f"프로세스 최대 RSS {f'{rss_kb / 1024:.1f} MB' if rss_kb else '알 수 없음'}",
+            f"전체 합산 pstats: {combined_path or '없음'}  (예: snakeviz {combined_path or '<파일>'})",
+            "",
+        ]
+        lines += self._format_table("[가장 오래 걸린 게시물]", slowest)
+        lines.append("")
+        lines += self._format_table("[메모리를 가장 많이 할당한 게시물]", heaviest)
+        for entry in heaviest:
+            if entry['allocation_sites']:
+                lines.append(f"  {entry['label']} 주요 할당 위치:")
+                lines += [f"    {site}" for site in entry['allocation_sites']]
+
+        report_path = os.path.join(self.output_dir, 'report.txt')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        with open(os.path.join(self.output_dir, 'report.json'), 'w', encoding='utf-8') as f:
+            json.dump({'max_rss_kb': rss_kb, 'posts': self.entries}, f, ensure_ascii=False, indent=2, default=str)
+        logging.info(f"프로파일 보고서 작성 완료: {report_path}")
+        return report_path